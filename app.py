@@ -1,23 +1,37 @@
 import streamlit as st
-from dotenv import load_dotenv
+# Apply .env once per server process, before any module reads its settings
+import config  # noqa: F401
 import os
-
 import time
 from database import log_performance
-
-# Import custom modules from the brain folder
-from brain.profile_analyzer import ProfileAnalyzer
-from brain.post_generator import PostGenerator
-from brain.skills_advisor import SkillAdvisor
-from brain.network_advisor import NetworkAdvisor
-
-# Import the PDF utility from the utils folder
-from utils.pdf_exporter import PDFReport
-
-# Import the new CareerCoach class from the brain folder
-from brain.career_coach import CareerCoach
-# Load environment variables
-load_dotenv()
+from tracing import span
+from session_store import get_session_store, new_session_id, browser_key
+from brain.conversation_memory import ConversationMemory
+
+# The brain modules (openai, httpx) and the PDF utilities (fpdf) are imported
+# where a tool first runs: Streamlit re-executes this script on every
+# interaction, and the first page render shouldn't wait for any of them.
+
+def current_session_id():
+    """
+    Id of this visitor's stored state. It is generated on the server and held in
+    st.session_state; the URL (?sid=) only carries a token signed for this browser,
+    so a page reload finds the state again but a shared link or a made-up id does not.
+    """
+    if "session_id" not in st.session_state:
+        store = get_session_store()
+        browser = browser_key(st.context.cookies.get("_streamlit_xsrf"))
+        session_id = store.session_from_token(st.query_params.get("sid", ""), browser) or new_session_id()
+        st.session_state.session_id = session_id
+        st.query_params["sid"] = store.session_token(session_id, browser)
+    return st.session_state.session_id
+
+def track_first_token(stream, start_time, timings):
+    """Passes streamed deltas through and records time-to-first-token in timings['ttft']."""
+    for delta in stream:
+        if 'ttft' not in timings:
+            timings['ttft'] = round(time.time() - start_time, 2)
+        yield delta
 
 # 1. Page Configuration
 st.set_page_config(
@@ -26,32 +40,19 @@ st.set_page_config(
     layout="wide"
 )
 
-with st.sidebar:
-    st.divider()  # Visual separator for better organization
-    
-    if st.button("🔄 Reset Application", use_container_width=True):
-        # Clear all data stored in the current session state
-        for key in st.session_state.keys():
-            del st.session_state[key]
-        
-        # Immediately restart the application to reflect changes
-        st.rerun()
-
-# 2. Initialize Session State for Master Report
-# This keeps data alive when switching between sidebar menu options
-if 'master_data' not in st.session_state:
-    st.session_state['master_data'] = {
-        'profile': None,
-        'roadmap': None,
-        'networking': None,
-        'role': ""
-    }
+# Pre-warm the shared Groq connection pool once per server process
+# (GROQ_PREWARM_CONNECTIONS=0, the default, disables it and skips the client import
+# as well as the cache decorator, which costs about a millisecond per rerun)
+if os.getenv("GROQ_PREWARM_CONNECTIONS", "0") != "0":
+    @st.cache_resource
+    def prewarm_groq_pool():
+        from brain.groq_client import warm_up
+        return warm_up(wait=False)
 
-st.set_page_config(page_title="LinkBrain AI", page_icon="🧠", layout="wide")
+    prewarm_groq_pool()
 
 # Custom CSS for Professional Branding
-st.markdown("""
-    <style>
+APP_CSS = """
     /* Main Background & Fonts */
     .stApp {
         background-color: black; /* LinkedIn light gray background */
@@ -95,12 +96,68 @@ st.markdown("""
         background-color: #0a66c2;
         color: white;
     }
-    </style>
-""", unsafe_allow_html=True)
+"""
+
+# Custom CSS to fix the chat to the bottom and style it like a professional widget
+CHAT_CSS = """
+    /* Main Chat Container */
+    .stChatFloating {
+        position: fixed;
+        bottom: 20px;
+        right: 20px;
+        width: 350px;
+        z-index: 1000;
+        background: white;
+        border-radius: 15px;
+        box-shadow: 0 10px 25px rgba(0,0,0,0.2);
+        border: 1px solid #e0e0e0;
+    }
+    /* Header Styling */
+    .chat-header {
+        background: #0a66c2;
+        color: white;
+        padding: 12px;
+        border-radius: 15px 15px 0 0;
+        font-weight: bold;
+        text-align: center;
+        display: flex;
+        justify-content: center;
+        align-items: center;
+        gap: 10px;
+    }
+"""
+
+# Elements not re-emitted on a rerun are removed, so one style tag is sent every run
+st.markdown(f"<style>{APP_CSS}{CHAT_CSS}</style>", unsafe_allow_html=True)
+
+# 2. Per-visitor state (Master Report bundle, chat) lives in the session store:
+# a bounded in-memory working set backed by SQLite, so it survives page reloads
+# and idle sessions don't hold server RAM. Call save_session() after changing it.
+session_id = current_session_id()
+session = get_session_store().get(session_id)
+master_data = session['master_data']
+
+def save_session():
+    get_session_store().save(session_id, session)
+
+with st.sidebar:
+    st.divider()  # Visual separator for better organization
+    
+    if st.button("🔄 Reset Application", use_container_width=True):
+        # Clear all data stored for this visitor, in the store and in the session state
+        get_session_store().delete(session_id)
+        for key in st.session_state.keys():
+            del st.session_state[key]
+        # ...and start over under a new id
+        del st.query_params["sid"]
+        
+        # Immediately restart the application to reflect changes
+        st.rerun()
+
 # 4. Sidebar Navigation
 st.sidebar.markdown("<h2 style='text-align: center;'>🧠 LinkBrain Menu</h2>", unsafe_allow_html=True)
 app_mode = st.sidebar.selectbox("Select a Tool:", 
-    ["Profile Optimizer", "Post Generator", "Skill Advisor", "Networking Recommendations"]
+    ["Profile Optimizer", "Post Generator", "Skill Advisor", "Networking Recommendations", "Full Career Audit"]
 )
 
 
@@ -112,17 +169,25 @@ if app_mode == "Profile Optimizer":
     if st.button("Analyze My Profile"):
         start_time = time.time()
         if profile_input:
-            with st.spinner("Analyzing profile structure..."):
+            with st.spinner("Analyzing profile structure..."), span("ui.Profile Optimizer", tool="Profile Optimizer"):
+                from brain.profile_analyzer import ProfileAnalyzer
                 analyzer = ProfileAnalyzer()
                 result = analyzer.analyze_profile(profile_input)
+                latency = round(time.time() - start_time, 2)
                 
                 if "error" in result:
+                    log_performance("Profile Optimizer", latency, f"Error: {result['error'][:15]}", len(profile_input), usage=analyzer.last_usage)
                     st.error(result["error"])
                 else:
-                    # Save to Session State for Master Report
-                    st.session_state['master_data']['profile'] = result
+                    log_performance("Profile Optimizer", latency, "Success", len(profile_input), usage=analyzer.last_usage, match=analyzer.last_match)
+                    # Save to the session store for Master Report
+                    master_data['profile'] = result
+                    save_session()
                     
                     st.success("Analysis Complete!")
+                    if (analyzer.last_match or {}).get("cache_match") == "near":
+                        st.info(f"♻️ Reused the analysis of a near-identical profile "
+                                f"({analyzer.last_match['similarity']:.0%} similar).")
                     
                     # --- Display Score & Summary ---
                     col_score, col_sum = st.columns([1, 2])
@@ -151,8 +216,6 @@ if app_mode == "Profile Optimizer":
                             st.warning(w) # Uses yellow/orange boxes for weaknesses
         else:
             st.warning("Please provide profile text.")
-        end_time = time.time() # 
-        latency = round(end_time - start_time, 2)
         
 
 
@@ -170,20 +233,28 @@ elif app_mode == "Post Generator":
         if topic:
             start_time = time.time()
 
-            with st.spinner("Writing..."):
+            with st.spinner("Writing..."), span("ui.Post Generator", tool="Post Generator"):
                 try:
+                    from brain.post_generator import PostGenerator
                     gen = PostGenerator()
-                    post_content = gen.generate_post(topic, tone, language)
+                    dir_class = "rtl-text" if language == "Arabic" else ""
+                    
+                    # 1. Render tokens as they arrive instead of waiting for the full post
+                    timings = {}
+                    post_box = st.empty()
+                    post_content = ""
+                    for delta in track_first_token(gen.stream_post(topic, tone, language), start_time, timings):
+                        post_content += delta
+                        post_box.markdown(f'<div class="{dir_class}">{post_content}▌</div>', unsafe_allow_html=True)
+                    post_box.markdown(f'<div class="{dir_class}">{post_content}</div>', unsafe_allow_html=True)
                     
                     # 2. 
                     latency = round(time.time() - start_time, 2)
                     
                     # 3. 
-                    log_performance("Post Generator", latency, "Success", len(topic))
+                    log_performance("Post Generator", latency, "Success", len(topic), ttft=timings.get('ttft'), usage=gen.last_usage, match=gen.last_match)
                     
-                    dir_class = "rtl-text" if language == "Arabic" else ""
-                    st.markdown(f'<div class="{dir_class}">{post_content}</div>', unsafe_allow_html=True)
-                    st.success(f"Generated in {latency}s") # اختياري: إظهار السرعة للمطور
+                    st.success(f"Generated in {latency}s (first token in {timings.get('ttft', latency)}s)") # اختياري: إظهار السرعة للمطور
                     
                 except Exception as e:
                     # 4. تسجيل الفشل في حال حدوث خطأ
@@ -209,9 +280,10 @@ elif app_mode == "Skill Advisor":
         if role and skills_input:
             start_time = time.time()
             
-            with st.spinner("Generating your personalized roadmap..."):
+            with st.spinner("Generating your personalized roadmap..."), span("ui.Skill Advisor", tool="Skill Advisor"):
                 try:
                     # Initialize logic from brain folder
+                    from brain.skills_advisor import SkillAdvisor
                     advisor = SkillAdvisor()
                     report = advisor.analyze_skills(skills_input, role, lang)
                     
@@ -220,15 +292,16 @@ elif app_mode == "Skill Advisor":
                     
                     if "error" in report:
                         # 
-                        log_performance("Skill Advisor", latency, "Error", len(skills_input))
+                        log_performance("Skill Advisor", latency, "Error", len(skills_input), usage=advisor.last_usage)
                         st.error(report["error"])
                     else:
                         # 3. 
-                        log_performance("Skill Advisor", latency, "Success", len(skills_input))
+                        log_performance("Skill Advisor", latency, "Success", len(skills_input), usage=advisor.last_usage, match=advisor.last_match)
                         
-                        # Sync data to Session State for the Master PDF Report
-                        st.session_state['master_data']['roadmap'] = report
-                        st.session_state['master_data']['role'] = role
+                        # Sync data to the session store for the Master PDF Report
+                        master_data['roadmap'] = report
+                        master_data['role'] = role
+                        save_session()
                         
                         st.success(f"Roadmap Ready! (Processed in {latency}s)")
                         st.subheader(f"Analysis for {role}")
@@ -270,8 +343,9 @@ elif app_mode == "Networking Recommendations":
 
             start_time = time.time()
             
-            with st.spinner("Searching leaders..."):
+            with st.spinner("Searching leaders..."), span("ui.Networking Advisor", tool="Networking Advisor"):
                 try:
+                    from brain.network_advisor import NetworkAdvisor
                     advisor = NetworkAdvisor()
                     results = advisor.get_recommendations(user_input)
                     
@@ -280,15 +354,19 @@ elif app_mode == "Networking Recommendations":
                     
                     if "error" in results:
                         # 
-                        log_performance("Networking Advisor", latency, f"Error: {results['error'][:15]}", len(user_input))
+                        log_performance("Networking Advisor", latency, f"Error: {results['error'][:15]}", len(user_input), usage=advisor.last_usage)
                         st.error(results["error"])
                     else:
                         # 3.
-                        log_performance("Networking Advisor", latency, "Success", len(user_input))
+                        log_performance("Networking Advisor", latency, "Success", len(user_input), usage=advisor.last_usage, match=advisor.last_match)
                         
-                        # Save to Session State for Master Report
-                        st.session_state['master_data']['networking'] = results
+                        # Save to the session store for Master Report
+                        master_data['networking'] = results
+                        save_session()
                         st.success(f"Leaders Found! (in {latency}s)")
+                        if (advisor.last_match or {}).get("cache_match") == "near":
+                            st.info(f"♻️ Reused recommendations for a near-identical input "
+                                    f"({advisor.last_match['similarity']:.0%} similar).")
                         
                         for person in results.get("recommendations", []):
                             st.write(person)
@@ -299,27 +377,84 @@ elif app_mode == "Networking Recommendations":
                     st.error(f"System Error: {e}")
         else:
             st.warning("Please provide input text.")
+
+# --- FEATURE 5: FULL CAREER AUDIT (Profile + Skills + Networking in parallel) ---
+elif app_mode == "Full Career Audit":
+    st.markdown("<h1 class='main-title'>⚡ One-Click Full Career Audit</h1>", unsafe_allow_html=True)
+    audit_profile = st.text_area("Paste your profile text here:", height=250)
+    col_role, col_lang = st.columns(2)
+    with col_role:
+        audit_role = st.text_input("Target Job Role:", placeholder="e.g., Data Scientist")
+    with col_lang:
+        audit_lang = st.selectbox("Language:", ["English", "Arabic", "French"])
+
+    if st.button("Run Full Audit ⚡"):
+        if audit_profile and audit_role:
+            from brain.full_audit import run_full_audit, AUDIT_SECTIONS
+            from utils.pdf_cache import build_master_report
+            start_time = time.time()
+            failed = []
+
+            # One trace covers the three analyses and the Master Report built from them
+            with span("ui.Full Career Audit", tool="Full Career Audit"):
+                with st.status("Running Profile, Skill and Networking analyses in parallel...", expanded=True) as status:
+                    def store_section(section, result, latency, usage, match):
+                        # Fill the Master Bundle as each analysis lands
+                        tool_name = AUDIT_SECTIONS[section]
+                        if "error" in result:
+                            failed.append(section)
+                            log_performance(tool_name, latency, "Error", len(audit_profile), usage=usage)
+                            st.error(f"{tool_name}: {result['error']}")
+                            return
+                        log_performance(tool_name, latency, "Success", len(audit_profile), usage=usage, match=match)
+                        master_data[section] = result
+                        if section == 'roadmap':
+                            master_data['role'] = audit_role
+                        save_session()
+                        st.write(f"✅ {tool_name} ready in {latency}s")
+
+                    run_full_audit(audit_profile, audit_role, audit_lang, on_result=store_section)
+                    latency = round(time.time() - start_time, 2)
+                    status.update(label=f"Audit finished in {latency}s", state="error" if failed else "complete")
+
+                if not failed:
+                    # All three sections are in: build the Master Report right away
+                    with span("ui.Master PDF Report", tool="Master PDF Report"):
+                        try:
+                            pdf_start = time.time()
+                            master_pdf, pdf_match = build_master_report(master_data)
+                            pdf_latency = round(time.time() - pdf_start, 2)
+                            log_performance("Master PDF Report", pdf_latency, "Success", len(master_pdf), match=pdf_match)
+                            st.success(f"Full audit and Master Report ready in {round(time.time() - start_time, 2)}s")
+                            st.download_button("📥 Download Full Bundle", master_pdf, "Full_Career_Audit.pdf")
+                        except Exception as e:
+                            log_performance("Master PDF Report", 0, f"PDF Error: {str(e)[:15]}", 0)
+                            st.error("Failed to build PDF.")
+        else:
+            st.warning("Please provide both your profile text and a target role.")
+
 # --- MASTER REPORT SIDEBAR LOGIC ---
 st.sidebar.markdown("---")
 st.sidebar.subheader("🎓 Master Career Bundle")
 # Calculate completion progress
-completed = sum(1 for k in ['profile', 'roadmap', 'networking'] if st.session_state['master_data'][k])
+completed = sum(1 for k in ['profile', 'roadmap', 'networking'] if master_data[k])
 st.sidebar.progress(completed / 3)
 
 if completed == 3:
     if st.sidebar.button("📦 Build Master Report"):
         start_time = time.time()
         
-        with st.spinner("Generating PDF Bundle..."):
+        with st.spinner("Generating PDF Bundle..."), span("ui.Master PDF Report", tool="Master PDF Report"):
             try:
-                pdf_tool = PDFReport()
-                master_pdf = pdf_tool.generate_master_report(st.session_state['master_data'])
+                # Unchanged bundles (and unchanged leading sections) come from the PDF cache
+                from utils.pdf_cache import build_master_report
+                master_pdf, pdf_match = build_master_report(master_data)
                 
                 # 2.
                 latency = round(time.time() - start_time, 2)
                 
                 # 3. 
-                log_performance("Master PDF Report", latency, "Success", 100) # 100 كقيمة افتراضية للحجم
+                log_performance("Master PDF Report", latency, "Success", len(master_pdf), match=pdf_match) # PDF size in bytes
                 
                 st.sidebar.download_button("📥 Download Full Bundle", master_pdf, "Full_Career_Audit.pdf")
                 st.sidebar.success(f"Report Generated in {latency}s")
@@ -335,89 +470,96 @@ elif completed > 0:
 
 # --- PROFESSIONAL FLOATING-STYLE CHATBOT ---
 
-# 1. Custom CSS to fix the chat to the bottom and style it like a professional widget
-st.markdown("""
-    <style>
-    /* Main Chat Container */
-    .stChatFloating {
-        position: fixed;
-        bottom: 20px;
-        right: 20px;
-        width: 350px;
-        z-index: 1000;
-        background: white;
-        border-radius: 15px;
-        box-shadow: 0 10px 25px rgba(0,0,0,0.2);
-        border: 1px solid #e0e0e0;
-    }
-    /* Header Styling */
-    .chat-header {
-        background: #0a66c2;
-        color: white;
-        padding: 12px;
-        border-radius: 15px 15px 0 0;
-        font-weight: bold;
-        text-align: center;
-        display: flex;
-        justify-content: center;
-        align-items: center;
-        gap: 10px;
-    }
-    </style>
-""", unsafe_allow_html=True)
-
-# 2. Using an Expander at the bottom of the main page to simulate a "Pop-up"
-# We place it inside a column to push it to the right
-col1, col2 = st.columns([2, 1])
-
-with col2:
+# Messages drawn per page of history; older ones appear through "Load older messages"
+# (override through .env or the deployment environment)
+CHAT_WINDOW = int(os.getenv("LINKBRAIN_CHAT_WINDOW", "20"))
+
+def show_chat_message(container, role, content):
+    avatar = "👤" if role == "user" else "🧠"
+    with container.chat_message(role, avatar=avatar):
+        st.markdown(content)
+
+# Button callbacks run before the (fragment) rerun they trigger, so it draws the new state
+def show_older_messages():
+    st.session_state.chat_window += CHAT_WINDOW
+
+def clear_conversation(session_id):
+    chat = get_session_store().get(session_id)
+    chat['messages'] = []
+    chat['chat_memory'] = None
+    get_session_store().save(session_id, chat)
+    st.session_state.chat_window = CHAT_WINDOW
+
+# Runs as a fragment: sending a message or paging through history reruns only
+# this function, so the selected tool page is not redrawn on each reply.
+@st.fragment
+def render_chat_assistant(session_id):
     with st.expander("🧠 LinkBrain Assistant", expanded=False):
         st.markdown("<div class='chat-header'>🧠 Executive AI Coach</div>", unsafe_allow_html=True)
         
-        if "messages" not in st.session_state:
-            st.session_state.messages = []
+        # Fragment reruns skip the rest of the script: read the session here
+        chat = get_session_store().get(session_id)
+        if "chat_window" not in st.session_state:
+            st.session_state.chat_window = CHAT_WINDOW
 
         chat_box = st.container(height=350)
 
-        for msg in st.session_state.messages:
-            avatar = "👤" if msg["role"] == "user" else "🧠"
-            with chat_box.chat_message(msg["role"], avatar=avatar):
-                st.markdown(msg["content"])
+        # Only the most recent messages are drawn; every rerun (full-page ones
+        # included) pays for the window, not for the whole conversation
+        messages = chat['messages']
+        hidden = max(0, len(messages) - st.session_state.chat_window)
+        if hidden:
+            chat_box.button(f"⬆️ Load older messages ({hidden} hidden)", use_container_width=True,
+                            on_click=show_older_messages)
+        for msg in messages[hidden:]:
+            show_chat_message(chat_box, msg["role"], msg["content"])
 
         if chat_input := st.chat_input("Type your message..."):
             # 1. ابدأ التوقيت عند إرسال المستخدم للرسالة
-            import time
-            from database import log_performance
             start_time = time.time()
             
-            st.session_state.messages.append({"role": "user", "content": chat_input})
-            with chat_box.chat_message("user", avatar="👤"):
-                st.markdown(chat_input)
+            messages.append({"role": "user", "content": chat_input})
+            show_chat_message(chat_box, "user", chat_input)
 
-            with st.spinner("Analyzing..."):
+            with st.spinner("Analyzing..."), span("ui.AI Coach Chat", tool="AI Coach Chat"):
                 try:
-                    context = st.session_state.get('master_data', {}).get('profile')
+                    context = chat['master_data'].get('profile')
+                    # Token-budgeted view of the history that is actually sent to Groq
+                    memory = ConversationMemory.from_dict(chat['chat_memory'])
+                    from brain.career_coach import CareerCoach
                     coach = CareerCoach()
-                    response = coach.get_response(st.session_state.messages, context_data=context)
+                    
+                    # Stream the reply token by token into the chat bubble
+                    timings = {}
+                    with chat_box.chat_message("assistant", avatar="🧠"):
+                        response = st.write_stream(track_first_token(
+                            coach.stream_response(messages, context_data=context, memory=memory),
+                            start_time, timings
+                        ))
                     
                     # 2. حساب وقت الاستجابة
                     latency = round(time.time() - start_time, 2)
                     
                     # 3. تسجيل الأداء في لوحة المطور
-                    log_performance("AI Coach Chat", latency, "Success", len(chat_input))
+                    log_performance("AI Coach Chat", latency, "Success", len(chat_input), ttft=timings.get('ttft'), usage=coach.last_usage)
                     
-                    st.session_state.messages.append({"role": "assistant", "content": response})
-                    with chat_box.chat_message("assistant", avatar="🧠"):
-                        st.markdown(response)
+                    messages.append({"role": "assistant", "content": response})
+                    chat['chat_memory'] = memory.to_dict()
                         
                 except Exception as e:
                     # تسجيل الفشل في حال انقطاع الـ API أثناء المحادثة
                     log_performance("AI Coach Chat", 0, f"Chat Error: {str(e)[:15]}", len(chat_input))
                     st.error("I'm having trouble thinking right now. Please try again.")
+            get_session_store().save(session_id, chat)
 
-        if st.button("Clear Conversation", use_container_width=True):
-            st.session_state.messages = []
-            st.rerun()
+        st.button("Clear Conversation", use_container_width=True, on_click=clear_conversation, args=(session_id,))
+
+# 2. Using an Expander at the bottom of the main page to simulate a "Pop-up"
+# We place it inside a column to push it to the right
+col1, col2 = st.columns([2, 1])
+
+with col2:
+    render_chat_assistant(session_id)
 # Footer
 st.sidebar.markdown("---")
 st.sidebar.markdown("<div style='text-align: center; color: #888;'>Created by <b>Abdel Kader Ahmed</b></div>", unsafe_allow_html=True)
\ No newline at end of file
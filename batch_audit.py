@@ -0,0 +1,161 @@
+"""
+LinkBrain AI | Bulk Profile Audit (headless)
+
+Runs ProfileAnalyzer over a JSONL or CSV file of profiles and streams one
+JSON result per line. The output file doubles as the checkpoint: rerunning
+the same command skips every id already written, so interrupted runs resume.
+
+Usage:
+    python batch_audit.py cohort.csv -o audits.jsonl --concurrency 16
+"""
+import os
+import sys
+import csv
+import json
+import time
+import asyncio
+import argparse
+
+import config  # noqa: F401  (.env, before the modules below read their settings)
+from brain.profile_analyzer import ProfileAnalyzer
+from brain.groq_client import aclose_async_client
+from brain.rate_limiter import request_priority, PRIORITY_BATCH
+from database import log_performance
+
+
+def read_profiles(path, id_field, text_field, input_format=None):
+    """Lazily yields (item_id, profile_text) pairs from a JSONL or CSV file."""
+    fmt = input_format or ("csv" if path.lower().endswith(".csv") else "jsonl")
+    with open(path, newline="", encoding="utf-8") as f:
+        if fmt == "csv":
+            rows = csv.DictReader(f)
+        else:
+            rows = (json.loads(line) for line in f if line.strip())
+
+        for row_number, row in enumerate(rows, start=1):
+            # Rows without an id get a positional one (stable across reruns)
+            item_id = str(row.get(id_field) or f"row-{row_number}")
+            yield item_id, row.get(text_field) or ""
+
+
+def load_checkpoint(output_path, retry_errors=False):
+    """Returns the ids already present in the output file."""
+    done = set()
+    if not os.path.exists(output_path):
+        return done
+    with open(output_path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                # A torn last line from an interrupted run is simply redone
+                continue
+            if retry_errors and not record.get("ok"):
+                continue
+            done.add(record.get("id"))
+    return done
+
+
+class BatchAuditor:
+    """Bounded-concurrency asyncio pipeline: reader -> N workers -> JSONL writer."""
+
+    def __init__(self, concurrency=8, progress_every=10.0):
+        self.concurrency = concurrency
+        self.progress_every = progress_every
+        self.stats = {"ok": 0, "errors": 0, "skipped": 0}
+
+    async def run(self, items, output_path, done_ids):
+        queue = asyncio.Queue(maxsize=self.concurrency * 2)
+        start = time.time()
+
+        with open(output_path, "a", encoding="utf-8") as out:
+            workers = [asyncio.create_task(self._worker(queue, out)) for _ in range(self.concurrency)]
+            reporter = asyncio.create_task(self._report_progress(start))
+
+            # Back-pressure: put() waits while every worker is busy
+            for item_id, text in items:
+                if item_id in done_ids:
+                    self.stats["skipped"] += 1
+                    continue
+                await queue.put((item_id, text))
+
+            for _ in workers:
+                await queue.put(None)
+            await asyncio.gather(*workers)
+            reporter.cancel()
+
+        await aclose_async_client()
+        elapsed = time.time() - start
+        processed = self.stats["ok"] + self.stats["errors"]
+        return {
+            **self.stats,
+            "processed": processed,
+            "elapsed_s": round(elapsed, 2),
+            "throughput_per_s": round(processed / elapsed, 2) if elapsed > 0 else 0.0
+        }
+
+    async def _worker(self, queue, out):
+        # One analyzer per worker so last_usage is never shared between items
+        analyzer = ProfileAnalyzer()
+        while True:
+            job = await queue.get()
+            if job is None:
+                return
+            item_id, text = job
+            started = time.time()
+            try:
+                result = await analyzer.analyze_profile_async(text)
+            except Exception as e:
+                # Per-item failures are recorded, never fatal for the run
+                result = {"error": f"Batch worker failed: {str(e)}"}
+            latency = round(time.time() - started, 2)
+
+            ok = "error" not in result
+            record = {"id": item_id, "ok": ok, "latency": latency, "usage": analyzer.last_usage, "match": analyzer.last_match}
+            if ok:
+                record["result"] = result
+                self.stats["ok"] += 1
+            else:
+                record["error"] = result["error"]
+                self.stats["errors"] += 1
+
+            # One line per item, flushed so the checkpoint survives a crash
+            out.write(json.dumps(record, ensure_ascii=False) + "\n")
+            out.flush()
+            log_performance("Batch Profile Audit", latency, "Success" if ok else "Error", len(text),
+                            usage=analyzer.last_usage, match=analyzer.last_match)
+
+    async def _report_progress(self, start):
+        while True:
+            await asyncio.sleep(self.progress_every)
+            processed = self.stats["ok"] + self.stats["errors"]
+            rate = processed / (time.time() - start)
+            print(f"[batch] {processed} done ({self.stats['errors']} errors, "
+                  f"{self.stats['skipped']} resumed) - {rate:.2f} profiles/s", file=sys.stderr)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Bulk LinkedIn profile audit (JSONL/CSV -> JSONL).")
+    parser.add_argument("input", help="JSONL or CSV file with one profile per row")
+    parser.add_argument("-o", "--output", required=True, help="JSONL results file (also the resume checkpoint)")
+    parser.add_argument("--concurrency", type=int, default=8, help="Maximum in-flight Groq requests")
+    parser.add_argument("--format", choices=["jsonl", "csv"], help="Input format (default: from extension)")
+    parser.add_argument("--id-field", default="id", help="Column/key holding the profile id")
+    parser.add_argument("--text-field", default="profile_text", help="Column/key holding the profile text")
+    parser.add_argument("--retry-errors", action="store_true", help="Re-run items that failed in a previous run")
+    parser.add_argument("--progress-every", type=float, default=10.0, help="Seconds between progress lines")
+    args = parser.parse_args(argv)
+
+    done_ids = load_checkpoint(args.output, retry_errors=args.retry_errors)
+    items = read_profiles(args.input, args.id_field, args.text_field, args.format)
+
+    auditor = BatchAuditor(concurrency=max(1, args.concurrency), progress_every=args.progress_every)
+    # Batch jobs queue behind interactive sessions for the shared Groq quota
+    with request_priority(PRIORITY_BATCH):
+        summary = asyncio.run(auditor.run(items, args.output, done_ids))
+    print(json.dumps(summary), file=sys.stderr)
+    return 0 if summary["errors"] == 0 else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
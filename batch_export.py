@@ -0,0 +1,61 @@
+"""
+LinkBrain AI | Cohort Master Report Export (headless)
+
+Renders one Master Career Report per bundle in a JSONL file and streams the
+PDFs into a single ZIP, using a process pool sized to the available cores.
+Each input line is a master bundle ({"id", "profile", "roadmap", "networking"})
+or {"id", "bundle": {...}}. Per-document timings go to --timings as JSONL.
+
+Usage:
+    python batch_export.py cohort_bundles.jsonl -o cohort_reports.zip --timings timings.jsonl
+"""
+import sys
+import json
+import argparse
+
+import config  # noqa: F401  (.env, before the modules below read their settings)
+from utils.batch_export import export_master_reports
+
+
+def read_bundles(path, id_field="id"):
+    """Lazily yields (item_id, data_bundle) pairs from a JSONL file."""
+    with open(path, encoding="utf-8") as f:
+        for line_number, line in enumerate(f, start=1):
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            item_id = str(record.get(id_field) or f"row-{line_number}")
+            yield item_id, record.get("bundle") or record
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Parallel Master Report export (JSONL bundles -> ZIP of PDFs).")
+    parser.add_argument("input", help="JSONL file with one master bundle per line")
+    parser.add_argument("-o", "--output", required=True, help="ZIP archive to write")
+    parser.add_argument("--workers", type=int, help="Render processes (default: available cores)")
+    parser.add_argument("--max-in-flight", type=int, help="Documents queued or buffered at once (default: 2 x workers)")
+    parser.add_argument("--id-field", default="id", help="Key holding the document id (used as the PDF name)")
+    parser.add_argument("--timings", help="Write per-document timings here (JSONL)")
+    args = parser.parse_args(argv)
+
+    timings = open(args.timings, "w", encoding="utf-8") if args.timings else None
+
+    def on_document(record):
+        if timings:
+            timings.write(json.dumps(record) + "\n")
+        if not record["ok"]:
+            print(f"[export] {record['id']} failed: {record['error']}", file=sys.stderr)
+
+    try:
+        summary = export_master_reports(read_bundles(args.input, args.id_field), args.output,
+                                        workers=args.workers, max_in_flight=args.max_in_flight,
+                                        on_document=on_document)
+    finally:
+        if timings:
+            timings.close()
+    print(json.dumps(summary), file=sys.stderr)
+    return 0 if summary["failed"] == 0 else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
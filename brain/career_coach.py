@@ -1,10 +1,9 @@
-import os
-import streamlit as st 
-from openai import OpenAI
-from dotenv import load_dotenv
-
-# Load local environment variables
-load_dotenv()
+from tracing import span, traced
+from brain.groq_client import get_api_key, get_client, extract_usage
+from brain.resilience import call_groq
+from brain.model_router import LARGE_MODEL, get_router, annotate
+from brain.rate_limiter import request_priority, PRIORITY_INTERACTIVE
+from brain.conversation_memory import CHAT_SUMMARY_MODEL, CHAT_SUMMARY_TOKENS, message_tokens
 
 class CareerCoach:
     """
@@ -12,33 +11,24 @@ class CareerCoach:
     powered by Groq Llama 3.3.
     """
     
+    @traced(tool="AI Coach Chat")
     def __init__(self):
         # 1. Initialize attributes to None to prevent AttributeError
         self.client = None
         self.api_key = None
-        self.model = "llama-3.3-70b-versatile"
+        self.model = LARGE_MODEL
+        # Token usage of the most recent Groq call (None when served from cache)
+        self.last_usage = None
 
-        # 2. Securely fetch the API key with Cloud/Local fallback logic
-        try:
-            # Check for Streamlit Cloud Secrets
-            if hasattr(st, "secrets") and "GROQ_API_KEY" in st.secrets:
-                self.api_key = st.secrets["GROQ_API_KEY"]
-            else:
-                # Fallback to local .env
-                self.api_key = os.getenv("GROQ_API_KEY")
-        except Exception:
-            # Final fallback if st.secrets triggers an error locally
-            self.api_key = os.getenv("GROQ_API_KEY")
+        # 2. Resolve the API key once per process (Cloud Secrets -> local .env)
+        self.api_key = get_api_key()
 
-        # 3. Validate API key
+        # 3. Validate API key existence
         if not self.api_key:
             raise ValueError("CRITICAL: GROQ_API_KEY is missing. Add it to .env (local) or Secrets (cloud).")
 
-        # 4. Initialize the AI client
-        self.client = OpenAI(
-            api_key=self.api_key,
-            base_url="https://api.groq.com/openai/v1"
-        )
+        # 4. Reuse the process-wide pooled Groq client (keep-alive connections)
+        self.client = get_client()
 
         # 5. Define the sophisticated coaching personality
         self.system_prompt = (
@@ -52,7 +42,8 @@ class CareerCoach:
             "4. Never mention you are an AI; act as a human consultant."
         )
 
-    def get_response(self, messages, context_data=None):
+    @traced(tool="AI Coach Chat")
+    def get_response(self, messages, context_data=None, memory=None):
         """
         Generates a sophisticated response using context-aware logic via Groq.
         """
@@ -61,35 +52,95 @@ class CareerCoach:
             return "Strategic Advisor is offline. Please check system configuration."
 
         try:
-            # Start with the core personality
-            final_messages = [{"role": "system", "content": self.system_prompt}]
+            # Collect the streamed deltas into the final reply
+            return "".join(self.stream_response(messages, context_data, memory))
             
-            # Inject dynamic context (from Profile Analysis) if available
-            if context_data:
-                briefing = (
-                    f"EXECUTIVE BRIEFING: "
-                    f"The candidate has a Profile Score of {context_data.get('score')}/100. "
-                    f"Core Strengths include: {', '.join(context_data.get('strengths', []))}. "
-                    f"Current Objective: {context_data.get('summary', 'Career Growth')}."
-                )
-                final_messages.append({"role": "system", "content": briefing})
-
-            # Append the actual conversation history
-            final_messages.extend(messages)
+        except Exception as e:
+            # Silent logging and professional user-facing fallback
+            return "I apologize, but I am currently experiencing a technical interruption. Please try again shortly."
 
-            # Request inference from Groq
-            response = self.client.chat.completions.create(
-                model=self.model,
+    @traced(tool="AI Coach Chat")
+    def stream_response(self, messages, context_data=None, memory=None):
+        """
+        Streaming variant of get_response: yields text deltas as Groq produces them.
+        Errors are raised to the caller so the UI can log and report them.
+        """
+        # Request inference from Groq
+        self.last_usage = None
+        final_messages = self._build_messages(messages, context_data, memory)
+        # One-line questions go to the fast model tier
+        latest = next((m["content"] for m in reversed(messages) if m["role"] == "user"), "")
+        decision = get_router().route("chat", latest, stream=True)
+        # Only opening the stream is retried: deltas already shown cannot be replayed.
+        # Chat is interactive, so it queues ahead of other tools for Groq quota
+        with request_priority(PRIORITY_INTERACTIVE):
+            stream = call_groq(
+                self.client.chat.completions.create,
+                model=decision["model"],
                 messages=final_messages,
                 temperature=0.5,
                 presence_penalty=0.1,
-                frequency_penalty=0.1
+                frequency_penalty=0.1,
+                stream=True,
+                stream_options={"include_usage": True}
             )
-            return response.choices[0].message.content
-            
-        except Exception as e:
-            # Silent logging and professional user-facing fallback
-            return "I apologize, but I am currently experiencing a technical interruption. Please try again shortly."
+        for chunk in stream:
+            # The final chunk carries only usage data and no choices
+            if chunk.choices and chunk.choices[0].delta.content:
+                yield chunk.choices[0].delta.content
+            usage = extract_usage(chunk)
+            if usage:
+                self.last_usage = annotate(usage, decision)
+
+    def _build_messages(self, messages, context_data=None, memory=None):
+        """
+        Prepends the coaching personality and the optional executive briefing.
+        With a ConversationMemory the history is compacted to its token budget.
+        """
+        # Start with the core personality
+        final_messages = [{"role": "system", "content": self.system_prompt}]
+        
+        # Inject dynamic context (from Profile Analysis) if available
+        if context_data:
+            briefing = (
+                f"EXECUTIVE BRIEFING: "
+                f"The candidate has a Profile Score of {context_data.get('score')}/100. "
+                f"Core Strengths include: {', '.join(context_data.get('strengths', []))}. "
+                f"Current Objective: {context_data.get('summary', 'Career Growth')}."
+            )
+            final_messages.append({"role": "system", "content": briefing})
+
+        # Append the actual conversation history (older turns folded into a summary)
+        if memory is not None:
+            with span("chat.compact") as sp:
+                fixed_tokens = sum(message_tokens(m) for m in final_messages)
+                folded_before = memory.folded
+                messages = memory.fit(messages, fixed_tokens, summarize=self._summarize)
+                sp.set(prompt_tokens_est=memory.last_prompt_tokens,
+                       folded_messages=memory.folded - folded_before, verbatim_messages=len(messages))
+        final_messages.extend(messages)
+        return final_messages
+
+    def _summarize(self, previous_summary, turns):
+        """Folds older turns into the running summary with the small, fast model."""
+        transcript = "\n".join(f"{m['role'].upper()}: {m['content']}" for m in turns)
+        with request_priority(PRIORITY_INTERACTIVE):
+            response = call_groq(
+                self.client.chat.completions.create,
+                model=CHAT_SUMMARY_MODEL,
+                messages=[
+                    {"role": "system", "content": (
+                        "You maintain the running memory of a career coaching session. "
+                        "Merge the new turns into the existing summary. Keep the candidate's goals, "
+                        "facts, decisions and open questions; drop pleasantries. "
+                        "Reply with the updated summary only, in the conversation's language."
+                    )},
+                    {"role": "user", "content": f"EXISTING SUMMARY:\n{previous_summary or '(none)'}\n\nNEW TURNS:\n{transcript}"}
+                ],
+                temperature=0.2,
+                max_tokens=CHAT_SUMMARY_TOKENS
+            )
+        return response.choices[0].message.content.strip()
 
 if __name__ == "__main__":
     # Internal module sanity check
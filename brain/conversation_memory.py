@@ -0,0 +1,118 @@
+import os
+import math
+
+# Chat context budget (override through .env or the deployment environment)
+CHAT_CONTEXT_TOKENS = int(os.getenv("LINKBRAIN_CHAT_CONTEXT_TOKENS", "3000"))
+CHAT_SUMMARY_TOKENS = int(os.getenv("LINKBRAIN_CHAT_SUMMARY_TOKENS", "400"))
+CHAT_SUMMARY_MODEL = os.getenv("LINKBRAIN_CHAT_SUMMARY_MODEL", "llama-3.1-8b-instant")
+# After a fold the verbatim window shrinks to this share of its budget, so the
+# summarizer runs once every few turns instead of on every turn
+CHAT_LOW_WATERMARK = float(os.getenv("LINKBRAIN_CHAT_LOW_WATERMARK", "0.6"))
+
+# Role/format tokens the chat template adds around every message
+MESSAGE_OVERHEAD_TOKENS = 4
+
+
+def estimate_tokens(text):
+    """
+    Local, dependency-free token estimate for Llama 3 prompts.
+    ~4 UTF-8 bytes per token: close for English, conservative for Arabic/French.
+    """
+    if not text:
+        return 0
+    return math.ceil(len(str(text).encode("utf-8")) / 4)
+
+
+def message_tokens(message):
+    return estimate_tokens(message.get("content")) + MESSAGE_OVERHEAD_TOKENS
+
+
+class ConversationMemory:
+    """
+    Rolling context for one chat session: recent turns are sent verbatim,
+    older turns are folded into a running summary once the token budget is
+    exceeded. Keep one per session next to the message list it compacts
+    (app.py stores to_dict() in the session store); the message list itself
+    is never modified.
+    """
+
+    def __init__(self, budget=CHAT_CONTEXT_TOKENS, summary_budget=CHAT_SUMMARY_TOKENS,
+                 low_watermark=CHAT_LOW_WATERMARK):
+        self.budget = budget
+        self.summary_budget = summary_budget
+        self.low_watermark = low_watermark
+        self.summary = ""
+        self.folded = 0  # messages[:folded] live only in the summary
+        self.last_prompt_tokens = 0
+
+    def reset(self):
+        self.summary = ""
+        self.folded = 0
+        self.last_prompt_tokens = 0
+
+    def to_dict(self):
+        """Session state to persist (budgets come from the configuration, not the session)."""
+        return {"summary": self.summary, "folded": self.folded, "last_prompt_tokens": self.last_prompt_tokens}
+
+    @classmethod
+    def from_dict(cls, state):
+        memory = cls()
+        for name, value in (state or {}).items():
+            setattr(memory, name, value)
+        return memory
+
+    def summary_message(self):
+        if not self.summary:
+            return None
+        return {"role": "system", "content": f"CONVERSATION SO FAR (summary of earlier turns): {self.summary}"}
+
+    def fit(self, messages, fixed_tokens=0, summarize=None):
+        """
+        Returns the history to send: an optional summary message plus the
+        verbatim tail of `messages`, sized so the whole prompt (including the
+        `fixed_tokens` of system prompt/briefing) stays within the budget.
+
+        `summarize(previous_summary, turns)` returns the updated summary text.
+        Without it (or if it fails) the overflowing turns are simply dropped.
+        """
+        if len(messages) < self.folded:
+            # The conversation was cleared or replaced
+            self.reset()
+
+        history_budget = max(0, self.budget - fixed_tokens - self.summary_budget)
+        tail = messages[self.folded:]
+        sizes = [message_tokens(m) for m in tail]
+
+        if sum(sizes) > history_budget:
+            cut = self._fold_point(tail, sizes, history_budget)
+            if cut:
+                self._fold(tail[:cut], summarize)
+                self.folded += cut
+                tail, sizes = tail[cut:], sizes[cut:]
+
+        summary = self.summary_message()
+        history = ([summary] if summary else []) + list(tail)
+        self.last_prompt_tokens = fixed_tokens + sum(sizes) + (message_tokens(summary) if summary else 0)
+        return history
+
+    def _fold_point(self, tail, sizes, history_budget):
+        # Keep the newest turns up to the low watermark; the latest message always stays
+        target = history_budget * self.low_watermark
+        start = len(tail) - 1
+        kept = sizes[start]
+        while start > 0 and kept + sizes[start - 1] <= target:
+            start -= 1
+            kept += sizes[start]
+        # Never open the verbatim window on an assistant reply (keep question/answer pairs)
+        while start < len(tail) - 1 and tail[start].get("role") != "user":
+            start += 1
+        return start
+
+    def _fold(self, turns, summarize):
+        if summarize is None:
+            return
+        try:
+            self.summary = summarize(self.summary, turns) or self.summary
+        except Exception as e:
+            # Degrade to truncation: the reply must not fail because of the summary
+            print(f"Conversation Summary Error: {e}")
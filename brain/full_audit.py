@@ -0,0 +1,51 @@
+import time
+import contextvars
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from brain.profile_analyzer import ProfileAnalyzer
+from brain.skills_advisor import SkillAdvisor
+from brain.network_advisor import NetworkAdvisor
+
+# Master bundle section -> tool name used in the performance logs
+AUDIT_SECTIONS = {
+    'profile': "Profile Optimizer",
+    'roadmap': "Skill Advisor",
+    'networking': "Networking Advisor"
+}
+
+def _timed(fn, *args):
+    start = time.time()
+    try:
+        result = fn(*args)
+    except Exception as e:
+        result = {"error": f"System Error: {str(e)}"}
+    # Each job owns its module instance, so last_usage/last_match belong to this call
+    return result, round(time.time() - start, 2), fn.__self__.last_usage, getattr(fn.__self__, "last_match", None)
+
+def run_full_audit(profile_text, target_role, language="English", on_result=None):
+    """
+    Runs the Profile, Skill and Networking analyses concurrently on the shared
+    Groq client, so wall-clock time tracks the slowest call instead of the sum.
+
+    `on_result(section, result, latency, usage, match)` is invoked in the caller's thread as
+    each section lands (safe for Streamlit calls). Returns {section: result}.
+    """
+    jobs = {
+        'profile': (ProfileAnalyzer().analyze_profile, profile_text),
+        'roadmap': (SkillAdvisor().analyze_skills, profile_text, target_role, language),
+        'networking': (NetworkAdvisor().get_recommendations, profile_text)
+    }
+
+    results = {}
+    with ThreadPoolExecutor(max_workers=len(jobs), thread_name_prefix="full-audit") as pool:
+        # Each job runs in a copy of the caller's context so its spans join the open trace
+        futures = {
+            pool.submit(contextvars.copy_context().run, _timed, job[0], *job[1:]): section
+            for section, job in jobs.items()
+        }
+        for future in as_completed(futures):
+            section = futures[future]
+            result, latency, usage, match = future.result()
+            results[section] = result
+            if on_result:
+                on_result(section, result, latency, usage, match)
+    return results
@@ -0,0 +1,191 @@
+import os
+import asyncio
+import threading
+import weakref
+import httpx
+import streamlit as st
+# Applies .env once per process (also when used as a library, without app.py)
+import config  # noqa: F401
+from openai import OpenAI, AsyncOpenAI, DefaultHttpxClient, DefaultAsyncHttpxClient
+from brain.rate_limiter import last_wait
+from brain.hedging import last_hedge
+
+# Point at mock_groq_server.py (or any OpenAI-compatible endpoint) for load tests
+GROQ_BASE_URL = os.getenv("GROQ_BASE_URL", "https://api.groq.com/openai/v1")
+
+# Connection pool tuning (override through .env or the deployment environment)
+MAX_CONNECTIONS = int(os.getenv("GROQ_MAX_CONNECTIONS", "100"))
+MAX_KEEPALIVE_CONNECTIONS = int(os.getenv("GROQ_MAX_KEEPALIVE_CONNECTIONS", "20"))
+KEEPALIVE_EXPIRY = float(os.getenv("GROQ_KEEPALIVE_EXPIRY", "60"))
+CONNECT_TIMEOUT = float(os.getenv("GROQ_CONNECT_TIMEOUT", "5"))
+REQUEST_TIMEOUT = float(os.getenv("GROQ_REQUEST_TIMEOUT", "60"))
+PREWARM_CONNECTIONS = int(os.getenv("GROQ_PREWARM_CONNECTIONS", "0"))
+
+_lock = threading.Lock()
+_client = None
+_api_key = None
+# httpx async pools are bound to the event loop that opened them
+_async_clients = weakref.WeakKeyDictionary()
+
+
+def get_api_key():
+    """
+    Resolves the Groq API key once per process (Cloud Secrets -> local .env).
+    Returns None when no key is configured.
+    """
+    global _api_key
+    if _api_key:
+        return _api_key
+
+    try:
+        # Check for Streamlit Cloud Secrets
+        if hasattr(st, "secrets") and "GROQ_API_KEY" in st.secrets:
+            _api_key = st.secrets["GROQ_API_KEY"]
+        else:
+            # Fallback to local .env
+            _api_key = os.getenv("GROQ_API_KEY")
+    except Exception:
+        # Final fallback if st.secrets triggers an error locally
+        _api_key = os.getenv("GROQ_API_KEY")
+    return _api_key
+
+
+def get_client():
+    """
+    Returns the process-wide Groq client shared by every brain module.
+    The underlying httpx pool keeps TLS connections alive between requests,
+    so only the first call in a process pays for the handshake.
+    """
+    global _client
+    if _client is not None:
+        return _client
+
+    with _lock:
+        if _client is None:
+            api_key = get_api_key()
+            if not api_key:
+                raise ValueError("CRITICAL: GROQ_API_KEY is missing. Add it to .env (local) or Secrets (cloud).")
+
+            _client = OpenAI(
+                api_key=api_key,
+                base_url=GROQ_BASE_URL,
+                timeout=_pool_timeout(),
+                # Retries are owned by brain/resilience.py (deadline, Retry-After, circuit breaker)
+                max_retries=0,
+                http_client=DefaultHttpxClient(limits=_pool_limits())
+            )
+    return _client
+
+
+def get_async_client():
+    """
+    Returns the AsyncOpenAI client for the running event loop (one per loop),
+    configured with the same pool limits and timeouts as get_client().
+    """
+    loop = asyncio.get_running_loop()
+    client = _async_clients.get(loop)
+    if client is None:
+        api_key = get_api_key()
+        if not api_key:
+            raise ValueError("CRITICAL: GROQ_API_KEY is missing. Add it to .env (local) or Secrets (cloud).")
+
+        client = AsyncOpenAI(
+            api_key=api_key,
+            base_url=GROQ_BASE_URL,
+            timeout=_pool_timeout(),
+            max_retries=0,
+            http_client=DefaultAsyncHttpxClient(limits=_pool_limits())
+        )
+        _async_clients[loop] = client
+    return client
+
+
+async def aclose_async_client():
+    """Releases the running loop's async connection pool (call before the loop ends)."""
+    client = _async_clients.pop(asyncio.get_running_loop(), None)
+    if client is not None:
+        await client.close()
+
+
+def _pool_limits():
+    return httpx.Limits(
+        max_connections=MAX_CONNECTIONS,
+        max_keepalive_connections=MAX_KEEPALIVE_CONNECTIONS,
+        keepalive_expiry=KEEPALIVE_EXPIRY
+    )
+
+
+def _pool_timeout():
+    return httpx.Timeout(REQUEST_TIMEOUT, connect=CONNECT_TIMEOUT)
+
+
+def warm_up(connections=None, wait=True):
+    """
+    Opens `connections` keep-alive sockets ahead of the first user request.
+    Uses the lightweight models endpoint; failures are ignored on purpose.
+    With wait=False the pings run in the background and the call returns at once.
+    """
+    count = PREWARM_CONNECTIONS if connections is None else connections
+    count = min(count, MAX_KEEPALIVE_CONNECTIONS)
+    if count <= 0:
+        return 0
+
+    try:
+        client = get_client()
+    except ValueError:
+        # No API key yet: the brain modules will surface the error on first use
+        return 0
+
+    def _ping():
+        try:
+            client.models.list()
+        except Exception:
+            pass
+
+    # Concurrent pings force the pool to open separate connections
+    threads = [threading.Thread(target=_ping, daemon=True) for _ in range(count)]
+    for t in threads:
+        t.start()
+    if wait:
+        for t in threads:
+            t.join(timeout=CONNECT_TIMEOUT + 5)
+    return count
+
+
+def close_client():
+    """Releases pooled connections (used by CLI tools on exit)."""
+    global _client
+    with _lock:
+        if _client is not None:
+            _client.close()
+            _client = None
+
+
+def extract_usage(payload):
+    """
+    Normalizes token usage from a completion (or the final stream chunk).
+    Groq adds server-side timings (queue/prompt/completion seconds) to `usage`,
+    or to `x_groq.usage` on streamed chunks. Returns None when absent.
+    """
+    usage = getattr(payload, "usage", None)
+    if usage is None:
+        x_groq = getattr(payload, "x_groq", None)
+        usage = x_groq.get("usage") if isinstance(x_groq, dict) else getattr(x_groq, "usage", None)
+    if usage is None:
+        return None
+    if not isinstance(usage, dict):
+        usage = usage.model_dump() if hasattr(usage, "model_dump") else dict(vars(usage))
+
+    return {
+        "model": getattr(payload, "model", None),
+        "prompt_tokens": usage.get("prompt_tokens"),
+        "completion_tokens": usage.get("completion_tokens"),
+        "total_tokens": usage.get("total_tokens"),
+        "queue_time": usage.get("queue_time"),
+        "prompt_time": usage.get("prompt_time"),
+        "completion_time": usage.get("completion_time"),
+        # Client-side: seconds call_groq() spent queued for RPM/TPM quota
+        "rate_limit_wait": last_wait(),
+        # Client-side: whether a duplicate request was raced (brain/hedging.py) and won
+        **(last_hedge() or {})
+    }
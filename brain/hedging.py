@@ -0,0 +1,331 @@
+import os
+import asyncio
+import threading
+import contextvars
+import collections
+import concurrent.futures
+import time
+from tracing import span
+
+# Request hedging (override through .env or the deployment environment)
+HEDGING_ENABLED = os.getenv("LINKBRAIN_HEDGING_ENABLED", "1") != "0"
+# Idempotent JSON tools whose calls may be duplicated
+HEDGE_TOOLS = tuple(t.strip() for t in os.getenv("LINKBRAIN_HEDGE_TOOLS", "profile,skills").split(",") if t.strip())
+# A second request goes out once the first is slower than this percentile of recent calls
+HEDGE_PERCENTILE = float(os.getenv("LINKBRAIN_HEDGE_PERCENTILE", "95"))
+HEDGE_MIN_DELAY = float(os.getenv("LINKBRAIN_HEDGE_MIN_DELAY", "0.5"))  # seconds, floor of the threshold
+# At most this share of calls may send a hedge (the extra quota spent)
+HEDGE_MAX_RATE = float(os.getenv("LINKBRAIN_HEDGE_MAX_RATE", "0.1"))
+# Latencies per tool and model before a threshold is trusted, and how many are kept
+HEDGE_MIN_SAMPLES = int(os.getenv("LINKBRAIN_HEDGE_MIN_SAMPLES", "20"))
+HEDGE_WINDOW = 200
+# Unused hedge allowance that may pile up during quiet periods
+HEDGE_BURST = 3.0
+# Threads that run the duplicates of sync calls; a hedge is skipped, never queued, while all are busy
+HEDGE_WORKERS = int(os.getenv("LINKBRAIN_HEDGE_WORKERS", "4"))
+
+# Outcome of the most recent call_groq() (read by extract_usage)
+_last_hedge = contextvars.ContextVar("linkbrain_last_hedge", default=None)
+
+
+def last_hedge():
+    return _last_hedge.get()
+
+
+def set_last_hedge(outcome):
+    _last_hedge.set(outcome)
+
+
+class Hedger:
+    """
+    Tail-latency hedging for idempotent Groq calls. Per tool and model it keeps
+    a window of recent latencies; a call still running past their percentile
+    gets an identical second request through the caller's own `create`. Async
+    calls race the two and cancel the loser; a sync call keeps its request on
+    the caller's thread and falls back to the duplicate only when it fails
+    (see run()). A credit bucket refilled by HEDGE_MAX_RATE per call
+    bounds the extra requests, and a hedge is only sent when the rate limiter
+    has quota for it right away.
+    """
+
+    def __init__(self, enabled=HEDGING_ENABLED, tools=HEDGE_TOOLS, percentile=HEDGE_PERCENTILE,
+                 max_rate=HEDGE_MAX_RATE, min_samples=HEDGE_MIN_SAMPLES, workers=HEDGE_WORKERS):
+        self.enabled = enabled and max_rate > 0
+        self.tools = set(tools)
+        self.percentile = percentile
+        self.max_rate = max_rate
+        self.min_samples = min_samples
+        self._lock = threading.Lock()
+        self._latencies = {}  # (tool, model) -> deque of seconds
+        self._credit = 1.0
+        self.workers = max(1, workers)
+        self._pool = None
+        self._free_workers = threading.BoundedSemaphore(self.workers)
+        self._stats = {"calls": 0, "hedged": 0, "hedge_won": 0, "skipped_budget": 0, "skipped_quota": 0,
+                       "skipped_busy": 0, "abandoned": 0}
+
+    def applies(self, tool):
+        return self.enabled and tool in self.tools
+
+    def observe(self, tool, model, seconds):
+        """Adds the latency of a successful call to the tool's window."""
+        with self._lock:
+            window = self._latencies.get((tool, model))
+            if window is None:
+                window = self._latencies[(tool, model)] = collections.deque(maxlen=HEDGE_WINDOW)
+            window.append(seconds)
+
+    def threshold(self, tool, model):
+        """Seconds after which a call is hedged, or None while too few samples exist."""
+        with self._lock:
+            window = self._latencies.get((tool, model))
+            if window is None or len(window) < self.min_samples:
+                return None
+            ordered = sorted(window)
+        index = min(len(ordered) - 1, int(len(ordered) * self.percentile / 100))
+        return max(HEDGE_MIN_DELAY, ordered[index])
+
+    def _deposit(self):
+        with self._lock:
+            self._stats["calls"] += 1
+            self._credit = min(HEDGE_BURST, self._credit + self.max_rate)
+
+    def _has_credit(self):
+        with self._lock:
+            return self._credit >= 1.0
+
+    def _spend(self):
+        with self._lock:
+            if self._credit < 1.0:
+                self._stats["skipped_budget"] += 1
+                return False
+            self._credit -= 1.0
+            return True
+
+    def _reserve_quota(self, tokens):
+        from brain.rate_limiter import get_rate_limiter
+
+        limiter = get_rate_limiter()
+        if limiter is None or limiter.try_acquire(tokens):
+            return True
+        with self._lock:
+            self._stats["skipped_quota"] += 1
+        return False
+
+    async def race(self, create, params, tool, tokens=0):
+        """
+        Awaits `create(**params)`, hedging it once past the tool's threshold.
+        Returns (response, outcome) with outcome {"hedged": 0/1, "hedge_won": 0/1}.
+        """
+        model = params.get("model")
+        delay = self.threshold(tool, model)
+        self._deposit()
+        started = time.monotonic()
+        primary = asyncio.ensure_future(create(**params))
+        try:
+            if delay is not None:
+                await asyncio.wait({primary}, timeout=delay)
+            if primary.done() or delay is None or not self._spend():
+                response = await primary
+                self.observe(tool, model, time.monotonic() - started)
+                return response, {"hedged": 0, "hedge_won": 0}
+            # A blocking SQLite transaction: keep it off the event loop
+            if not await asyncio.to_thread(self._reserve_quota, tokens):
+                # The credit stays unused: give it back
+                with self._lock:
+                    self._credit += 1.0
+                response = await primary
+                self.observe(tool, model, time.monotonic() - started)
+                return response, {"hedged": 0, "hedge_won": 0}
+
+            with span("groq.hedge", tool=tool, model=model, after_ms=round(delay * 1000, 1)) as sp:
+                hedge = asyncio.ensure_future(create(**params))
+                try:
+                    winner = await self._first_success(primary, hedge)
+                finally:
+                    for task in (primary, hedge):
+                        if not task.done():
+                            task.cancel()
+                hedge_won = winner is hedge
+                sp.set(hedge_won=hedge_won)
+            with self._lock:
+                self._stats["hedged"] += 1
+                self._stats["hedge_won"] += int(hedge_won)
+            self.observe(tool, model, time.monotonic() - started)
+            return winner.result(), {"hedged": 1, "hedge_won": int(hedge_won)}
+        finally:
+            if not primary.done():
+                primary.cancel()
+
+    @staticmethod
+    async def _first_success(*tasks):
+        """The first task to finish without an error; the first error when all of them fail."""
+        pending, first_error = set(tasks), None
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in tasks:
+                if task not in done:
+                    continue
+                if task.exception() is None:
+                    return task
+                first_error = first_error or task
+        return first_error
+
+    def _refund(self):
+        """The credit was spent but no hedge went out: give it back."""
+        with self._lock:
+            self._credit += 1.0
+
+    def _submit(self, fn, *args):
+        """Runs fn on a free hedge worker; None when all HEDGE_WORKERS are busy."""
+        if not self._free_workers.acquire(blocking=False):
+            with self._lock:
+                self._stats["skipped_busy"] += 1
+            return None
+        if self._pool is None:
+            with self._lock:
+                if self._pool is None:
+                    self._pool = concurrent.futures.ThreadPoolExecutor(
+                        max_workers=self.workers, thread_name_prefix="linkbrain-hedging")
+        future = self._pool.submit(fn, *args)
+        future.add_done_callback(lambda _: self._free_workers.release())
+        return future
+
+    def run(self, create, params, tool, tokens=0):
+        """
+        Blocking variant of race() for the sync brain modules, same return value.
+        The first request always runs on the caller's thread, which cannot be
+        interrupted, so the duplicate is a standby rather than a race: once the
+        request has been out for the threshold, a copy goes to a hedge worker.
+        If the first request then fails, the copy's answer is used instead of a
+        retry from scratch; if it succeeds, the copy is abandoned.
+        """
+        model = params.get("model")
+        delay = self.threshold(tool, model)
+        self._deposit()
+        if delay is None or not self._has_credit():
+            started = time.monotonic()
+            response = create(**params)
+            self.observe(tool, model, time.monotonic() - started)
+            return response, {"hedged": 0, "hedge_won": 0}
+
+        standby = _Standby(self, create, params, tool, model, tokens, delay)
+        # The timer starts with the request itself, on the caller's thread
+        timer = threading.Timer(delay, standby.fire)
+        timer.daemon = True
+        started = time.monotonic()
+        timer.start()
+        try:
+            response = create(**params)
+        except Exception:
+            timer.cancel()
+            hedge = standby.settle(abandon=False)
+            if hedge is None:
+                raise
+            try:
+                response = hedge.result()
+            except Exception:
+                pass
+            else:
+                with self._lock:
+                    self._stats["hedge_won"] += 1
+                self.observe(tool, model, time.monotonic() - started)
+                return response, {"hedged": 1, "hedge_won": 1}
+            raise
+        timer.cancel()
+        hedge = standby.settle(abandon=True)
+        self.observe(tool, model, time.monotonic() - started)
+        return response, {"hedged": int(hedge is not None), "hedge_won": 0}
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            windows = {f"{tool}/{model}": len(w) for (tool, model), w in self._latencies.items()}
+        stats["hedge_rate"] = round(stats["hedged"] / stats["calls"], 4) if stats["calls"] else 0.0
+        stats["win_rate"] = round(stats["hedge_won"] / stats["hedged"], 4) if stats["hedged"] else 0.0
+        stats["samples"] = windows
+        return stats
+
+
+class _Standby:
+    """The duplicate of one sync call: sent by a timer, used or abandoned once the first request ends."""
+
+    def __init__(self, hedger, create, params, tool, model, tokens, delay):
+        self.hedger = hedger
+        self.create = create
+        self.params = params
+        self.tool = tool
+        self.model = model
+        self.tokens = tokens
+        self.delay = delay
+        # The caller's context, so the hedge span nests under its trace
+        self.context = contextvars.copy_context()
+        self._lock = threading.Lock()
+        self._settled = False
+        self._abandoned = False
+        self._response = None
+        self.future = None
+
+    def fire(self):
+        """Timer thread: sends the duplicate unless the first request ended, or budget, quota or workers lack."""
+        hedger = self.hedger
+        with self._lock:
+            if self._settled or not hedger._spend():
+                return
+            if not hedger._reserve_quota(self.tokens):
+                hedger._refund()
+                return
+            self.future = hedger._submit(self.context.run, self._send)
+            if self.future is None:
+                hedger._refund()
+                return
+            with hedger._lock:
+                hedger._stats["hedged"] += 1
+
+    def _send(self):
+        with span("groq.hedge", tool=self.tool, model=self.model, after_ms=round(self.delay * 1000, 1)) as sp:
+            response = self.create(**self.params)
+            with self._lock:
+                self._response = response
+                abandoned = self._abandoned
+            sp.set(abandoned=abandoned)
+        if abandoned:
+            self._discard(response)
+        return response
+
+    def settle(self, abandon):
+        """Called once the first request ended; returns the duplicate's future (None when none was sent)."""
+        with self._lock:
+            self._settled = True
+            future = self.future
+            self._abandoned = abandon and future is not None
+            # Answered already: nobody else will drop it
+            late = self._response if self._abandoned else None
+        if self._abandoned:
+            with self.hedger._lock:
+                self.hedger._stats["abandoned"] += 1
+            future.cancel()
+            if late is not None:
+                self._discard(late)
+        return future
+
+    @staticmethod
+    def _discard(response):
+        # A raw or streamed response holds its connection until closed
+        close = getattr(response, "close", None)
+        if callable(close):
+            close()
+
+
+_lock = threading.Lock()
+_hedger = None
+
+
+def get_hedger():
+    """Returns the process-wide hedger (its latency windows are per process)."""
+    global _hedger
+    if _hedger is None:
+        with _lock:
+            if _hedger is None:
+                _hedger = Hedger()
+    return _hedger
@@ -0,0 +1,240 @@
+import os
+import json
+import time
+import threading
+import openai
+from tracing import span
+from brain.conversation_memory import estimate_tokens
+
+# Model tiers and routing switches (override through .env or the deployment environment)
+ROUTING_ENABLED = os.getenv("LINKBRAIN_ROUTING_ENABLED", "1") != "0"
+LARGE_MODEL = os.getenv("GROQ_LARGE_MODEL", "llama-3.3-70b-versatile")
+FAST_MODEL = os.getenv("GROQ_FAST_MODEL", "llama-3.1-8b-instant")
+# The fast tier is skipped while its recent error or escalation rate is above these
+ROUTE_MAX_ERROR_RATE = float(os.getenv("LINKBRAIN_ROUTE_MAX_ERROR_RATE", "0.2"))
+ROUTE_MAX_ESCALATION_RATE = float(os.getenv("LINKBRAIN_ROUTE_MAX_ESCALATION_RATE", "0.3"))
+# Samples per model before live latency is trusted over the static policy
+ROUTE_MIN_SAMPLES = int(os.getenv("LINKBRAIN_ROUTE_MIN_SAMPLES", "20"))
+# Weight of the newest observation in the moving averages
+EWMA_ALPHA = 0.1
+# Error/escalation rates halve every this many seconds without new samples, so
+# a tier that was switched off is tried again once its trouble is old news
+ROUTE_RECOVERY_HALF_LIFE = float(os.getenv("LINKBRAIN_ROUTE_RECOVERY_HALF_LIFE", "60"))
+
+# Per-tool policy: inputs up to `fast_max_input_tokens` may go to the fast model
+# (0 = always the large one); `required_keys` is the JSON schema a fast answer
+# must satisfy, otherwise the call is escalated to the large model.
+ROUTING_POLICIES = {
+    "post": {"fast_max_input_tokens": 40, "required_keys": None},
+    "chat": {"fast_max_input_tokens": 30, "required_keys": None},
+    "skills": {"fast_max_input_tokens": 120,
+               "required_keys": ("gap_analysis", "tech_skills", "soft_skills", "roadmap")},
+    "profile": {"fast_max_input_tokens": 200,
+                "required_keys": ("score", "summary", "strengths", "weaknesses", "actionable_tips")},
+    # Naming real, current influencers needs the large model's world knowledge
+    "networking": {"fast_max_input_tokens": 0, "required_keys": ("target_niche", "recommendations")},
+}
+
+
+class InvalidModelOutput(ValueError):
+    """A completion that is not valid JSON or misses keys of the required schema."""
+
+
+class _Health:
+    """Moving averages of latency, errors and escalations for one model and call kind."""
+    __slots__ = ("samples", "latency", "error_rate", "escalation_rate", "updated_at")
+
+    def __init__(self):
+        self.samples = 0
+        self.latency = None
+        self.error_rate = 0.0
+        self.escalation_rate = 0.0
+        self.updated_at = time.monotonic()
+
+    def decay(self):
+        """Fades the failure rates by the time passed since the last sample."""
+        now = time.monotonic()
+        factor = 0.5 ** ((now - self.updated_at) / ROUTE_RECOVERY_HALF_LIFE)
+        self.error_rate *= factor
+        self.escalation_rate *= factor
+        self.updated_at = now
+
+
+class ModelRouter:
+    """
+    Chooses the Groq model tier per call from the tool's policy (input size,
+    output schema) and live, in-process latency/error statistics per model.
+    Structured answers from the fast tier that fail validation are retried on
+    the large model; every decision is returned for the perf logs.
+    """
+
+    def __init__(self, fast_model=FAST_MODEL, large_model=LARGE_MODEL, enabled=ROUTING_ENABLED):
+        self.fast_model = fast_model
+        self.large_model = large_model
+        self.enabled = enabled and fast_model != large_model
+        self._lock = threading.Lock()
+        self._health = {}  # (model, kind) -> _Health
+        self._escalations = {}  # tool -> _Health (escalation_rate only)
+
+    def _get(self, table, key):
+        health = table.get(key)
+        if health is None:
+            health = table[key] = _Health()
+        return health
+
+    def observe(self, model, kind, seconds, ok):
+        """Folds one finished call into the model's statistics (kind: 'complete' or 'stream')."""
+        with self._lock:
+            health = self._get(self._health, (model, kind))
+            health.decay()
+            health.samples += 1
+            health.error_rate += EWMA_ALPHA * ((0.0 if ok else 1.0) - health.error_rate)
+            if ok:
+                health.latency = seconds if health.latency is None else \
+                    health.latency + EWMA_ALPHA * (seconds - health.latency)
+
+    def _observe_escalation(self, tool, escalated):
+        with self._lock:
+            health = self._get(self._escalations, tool)
+            health.decay()
+            health.samples += 1
+            health.escalation_rate += EWMA_ALPHA * ((1.0 if escalated else 0.0) - health.escalation_rate)
+
+    def route(self, tool, input_text, stream=False):
+        """Returns {"model", "route_reason"} for one call of `tool` on `input_text`."""
+        if not self.enabled:
+            return {"model": self.large_model, "route_reason": "routing_off"}
+        policy = ROUTING_POLICIES[tool]
+        if estimate_tokens(input_text) > policy["fast_max_input_tokens"]:
+            return {"model": self.large_model, "route_reason": "input_size"}
+
+        kind = "stream" if stream else "complete"
+        with self._lock:
+            fast = self._get(self._health, (self.fast_model, kind))
+            large = self._get(self._health, (self.large_model, kind))
+            escalations = self._get(self._escalations, tool)
+            fast.decay()
+            escalations.decay()
+        if fast.error_rate > ROUTE_MAX_ERROR_RATE:
+            return {"model": self.large_model, "route_reason": "fast_errors"}
+        if escalations.escalation_rate > ROUTE_MAX_ESCALATION_RATE:
+            return {"model": self.large_model, "route_reason": "fast_schema_failures"}
+        if (fast.samples >= ROUTE_MIN_SAMPLES and large.samples >= ROUTE_MIN_SAMPLES
+                and fast.latency is not None and large.latency is not None and fast.latency >= large.latency):
+            return {"model": self.large_model, "route_reason": "fast_slower"}
+        return {"model": self.fast_model, "route_reason": "fast_eligible"}
+
+    def stats(self):
+        with self._lock:
+            models = {f"{model}/{kind}": {"samples": h.samples, "latency_s": h.latency and round(h.latency, 4),
+                                          "error_rate": round(h.error_rate, 4)}
+                      for (model, kind), h in self._health.items()}
+            escalations = {tool: round(h.escalation_rate, 4) for tool, h in self._escalations.items()}
+        return {"models": models, "escalation_rate": escalations}
+
+
+def parse_json(content, required_keys=None):
+    """Parses a JSON-mode completion and checks the tool's required keys."""
+    with span("json.parse"):
+        try:
+            result = json.loads(content)
+        except (TypeError, ValueError) as e:
+            raise InvalidModelOutput(f"Invalid JSON from model: {e}") from e
+    if not isinstance(result, dict):
+        raise InvalidModelOutput("Model returned JSON that is not an object")
+    missing = [key for key in required_keys or () if key not in result]
+    if missing:
+        raise InvalidModelOutput(f"Model output misses keys: {', '.join(missing)}")
+    return result
+
+
+def _schema_failure(error):
+    # Groq rejects JSON-mode output it cannot parse with a 400 json_validate_failed
+    return isinstance(error, InvalidModelOutput) or (
+        isinstance(error, openai.BadRequestError) and "json_validate_failed" in str(error))
+
+
+def complete_json(tool, create, input_text, decision=None, **params):
+    """
+    Routed JSON-mode completion: returns (result, usage) where usage (see
+    groq_client.extract_usage) also carries route_reason and escalated.
+    A fast-tier answer that is invalid or misses the schema is redone on the large model.
+    `decision` is a route() result the caller already keyed its cache by.
+    """
+    # Imported here: resilience reports call latencies back to this module
+    from brain.resilience import call_groq
+    from brain.groq_client import extract_usage
+
+    router = get_router()
+    decision = decision or router.route(tool, input_text)
+    required_keys = ROUTING_POLICIES[tool]["required_keys"]
+    escalated = False
+    try:
+        response = call_groq(create, hedge=tool, **{**params, "model": decision["model"]})
+        # The schema is only enforced on fast-tier answers, which have a fallback
+        fast = decision["model"] == router.fast_model
+        result = parse_json(response.choices[0].message.content, required_keys if fast else None)
+    except Exception as e:
+        if decision["model"] == router.large_model or not _schema_failure(e):
+            raise
+        escalated = True
+        with span("route.escalate", tool=tool, reason=str(e)[:120]):
+            response = call_groq(create, hedge=tool, **{**params, "model": router.large_model})
+            result = parse_json(response.choices[0].message.content)
+    finally:
+        if decision["model"] == router.fast_model:
+            router._observe_escalation(tool, escalated)
+    usage = annotate(extract_usage(response), decision, escalated)
+    return result, usage
+
+
+async def acomplete_json(tool, create, input_text, decision=None, **params):
+    """Asyncio variant of complete_json: `create(**params)` returns an awaitable."""
+    from brain.resilience import acall_groq
+    from brain.groq_client import extract_usage
+
+    router = get_router()
+    decision = decision or router.route(tool, input_text)
+    required_keys = ROUTING_POLICIES[tool]["required_keys"]
+    escalated = False
+    try:
+        response = await acall_groq(create, hedge=tool, **{**params, "model": decision["model"]})
+        # The schema is only enforced on fast-tier answers, which have a fallback
+        fast = decision["model"] == router.fast_model
+        result = parse_json(response.choices[0].message.content, required_keys if fast else None)
+    except Exception as e:
+        if decision["model"] == router.large_model or not _schema_failure(e):
+            raise
+        escalated = True
+        with span("route.escalate", tool=tool, reason=str(e)[:120]):
+            response = await acall_groq(create, hedge=tool, **{**params, "model": router.large_model})
+            result = parse_json(response.choices[0].message.content)
+    finally:
+        if decision["model"] == router.fast_model:
+            router._observe_escalation(tool, escalated)
+    usage = annotate(extract_usage(response), decision, escalated)
+    return result, usage
+
+
+def annotate(usage, decision, escalated=False):
+    """Adds the routing decision to a usage dict (the perf log row)."""
+    usage = dict(usage or {})
+    usage["route_reason"] = decision["route_reason"]
+    usage["escalated"] = int(escalated)
+    if not usage.get("model"):
+        usage["model"] = decision["model"]
+    return usage
+
+
+_lock = threading.Lock()
+_router = None
+
+
+def get_router():
+    """Returns the process-wide model router (its statistics are per process)."""
+    global _router
+    if _router is None:
+        with _lock:
+            if _router is None:
+                _router = ModelRouter()
+    return _router
@@ -0,0 +1,229 @@
+import os
+import re
+import time
+import sqlite3
+import hashlib
+import threading
+from collections import OrderedDict
+import numpy as np
+from tracing import span
+from brain.response_cache import CACHE_DB_PATH, normalize_text
+
+# Near-duplicate reuse (override through .env or the deployment environment)
+DEDUP_ENABLED = os.getenv("LINKBRAIN_DEDUP_ENABLED", "1") != "0"
+DEDUP_MAX_DISTANCE = int(os.getenv("LINKBRAIN_DEDUP_MAX_DISTANCE", "3"))  # differing bits out of 64
+DEDUP_MIN_TOKENS = int(os.getenv("LINKBRAIN_DEDUP_MIN_TOKENS", "30"))     # short inputs are never matched
+DEDUP_MAX_ITEMS = int(os.getenv("LINKBRAIN_DEDUP_MAX_ITEMS", "300000"))
+
+FINGERPRINT_BITS = 64
+SHINGLE_SIZE = 3
+
+
+def _to_signed(value):
+    # SQLite INTEGER is signed 64-bit
+    return value - (1 << 64) if value >= (1 << 63) else value
+
+
+def simhash(text):
+    """
+    64-bit SimHash over word 3-shingles of the normalized text, or None when the
+    text is too short to fingerprint reliably. Near-identical texts (a fixed
+    typo, one extra line) land within a few bits of each other.
+    """
+    tokens = re.findall(r"\w+", normalize_text(text).lower())
+    if len(tokens) < DEDUP_MIN_TOKENS:
+        return None
+    shingles = {" ".join(tokens[i:i + SHINGLE_SIZE]) for i in range(len(tokens) - SHINGLE_SIZE + 1)}
+    digests = b"".join(hashlib.blake2b(s.encode("utf-8"), digest_size=8).digest() for s in shingles)
+    # Majority vote per bit position across all shingle hashes
+    bits = np.unpackbits(np.frombuffer(digests, dtype=np.uint8).reshape(-1, 8), axis=1)
+    votes = bits.sum(axis=0) * 2 > len(shingles)
+    return int.from_bytes(np.packbits(votes).tobytes(), "big")
+
+
+class SimHashIndex:
+    """
+    Fingerprint index mapping inputs to the response-cache key of their result.
+    Fingerprints are split into max_distance + 1 bands: by the pigeonhole
+    principle any match within max_distance bits agrees exactly on at least one
+    band, so a lookup only compares the few entries sharing a band value.
+    Entries are persisted next to the response cache and bounded LRU-style.
+    """
+
+    def __init__(self, db_path=CACHE_DB_PATH, max_distance=DEDUP_MAX_DISTANCE, max_items=DEDUP_MAX_ITEMS):
+        self.db_path = db_path
+        self.max_distance = max_distance
+        self.max_items = max_items
+        self.bands = max_distance + 1
+        self.band_bits = FINGERPRINT_BITS // self.bands
+
+        self._entries = OrderedDict()  # cache_key -> (scope, fingerprint)
+        self._buckets = {}             # (scope, band, band_value) -> set of cache_keys
+        self._lock = threading.Lock()
+        self._stats = {"lookups": 0, "matches": 0, "candidates": 0}
+
+        self._conn = None
+        try:
+            self._conn = sqlite3.connect(self.db_path, check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute('''CREATE TABLE IF NOT EXISTS simhash_index
+                                  (cache_key TEXT PRIMARY KEY,
+                                   scope TEXT,
+                                   fingerprint INTEGER,
+                                   created_at REAL)''')
+            self._conn.commit()
+            rows = self._conn.execute(
+                "SELECT cache_key, scope, fingerprint FROM simhash_index ORDER BY created_at DESC LIMIT ?",
+                (self.max_items,)
+            ).fetchall()
+            for cache_key, scope, fingerprint in reversed(rows):
+                self._insert(cache_key, scope, fingerprint & ((1 << 64) - 1))
+            # Rows past the bound (written before eviction deleted them, or by a
+            # process with a larger bound) would only be reloaded and skipped again
+            self._conn.execute(
+                "DELETE FROM simhash_index WHERE cache_key NOT IN "
+                "(SELECT cache_key FROM simhash_index ORDER BY created_at DESC LIMIT ?)",
+                (self.max_items,)
+            )
+            self._conn.commit()
+        except Exception as e:
+            # Persistence is optional: keep indexing in memory only
+            print(f"SimHash Index Error: {e}")
+            self._conn = None
+
+    def _band_values(self, fingerprint):
+        mask = (1 << self.band_bits) - 1
+        return [(fingerprint >> (band * self.band_bits)) & mask for band in range(self.bands)]
+
+    def _insert(self, cache_key, scope, fingerprint):
+        # Caller holds the lock (or is the constructor)
+        if cache_key in self._entries:
+            self._discard(cache_key)
+        self._entries[cache_key] = (scope, fingerprint)
+        for band, value in enumerate(self._band_values(fingerprint)):
+            self._buckets.setdefault((scope, band, value), set()).add(cache_key)
+        while len(self._entries) > self.max_items:
+            self._discard(next(iter(self._entries)))
+
+    def _discard(self, cache_key):
+        # Caller holds the lock and commits: the row goes with the in-memory entry
+        scope, fingerprint = self._entries.pop(cache_key)
+        if self._conn is not None:
+            try:
+                self._conn.execute("DELETE FROM simhash_index WHERE cache_key = ?", (cache_key,))
+            except Exception as e:
+                print(f"SimHash Index Error: {e}")
+        for band, value in enumerate(self._band_values(fingerprint)):
+            bucket = self._buckets.get((scope, band, value))
+            if bucket is not None:
+                bucket.discard(cache_key)
+                if not bucket:
+                    del self._buckets[(scope, band, value)]
+
+    def add(self, scope, fingerprint, cache_key):
+        """Indexes the fingerprint of an input whose result is stored under cache_key."""
+        if fingerprint is None:
+            return
+        with self._lock:
+            self._insert(cache_key, scope, fingerprint)
+            if self._conn is None:
+                return
+            try:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO simhash_index (cache_key, scope, fingerprint, created_at) VALUES (?, ?, ?, ?)",
+                    (cache_key, scope, _to_signed(fingerprint), time.time())
+                )
+                self._conn.commit()
+            except Exception as e:
+                print(f"SimHash Index Error: {e}")
+
+    def find(self, scope, fingerprint):
+        """Returns (cache_key, hamming_distance) of the closest indexed input, or None."""
+        if fingerprint is None:
+            return None
+        with self._lock:
+            self._stats["lookups"] += 1
+            candidates = set()
+            for band, value in enumerate(self._band_values(fingerprint)):
+                candidates.update(self._buckets.get((scope, band, value), ()))
+            self._stats["candidates"] += len(candidates)
+
+            best = None
+            for cache_key in candidates:
+                distance = bin(self._entries[cache_key][1] ^ fingerprint).count("1")
+                if distance <= self.max_distance and (best is None or distance < best[1]):
+                    best = (cache_key, distance)
+            if best is not None:
+                self._stats["matches"] += 1
+                # Refresh recency so popular profiles stay indexed
+                self._entries.move_to_end(best[0])
+            return best
+
+    def forget(self, cache_key):
+        """Drops an entry whose cached result no longer exists."""
+        with self._lock:
+            if cache_key in self._entries:
+                self._discard(cache_key)
+                self._commit()
+
+    def _commit(self):
+        if self._conn is None:
+            return
+        try:
+            self._conn.commit()
+        except Exception as e:
+            print(f"SimHash Index Error: {e}")
+
+    def stats(self):
+        with self._lock:
+            return {**self._stats, "items": len(self._entries)}
+
+
+_lock = threading.Lock()
+_index = None
+
+
+def get_index():
+    """Returns the process-wide fingerprint index (None when disabled)."""
+    global _index
+    if not DEDUP_ENABLED:
+        return None
+    if _index is None:
+        with _lock:
+            if _index is None:
+                _index = SimHashIndex()
+    return _index
+
+
+def find_similar(cache, scope, text):
+    """
+    Looks for a stored result of a near-identical input.
+    Returns (result, match, fingerprint); result and match are None on a miss.
+    `match` is {"cache_match": "near", "distance": bits, "similarity": 0-1}.
+    """
+    index = get_index()
+    if cache is None or index is None:
+        return None, None, None
+    with span("dedup.lookup") as sp:
+        fingerprint = simhash(text)
+        found = index.find(scope, fingerprint)
+        sp.set(hit=found is not None)
+        if found is None:
+            return None, None, fingerprint
+        cache_key, distance = found
+        result = cache.get(cache_key)
+        if result is None:
+            # The result expired or was evicted from the response cache
+            index.forget(cache_key)
+            sp.set(hit=False)
+            return None, None, fingerprint
+        sp.set(distance=distance)
+        return result, {"cache_match": "near", "distance": distance,
+                        "similarity": round(1 - distance / FINGERPRINT_BITS, 3)}, fingerprint
+
+
+def remember(scope, fingerprint, cache_key):
+    """Indexes a freshly computed result for future near-duplicate lookups."""
+    index = get_index()
+    if index is not None:
+        index.add(scope, fingerprint, cache_key)
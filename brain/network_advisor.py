@@ -1,12 +1,14 @@
-import os
-import streamlit as st
-import json
-from openai import OpenAI
-from dotenv import load_dotenv
-from tenacity import retry, stop_after_attempt, wait_exponential
+from tracing import traced
+from brain.groq_client import get_api_key, get_client
+from brain.response_cache import get_cache, make_key
+from brain.near_duplicate import find_similar, remember
+from brain.model_router import LARGE_MODEL, get_router, complete_json
+from brain.single_flight import get_single_flight
 
-# Load environment variables for local development access
-load_dotenv()
+# Bump whenever the prompt template changes so stale cache entries are ignored
+PROMPT_VERSION = "1"
+# Near-duplicate lookups only match inputs analyzed with the same prompt
+DEDUP_SCOPE = f"networking:{PROMPT_VERSION}"
 
 class NetworkAdvisor:
     """
@@ -14,35 +16,28 @@ class NetworkAdvisor:
     Supports multilingual output (English, Arabic, French).
     """
     
+    @traced(tool="Networking Advisor")
     def __init__(self):
         # 1. Initialize attributes to None to avoid "no attribute 'client'" errors
         self.client = None
         self.api_key = None
-        self.model = "llama-3.3-70b-versatile"
+        self.model = LARGE_MODEL
+        # Token usage of the most recent Groq call (None when served from cache)
+        self.last_usage = None
+        # How the most recent result was reused from the cache (None when freshly generated)
+        self.last_match = None
 
-        # 2. Securely fetch the API key with fallback logic (Cloud -> Local)
-        try:
-            # Attempt to pull from Streamlit Cloud Secrets
-            if hasattr(st, "secrets") and "GROQ_API_KEY" in st.secrets:
-                self.api_key = st.secrets["GROQ_API_KEY"]
-            else:
-                # Fallback to local .env variable
-                self.api_key = os.getenv("GROQ_API_KEY")
-        except Exception:
-            # Final fallback to os.getenv if st.secrets is unavailable locally
-            self.api_key = os.getenv("GROQ_API_KEY")
+        # 2. Resolve the API key once per process (Cloud Secrets -> local .env)
+        self.api_key = get_api_key()
 
-        # 3. Validate key existence
+        # 3. Validate API key existence
         if not self.api_key:
             raise ValueError("CRITICAL: GROQ_API_KEY is missing. Add it to .env (local) or Secrets (cloud).")
 
-        # 4. Initialize the Groq-powered OpenAI client
-        self.client = OpenAI(
-            api_key=self.api_key,
-            base_url="https://api.groq.com/openai/v1"
-        )
+        # 4. Reuse the process-wide pooled Groq client (keep-alive connections)
+        self.client = get_client()
 
-    @retry(stop=stop_after_attempt(3), wait=wait_exponential(multiplier=1, min=2, max=6))
+    @traced(tool="Networking Advisor")
     def get_recommendations(self, profile_text: str) -> dict:
         """
         Processes career context and returns 3 real LinkedIn influencers in a structured JSON.
@@ -78,23 +73,55 @@ class NetworkAdvisor:
         }}
         """
 
+        # Serve repeated (normalized) inputs from the response cache
+        self.last_usage = None
+        self.last_match = None
+        cache = get_cache()
+        # Routed on the career context, not the templated prompt; results are keyed by the tier that answers
+        decision = get_router().route("networking", profile_text)
+        cache_key = make_key("networking", decision["model"], PROMPT_VERSION, profile_text=profile_text)
+        scope = f"{DEDUP_SCOPE}:{decision['model']}"
+        fingerprint = None
+        if cache is not None:
+            cached = cache.get(cache_key)
+            if cached is not None:
+                self.last_match = {"cache_match": "exact"}
+                return cached
+            # A near-identical input (fixed typo, extra line) reuses its stored result
+            cached, self.last_match, fingerprint = find_similar(cache, scope, profile_text)
+            if cached is not None:
+                return cached
+
+        # Identical requests already in flight (other sessions) share one Groq call
+        (result, usage), coalesced = get_single_flight().do(
+            f"{scope}:{cache_key}",
+            lambda: self._request(system_msg, user_msg, profile_text, decision, cache, cache_key, scope, fingerprint))
+        if coalesced:
+            self.last_match = {"cache_match": "coalesced"}
+        else:
+            self.last_usage = usage
+        return result
+
+    def _request(self, system_msg, user_msg, profile_text, decision, cache, cache_key, scope, fingerprint):
+        """One Groq call: returns (result, usage), storing successes in the cache."""
         try:
             # Execute inference with JSON mode enabled
-            response = self.client.chat.completions.create(
-                model=self.model,
+            result, usage = complete_json(
+                "networking", self.client.chat.completions.create, profile_text, decision=decision,
                 messages=[
                     {"role": "system", "content": system_msg},
                     {"role": "user", "content": user_msg}
                 ],
                 response_format={"type": "json_object"}
             )
-            
-            # Parse the JSON string into a dictionary
-            return json.loads(response.choices[0].message.content)
+            if cache is not None:
+                cache.set(cache_key, result)
+                remember(scope, fingerprint, cache_key)
+            return result, usage
             
         except Exception as e:
             # Graceful fallback error reporting
-            return {"error": f"Groq Networking Module failed: {str(e)}"}
+            return {"error": f"Groq Networking Module failed: {str(e)}"}, None
 
 if __name__ == "__main__":
     # Sanity check for module initialization
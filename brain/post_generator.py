@@ -1,10 +1,12 @@
-import os
-import streamlit as st 
-from openai import OpenAI
-from dotenv import load_dotenv
+from tracing import traced
+from brain.groq_client import get_api_key, get_client, extract_usage
+from brain.resilience import call_groq
+from brain.model_router import LARGE_MODEL, get_router, annotate
+from brain.response_cache import make_key
+from brain.single_flight import get_single_flight
 
-# Initialize environment variables for local development
-load_dotenv()
+# Bump whenever the prompt template changes
+PROMPT_VERSION = "1"
 
 class PostGenerator:
     """
@@ -12,34 +14,28 @@ class PostGenerator:
     Supports high-quality generation in English, Arabic, and French.
     """
     
+    @traced(tool="Post Generator")
     def __init__(self):
         # 1. Initialize attributes to None to avoid "AttributeError"
         self.client = None
         self.api_key = None
-        self.model = "llama-3.3-70b-versatile"
+        self.model = LARGE_MODEL
+        # Token usage of the most recent Groq call (None when served from cache)
+        self.last_usage = None
+        # Set to {"cache_match": "coalesced"} when the post was shared with another session
+        self.last_match = None
         
-        # 2. Securely fetch the API key with fallback logic
-        try:
-            # Check for Streamlit Cloud Secrets
-            if hasattr(st, "secrets") and "GROQ_API_KEY" in st.secrets:
-                self.api_key = st.secrets["GROQ_API_KEY"]
-            else:
-                # Local fallback
-                self.api_key = os.getenv("GROQ_API_KEY")
-        except Exception:
-            # Final fallback to environment variables
-            self.api_key = os.getenv("GROQ_API_KEY")
+        # 2. Resolve the API key once per process (Cloud Secrets -> local .env)
+        self.api_key = get_api_key()
 
-        # 3. Validate API key presence
+        # 3. Validate API key existence
         if not self.api_key:
             raise ValueError("CRITICAL: GROQ_API_KEY is missing. Add it to .env (local) or Secrets (cloud).")
 
-        # 4. Initialize the Groq-powered client
-        self.client = OpenAI(
-            api_key=self.api_key,
-            base_url="https://api.groq.com/openai/v1"
-        )
+        # 4. Reuse the process-wide pooled Groq client (keep-alive connections)
+        self.client = get_client()
 
+    @traced(tool="Post Generator")
     def generate_post(self, topic: str, tone: str, language: str) -> str:
         """
         Creates a LinkedIn post based on topic, tone, and language.
@@ -48,6 +44,30 @@ class PostGenerator:
         if not self.client:
             return "Content generation unavailable. Please check API configuration."
 
+        try:
+            # Collect the streamed deltas into the final post
+            return "".join(self.stream_post(topic, tone, language))
+        except Exception as e:
+            return f"Error during post generation: {str(e)}"
+
+    @traced(tool="Post Generator")
+    def stream_post(self, topic: str, tone: str, language: str):
+        """
+        Streaming variant of generate_post: yields text deltas as Groq produces them.
+        Errors are raised to the caller so the UI can log and report them.
+        """
+        self.last_usage = None
+        self.last_match = None
+        # The same topic requested while a post is streaming joins that stream
+        deltas, coalesced = get_single_flight().stream(
+            "post:" + make_key("post", self.model, PROMPT_VERSION, topic=topic, tone=tone, language=language),
+            lambda: self._stream(topic, tone, language))
+        if coalesced:
+            self.last_match = {"cache_match": "coalesced"}
+        yield from deltas
+
+    def _stream(self, topic, tone, language):
+        """Opens one Groq stream and yields its text deltas."""
         # Define system behavior based on user-selected language and tone
         system_msg = (
             f"You are a professional LinkedIn Content Strategist. "
@@ -57,20 +77,29 @@ class PostGenerator:
         
         user_msg = f"Write a LinkedIn post about the following topic: {topic}. Include 3-5 relevant hashtags."
 
-        try:
-            # API call to Groq infrastructure
-            response = self.client.chat.completions.create(
-                model=self.model,
-                messages=[
-                    {"role": "system", "content": system_msg},
-                    {"role": "user", "content": user_msg}
-                ],
-                temperature=0.7 # Slight increase in temperature for creative writing
-            )
-            # Extract and return the generated text content
-            return response.choices[0].message.content
-        except Exception as e:
-            return f"Error during post generation: {str(e)}"
+        # A short topic goes to the fast model tier
+        decision = get_router().route("post", topic, stream=True)
+
+        # API call to Groq infrastructure
+        # Only opening the stream is retried: deltas already shown cannot be replayed
+        stream = call_groq(
+            self.client.chat.completions.create,
+            model=decision["model"],
+            messages=[
+                {"role": "system", "content": system_msg},
+                {"role": "user", "content": user_msg}
+            ],
+            temperature=0.7, # Slight increase in temperature for creative writing
+            stream=True,
+            stream_options={"include_usage": True}
+        )
+        for chunk in stream:
+            # The final chunk carries only usage data and no choices
+            if chunk.choices and chunk.choices[0].delta.content:
+                yield chunk.choices[0].delta.content
+            usage = extract_usage(chunk)
+            if usage:
+                self.last_usage = annotate(usage, decision)
 
 if __name__ == "__main__":
     # Internal module sanity check
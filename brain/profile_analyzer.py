@@ -1,12 +1,14 @@
-import os
-import json
-import streamlit as st
-from openai import OpenAI
-from dotenv import load_dotenv
-from tenacity import retry, stop_after_attempt, wait_exponential
+from tracing import traced
+from brain.groq_client import get_api_key, get_client, get_async_client
+from brain.response_cache import get_cache, make_key
+from brain.near_duplicate import find_similar, remember
+from brain.model_router import LARGE_MODEL, get_router, complete_json, acomplete_json
+from brain.single_flight import get_single_flight
 
-# Load local environment variables (used for local development only)
-load_dotenv()
+# Bump whenever the prompt template changes so stale cache entries are ignored
+PROMPT_VERSION = "1"
+# Near-duplicate lookups only match inputs analyzed with the same prompt
+DEDUP_SCOPE = f"profile:{PROMPT_VERSION}"
 
 class ProfileAnalyzer:
     """
@@ -14,35 +16,28 @@ class ProfileAnalyzer:
     Supports English, Arabic, and French.
     """
     
+    @traced(tool="Profile Optimizer")
     def __init__(self):
         # 1. Initialize attributes to None to avoid "AttributeError"
         self.client = None
         self.api_key = None
-        self.model = "llama-3.3-70b-versatile"
+        self.model = LARGE_MODEL
+        # Token usage of the most recent Groq call (None when served from cache)
+        self.last_usage = None
+        # How the most recent result was reused from the cache (None when freshly generated)
+        self.last_match = None
         
-        # 2. Securely fetch the API key with fallback logic
-        try:
-            # Check if running on Streamlit Cloud (st.secrets)
-            if hasattr(st, "secrets") and "GROQ_API_KEY" in st.secrets:
-                self.api_key = st.secrets["GROQ_API_KEY"]
-            else:
-                # Fallback to local environment variable
-                self.api_key = os.getenv("GROQ_API_KEY")
-        except Exception:
-            # Final fallback to os.getenv if st.secrets triggers an error locally
-            self.api_key = os.getenv("GROQ_API_KEY")
+        # 2. Resolve the API key once per process (Cloud Secrets -> local .env)
+        self.api_key = get_api_key()
 
-        # 3. Validate API key existence before initializing the client
+        # 3. Validate API key existence
         if not self.api_key:
             raise ValueError("CRITICAL ERROR: GROQ_API_KEY is not set in Secrets or .env file.")
-        
-        # 4. Initialize the OpenAI client pointing to Groq's infrastructure
-        self.client = OpenAI(
-            api_key=self.api_key,
-            base_url="https://api.groq.com/openai/v1"
-        )
 
-    @retry(stop=stop_after_attempt(3), wait=wait_exponential(multiplier=1, min=2, max=6))
+        # 4. Reuse the process-wide pooled Groq client (keep-alive connections)
+        self.client = get_client()
+
+    @traced(tool="Profile Optimizer")
     def analyze_profile(self, profile_text: str) -> dict:
         """
         Processes profile text and returns a structured JSON report.
@@ -55,6 +50,97 @@ class ProfileAnalyzer:
         if not profile_text.strip():
             return {"error": "Input text is empty. Please provide profile content."}
 
+        # Serve repeated (normalized) inputs from the response cache
+        self.last_usage = None
+        self.last_match = None
+        cache = get_cache()
+        # Results are keyed by the tier that answers: a fast-model answer never stands in for the large one
+        decision = get_router().route("profile", profile_text)
+        cache_key = make_key("profile", decision["model"], PROMPT_VERSION, profile_text=profile_text)
+        scope = f"{DEDUP_SCOPE}:{decision['model']}"
+        fingerprint = None
+        if cache is not None:
+            cached = cache.get(cache_key)
+            if cached is not None:
+                self.last_match = {"cache_match": "exact"}
+                return cached
+            # A near-identical input (fixed typo, extra line) reuses its stored result
+            cached, self.last_match, fingerprint = find_similar(cache, scope, profile_text)
+            if cached is not None:
+                return cached
+
+        # Identical requests already in flight (other sessions) share one Groq call
+        (result, usage), coalesced = get_single_flight().do(
+            f"{scope}:{cache_key}", lambda: self._request(profile_text, decision, cache, cache_key, scope, fingerprint))
+        if coalesced:
+            self.last_match = {"cache_match": "coalesced"}
+        else:
+            self.last_usage = usage
+        return result
+
+    def _request(self, profile_text, decision, cache, cache_key, scope, fingerprint):
+        """One Groq analysis: returns (result, usage), storing successes in the cache."""
+        try:
+            # Short profiles may go to the fast model (escalated on invalid JSON)
+            result, usage = complete_json(
+                "profile", self.client.chat.completions.create, profile_text, decision=decision,
+                messages=self._build_messages(profile_text),
+                response_format={"type": "json_object"}
+            )
+            if cache is not None:
+                cache.set(cache_key, result)
+                remember(scope, fingerprint, cache_key)
+            return result, usage
+            
+        except Exception as e:
+            # Handle API-specific errors
+            return {"error": f"Groq Analysis failed: {str(e)}"}, None
+
+    @traced(tool="Profile Optimizer")
+    async def analyze_profile_async(self, profile_text: str) -> dict:
+        """
+        Asyncio variant of analyze_profile for batch jobs (see batch_audit.py).
+        Shares the prompt, response cache and error contract of the sync method.
+        """
+        if not profile_text.strip():
+            return {"error": "Input text is empty. Please provide profile content."}
+
+        # Serve repeated (normalized) inputs from the response cache
+        self.last_usage = None
+        self.last_match = None
+        cache = get_cache()
+        # Results are keyed by the tier that answers: a fast-model answer never stands in for the large one
+        decision = get_router().route("profile", profile_text)
+        cache_key = make_key("profile", decision["model"], PROMPT_VERSION, profile_text=profile_text)
+        scope = f"{DEDUP_SCOPE}:{decision['model']}"
+        fingerprint = None
+        if cache is not None:
+            cached = cache.get(cache_key)
+            if cached is not None:
+                self.last_match = {"cache_match": "exact"}
+                return cached
+            # A near-identical input (fixed typo, extra line) reuses its stored result
+            cached, self.last_match, fingerprint = find_similar(cache, scope, profile_text)
+            if cached is not None:
+                return cached
+
+        try:
+            result, self.last_usage = await acomplete_json(
+                "profile", get_async_client().chat.completions.create, profile_text, decision=decision,
+                messages=self._build_messages(profile_text),
+                response_format={"type": "json_object"}
+            )
+            if cache is not None:
+                cache.set(cache_key, result)
+                remember(scope, fingerprint, cache_key)
+            return result
+            
+        except Exception as e:
+            # Handle API-specific errors
+            return {"error": f"Groq Analysis failed: {str(e)}"}
+
+    def _build_messages(self, profile_text):
+        """Builds the auditor prompt shared by the sync and async entry points."""
         # System instructions for behavior and output format
         system_msg = (
             "You are an expert LinkedIn Profile Auditor and Career Coach. "
@@ -75,23 +161,10 @@ class ProfileAnalyzer:
         4. "weaknesses": (List of 3 improvement areas)
         5. "actionable_tips": (List of 3 specific steps)
         """
-
-        try:
-            response = self.client.chat.completions.create(
-                model=self.model,
-                messages=[
-                    {"role": "system", "content": system_msg},
-                    {"role": "user", "content": user_msg}
-                ],
-                response_format={"type": "json_object"}
-            )
-            
-            # Parse and return the JSON response
-            return json.loads(response.choices[0].message.content)
-            
-        except Exception as e:
-            # Handle API-specific errors
-            return {"error": f"Groq Analysis failed: {str(e)}"}
+        return [
+            {"role": "system", "content": system_msg},
+            {"role": "user", "content": user_msg}
+        ]
 
 if __name__ == "__main__":
     # Module testing entry point
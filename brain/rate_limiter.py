@@ -0,0 +1,281 @@
+import os
+import time
+import uuid
+import sqlite3
+import asyncio
+import threading
+import contextlib
+import contextvars
+from tracing import span
+from brain.conversation_memory import estimate_tokens
+
+# Groq quota per API key (override through .env or the deployment environment).
+# Defaults are the free-tier limits of llama-3.3-70b-versatile; 0 disables a bucket.
+RATE_LIMIT_ENABLED = os.getenv("LINKBRAIN_RATE_LIMIT_ENABLED", "1") != "0"
+RPM_LIMIT = int(os.getenv("GROQ_RPM_LIMIT", "30"))
+TPM_LIMIT = int(os.getenv("GROQ_TPM_LIMIT", "12000"))
+# Completion budget assumed when a request sets no max_tokens
+COMPLETION_TOKENS_ESTIMATE = int(os.getenv("GROQ_COMPLETION_TOKENS_ESTIMATE", "600"))
+RATE_LIMIT_DB_PATH = os.getenv("LINKBRAIN_RATE_LIMIT_DB", "linkbrain_ratelimit.db")
+RATE_LIMIT_MAX_WAIT = float(os.getenv("LINKBRAIN_RATE_LIMIT_MAX_WAIT", "60"))  # seconds in the queue
+
+# Queue priorities: lower is served first
+PRIORITY_INTERACTIVE = 0  # chat: a person is watching the cursor
+PRIORITY_DEFAULT = 1      # one-shot tools in the UI
+PRIORITY_BATCH = 2        # CLI jobs (batch_audit.py, load tests)
+
+# How often queued callers re-check the head of the queue, and when a waiter
+# that stopped checking (crashed process) is dropped
+POLL_INTERVAL = 0.05
+STALE_WAITER_SECONDS = 10.0
+
+_priority = contextvars.ContextVar("linkbrain_request_priority", default=PRIORITY_DEFAULT)
+# Seconds the most recent call_groq() spent queued for quota (read by extract_usage)
+_last_wait = contextvars.ContextVar("linkbrain_rate_limit_wait", default=None)
+
+
+class RateLimitTimeout(Exception):
+    """Raised when a request waited longer than LINKBRAIN_RATE_LIMIT_MAX_WAIT for quota."""
+
+
+@contextlib.contextmanager
+def request_priority(priority):
+    """Groq calls made inside the block queue with this priority."""
+    token = _priority.set(priority)
+    try:
+        yield
+    finally:
+        _priority.reset(token)
+
+
+def current_priority():
+    return _priority.get()
+
+
+def last_wait():
+    return _last_wait.get()
+
+
+def set_last_wait(seconds):
+    _last_wait.set(seconds)
+
+
+def estimate_request_tokens(params):
+    """Prompt estimate (UTF-8 bytes / 4) plus the completion budget of a chat request."""
+    prompt = sum(estimate_tokens(m.get("content") or "") + 4 for m in params.get("messages") or [])
+    return prompt + int(params.get("max_tokens") or COMPLETION_TOKENS_ESTIMATE)
+
+
+class RateLimiter:
+    """
+    Token buckets for requests/minute and tokens/minute, shared by every worker
+    process of a deployment through one SQLite file. Callers queue in a waiter
+    table ordered by (priority, arrival), so only the head of the queue may take
+    quota: interactive calls overtake batch ones, equal priorities stay FIFO.
+    """
+
+    def __init__(self, db_path=RATE_LIMIT_DB_PATH, rpm=RPM_LIMIT, tpm=TPM_LIMIT):
+        self.db_path = db_path
+        # name -> (capacity, refill per second)
+        self.buckets = {name: (limit, limit / 60.0) for name, limit in (("rpm", rpm), ("tpm", tpm)) if limit > 0}
+        self._lock = threading.Lock()
+        self._stats = {"granted": 0, "queued": 0, "wait_seconds": 0.0, "timeouts": 0}
+        try:
+            self._conn = self._connect(db_path)
+        except Exception as e:
+            # Without the shared file the limit is still enforced inside this process
+            print(f"Rate Limiter Error: {e}")
+            self._conn = self._connect(":memory:")
+
+    @staticmethod
+    def _connect(db_path):
+        conn = sqlite3.connect(db_path, timeout=30, isolation_level=None, check_same_thread=False)
+        if db_path != ":memory:":
+            conn.execute("PRAGMA journal_mode=WAL")
+            # Quota state is rebuilt within a minute anyway: skip the fsync per commit
+            conn.execute("PRAGMA synchronous=OFF")
+        conn.execute('''CREATE TABLE IF NOT EXISTS rate_buckets
+                        (name TEXT PRIMARY KEY, tokens REAL NOT NULL, updated_at REAL NOT NULL)''')
+        conn.execute('''CREATE TABLE IF NOT EXISTS rate_waiters
+                        (ticket TEXT PRIMARY KEY, priority INTEGER NOT NULL,
+                         enqueued_at REAL NOT NULL, heartbeat REAL NOT NULL)''')
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_rate_waiters_order ON rate_waiters (priority, enqueued_at)")
+        return conn
+
+    @contextlib.contextmanager
+    def _transaction(self):
+        # One writer at a time across threads (lock) and processes (BEGIN IMMEDIATE)
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield self._conn
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def _levels(self, conn, now):
+        """Current (refilled) level of every bucket."""
+        levels = {}
+        for name, (capacity, rate) in self.buckets.items():
+            row = conn.execute("SELECT tokens, updated_at FROM rate_buckets WHERE name = ?", (name,)).fetchone()
+            tokens = capacity if row is None else min(capacity, row[0] + max(0.0, now - row[1]) * rate)
+            levels[name] = tokens
+        return levels
+
+    def _store(self, conn, levels, now):
+        conn.executemany("INSERT OR REPLACE INTO rate_buckets (name, tokens, updated_at) VALUES (?, ?, ?)",
+                         [(name, tokens, now) for name, tokens in levels.items()])
+
+    def _try_acquire(self, ticket, need):
+        """Takes quota when `ticket` heads the queue; returns 0 on success or seconds to wait."""
+        with self._transaction() as conn:
+            now = time.time()
+            conn.execute("DELETE FROM rate_waiters WHERE heartbeat < ?", (now - STALE_WAITER_SECONDS,))
+            conn.execute("UPDATE rate_waiters SET heartbeat = ? WHERE ticket = ?", (now, ticket))
+            head = conn.execute("SELECT ticket FROM rate_waiters ORDER BY priority, enqueued_at LIMIT 1").fetchone()
+            if head is not None and head[0] != ticket:
+                return POLL_INTERVAL
+
+            levels = self._levels(conn, now)
+            wait = 0.0
+            for name, (capacity, rate) in self.buckets.items():
+                # A request bigger than the bucket would never fit: let it through on a full bucket
+                amount = min(need[name], capacity)
+                if levels[name] < amount:
+                    wait = max(wait, (amount - levels[name]) / rate)
+            if wait > 0:
+                return wait
+
+            for name in self.buckets:
+                levels[name] -= need[name]
+            self._store(conn, levels, now)
+            conn.execute("DELETE FROM rate_waiters WHERE ticket = ?", (ticket,))
+            return 0.0
+
+    def _enqueue(self, priority):
+        ticket = uuid.uuid4().hex
+        with self._transaction() as conn:
+            now = time.time()
+            conn.execute("INSERT INTO rate_waiters (ticket, priority, enqueued_at, heartbeat) VALUES (?, ?, ?, ?)",
+                         (ticket, priority, now, now))
+        return ticket
+
+    def _leave(self, ticket):
+        try:
+            with self._transaction() as conn:
+                conn.execute("DELETE FROM rate_waiters WHERE ticket = ?", (ticket,))
+        except Exception as e:
+            print(f"Rate Limiter Error: {e}")
+
+    def _finish(self, started, granted):
+        waited = time.monotonic() - started
+        with self._lock:
+            if granted:
+                self._stats["granted"] += 1
+                self._stats["wait_seconds"] += waited
+                if waited > POLL_INTERVAL:
+                    self._stats["queued"] += 1
+            else:
+                self._stats["timeouts"] += 1
+        return waited
+
+    def acquire(self, tokens, priority=None, max_wait=RATE_LIMIT_MAX_WAIT):
+        """Blocks until one request and `tokens` tokens are available; returns the seconds waited."""
+        if not self.buckets:
+            return 0.0
+        need = {"rpm": 1, "tpm": tokens}
+        priority = current_priority() if priority is None else priority
+        started = time.monotonic()
+        with span("ratelimit.wait", priority=priority, tokens_est=tokens) as sp:
+            ticket = self._enqueue(priority)
+            try:
+                while True:
+                    wait = self._try_acquire(ticket, need)
+                    if wait == 0:
+                        waited = self._finish(started, True)
+                        sp.set(waited_ms=round(waited * 1000, 1))
+                        return waited
+                    if time.monotonic() - started + min(wait, POLL_INTERVAL) > max_wait:
+                        self._finish(started, False)
+                        raise RateLimitTimeout(f"Waited over {max_wait:.0f}s for Groq quota (RPM/TPM limit)")
+                    time.sleep(min(wait, POLL_INTERVAL))
+            except BaseException:
+                self._leave(ticket)
+                raise
+
+    async def acquire_async(self, tokens, priority=None, max_wait=RATE_LIMIT_MAX_WAIT):
+        """
+        Asyncio variant of acquire(): waits without blocking the event loop.
+        The SQLite steps (a thread lock plus BEGIN IMMEDIATE, which can wait on
+        other processes) run in a worker thread.
+        """
+        if not self.buckets:
+            return 0.0
+        need = {"rpm": 1, "tpm": tokens}
+        priority = current_priority() if priority is None else priority
+        started = time.monotonic()
+        with span("ratelimit.wait", priority=priority, tokens_est=tokens) as sp:
+            ticket = await asyncio.to_thread(self._enqueue, priority)
+            try:
+                while True:
+                    wait = await asyncio.to_thread(self._try_acquire, ticket, need)
+                    if wait == 0:
+                        waited = self._finish(started, True)
+                        sp.set(waited_ms=round(waited * 1000, 1))
+                        return waited
+                    if time.monotonic() - started + min(wait, POLL_INTERVAL) > max_wait:
+                        self._finish(started, False)
+                        raise RateLimitTimeout(f"Waited over {max_wait:.0f}s for Groq quota (RPM/TPM limit)")
+                    await asyncio.sleep(min(wait, POLL_INTERVAL))
+            except BaseException:
+                # Also reached on cancellation: the shielded thread leaves the queue even if cancelled again
+                await asyncio.shield(asyncio.to_thread(self._leave, ticket))
+                raise
+
+    def try_acquire(self, tokens, priority=None):
+        """Takes quota only if it is available right now (optional extra calls, e.g. hedges)."""
+        if not self.buckets:
+            return True
+        ticket = self._enqueue(current_priority() if priority is None else priority)
+        try:
+            return self._try_acquire(ticket, {"rpm": 1, "tpm": tokens}) == 0
+        finally:
+            self._leave(ticket)
+
+    def settle(self, estimated, actual):
+        """Returns (or charges) the difference once Groq reports the real token count."""
+        if "tpm" not in self.buckets or actual is None:
+            return
+        try:
+            with self._transaction() as conn:
+                now = time.time()
+                levels = self._levels(conn, now)
+                capacity = self.buckets["tpm"][0]
+                # Debt from an underestimate is paid back by later callers waiting longer
+                levels["tpm"] = max(-capacity, min(capacity, levels["tpm"] + estimated - actual))
+                self._store(conn, levels, now)
+        except Exception as e:
+            print(f"Rate Limiter Error: {e}")
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+        stats["avg_wait_s"] = round(stats["wait_seconds"] / stats["granted"], 4) if stats["granted"] else 0.0
+        return stats
+
+
+_lock = threading.Lock()
+_limiter = None
+
+
+def get_rate_limiter():
+    """Returns the process-wide Groq rate limiter (None when disabled)."""
+    global _limiter
+    if not RATE_LIMIT_ENABLED:
+        return None
+    if _limiter is None:
+        with _lock:
+            if _limiter is None:
+                _limiter = RateLimiter()
+    return _limiter
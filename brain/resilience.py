@@ -0,0 +1,315 @@
+import os
+import time
+import random
+import asyncio
+import threading
+from email.utils import parsedate_to_datetime
+import openai
+from tracing import span
+from brain.rate_limiter import RATE_LIMIT_MAX_WAIT, get_rate_limiter, estimate_request_tokens, set_last_wait
+from brain.model_router import get_router
+from brain.hedging import get_hedger, set_last_hedge
+
+# Retry and circuit breaker tuning (override through .env or the deployment environment)
+RETRY_MAX_ATTEMPTS = int(os.getenv("GROQ_RETRY_MAX_ATTEMPTS", "4"))
+RETRY_DEADLINE = float(os.getenv("GROQ_RETRY_DEADLINE", "30"))      # seconds per call, retries included
+RETRY_BASE_DELAY = float(os.getenv("GROQ_RETRY_BASE_DELAY", "0.5"))
+RETRY_MAX_DELAY = float(os.getenv("GROQ_RETRY_MAX_DELAY", "8"))
+BREAKER_FAILURE_THRESHOLD = int(os.getenv("GROQ_BREAKER_FAILURES", "5"))
+BREAKER_COOLDOWN = float(os.getenv("GROQ_BREAKER_COOLDOWN", "30"))  # seconds open before a probe
+
+# Error classes
+RETRYABLE = "retryable"        # timeouts, dropped connections, 5xx: Groq or the network is struggling
+RATE_LIMITED = "rate_limited"  # 429: wait for the quota window, Groq itself is healthy
+FATAL = "fatal"                # bad request, auth, unknown model: retrying cannot help
+
+
+class CircuitOpenError(Exception):
+    """Raised without calling Groq while the circuit breaker is open."""
+
+    def __init__(self, retry_in):
+        self.retry_in = retry_in
+        super().__init__(f"Groq is temporarily unavailable (circuit open, retry in {retry_in:.0f}s)")
+
+
+def classify(error):
+    """Maps an exception from the OpenAI SDK to RETRYABLE, RATE_LIMITED or FATAL."""
+    if isinstance(error, openai.RateLimitError):
+        return RATE_LIMITED
+    if isinstance(error, (openai.APITimeoutError, openai.APIConnectionError)):
+        return RETRYABLE
+    if isinstance(error, openai.APIStatusError):
+        status = error.status_code
+        if status == 429:
+            return RATE_LIMITED
+        # 408 timeout, 409 lock conflict, 5xx server side
+        if status in (408, 409) or status >= 500:
+            return RETRYABLE
+    return FATAL
+
+
+def retry_after(error):
+    """Seconds the server asked us to wait (retry-after-ms / Retry-After), or None."""
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None)
+    if not headers:
+        return None
+    try:
+        if headers.get("retry-after-ms"):
+            return max(0.0, float(headers["retry-after-ms"]) / 1000)
+    except ValueError:
+        pass
+    value = headers.get("retry-after")
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        # HTTP-date form
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def backoff_delay(attempt, error_class, error=None):
+    """Full-jitter exponential backoff; a Retry-After hint is a floor, not a suggestion."""
+    delay = random.uniform(0, min(RETRY_MAX_DELAY, RETRY_BASE_DELAY * (2 ** (attempt - 1))))
+    hinted = retry_after(error) if error is not None else None
+    if hinted is not None:
+        delay = max(delay, hinted)
+    elif error_class == RATE_LIMITED:
+        # 429 without a hint: quota windows are coarse, don't hammer them
+        delay = max(delay, RETRY_BASE_DELAY * 2)
+    return delay
+
+
+class CircuitBreaker:
+    """
+    Process-wide breaker in front of Groq. After BREAKER_FAILURE_THRESHOLD
+    consecutive outage-type failures it opens and calls fail fast; after the
+    cooldown a single probe is let through and its outcome closes or reopens it.
+    Rate limits do not count: they mean Groq is up and we are over quota.
+    """
+
+    def __init__(self, failure_threshold=BREAKER_FAILURE_THRESHOLD, cooldown=BREAKER_COOLDOWN):
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self._lock = threading.Lock()
+        self._failures = 0
+        self._opened_at = None
+        self._probing = False
+        self._probe_started = 0.0
+        self._stats = {"opened": 0, "rejected": 0}
+
+    @property
+    def state(self):
+        with self._lock:
+            return self._state()
+
+    def _state(self):
+        if self._opened_at is None:
+            return "closed"
+        if time.monotonic() - self._opened_at >= self.cooldown:
+            return "half_open"
+        return "open"
+
+    def before_call(self):
+        """Raises CircuitOpenError unless a call may go out now."""
+        with self._lock:
+            state = self._state()
+            if state == "closed":
+                return
+            # A probe that never reported back (cancelled task) is replaced after a cooldown
+            if state == "half_open" and (not self._probing or time.monotonic() - self._probe_started >= self.cooldown):
+                self._probing = True
+                self._probe_started = time.monotonic()
+                return
+            self._stats["rejected"] += 1
+            retry_in = max(0.0, self.cooldown - (time.monotonic() - self._opened_at))
+        raise CircuitOpenError(retry_in)
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._probing = False
+
+    def record_failure(self):
+        """Counts an outage-type failure (timeout, dropped connection, 5xx)."""
+        with self._lock:
+            self._failures += 1
+            if self._probing or self._failures >= self.failure_threshold:
+                if self._opened_at is None or self._probing:
+                    self._stats["opened"] += 1
+                self._opened_at = time.monotonic()
+                self._probing = False
+
+    def stats(self):
+        with self._lock:
+            return {**self._stats, "state": self._state(), "consecutive_failures": self._failures}
+
+    def reset(self):
+        with self._lock:
+            self._failures, self._opened_at, self._probing = 0, None, False
+
+
+_lock = threading.Lock()
+_breaker = None
+
+
+def get_breaker():
+    """Returns the process-wide Groq circuit breaker."""
+    global _breaker
+    if _breaker is None:
+        with _lock:
+            if _breaker is None:
+                _breaker = CircuitBreaker()
+    return _breaker
+
+
+def _next_delay(attempt, error, started, deadline, max_attempts):
+    """Delay before the next attempt, or None when the error must be raised."""
+    error_class = classify(error)
+    if error_class == RETRYABLE:
+        get_breaker().record_failure()
+    elif isinstance(error, openai.APIStatusError):
+        # A 4xx answer (429 included) still proves Groq is reachable
+        get_breaker().record_success()
+    if error_class == FATAL or attempt >= max_attempts:
+        return None, error_class
+    delay = backoff_delay(attempt, error_class, error)
+    if time.monotonic() - started + delay > deadline:
+        # Sleeping would overrun the caller's budget: give up now
+        return None, error_class
+    return delay, error_class
+
+
+def _queue_budget(started, deadline):
+    """Seconds this call may still wait for quota: the rest of its deadline, at most the limiter's cap."""
+    return max(0.0, min(RATE_LIMIT_MAX_WAIT, deadline - (time.monotonic() - started)))
+
+
+def _observe(params, sent, error=None):
+    """Feeds the model router's live latency/error statistics."""
+    if error is not None and classify(error) != RETRYABLE:
+        # Only outage-type failures say something about the model's health
+        return
+    kind = "stream" if params.get("stream") else "complete"
+    get_router().observe(params.get("model"), kind, time.monotonic() - sent, error is None)
+
+
+def _total_tokens(response):
+    usage = getattr(response, "usage", None)
+    return getattr(usage, "total_tokens", None)
+
+
+def _hedger_for(tool, params):
+    """The hedger when this call may be hedged (idempotent tool, not streamed)."""
+    if not tool or params.get("stream"):
+        return None
+    hedger = get_hedger()
+    return hedger if hedger.applies(tool) else None
+
+
+def _merge_hedge(total, outcome):
+    total = total or {"hedged": 0, "hedge_won": 0}
+    return {name: max(total[name], outcome[name]) for name in total}
+
+
+def call_groq(create, deadline=None, max_attempts=None, hedge=None, **params):
+    """
+    Runs `create(**params)` (one Groq API call, e.g. client.chat.completions.create)
+    under the shared resilience policy: every attempt first queues for RPM/TPM
+    quota, fatal errors raise at once, retryable and rate-limited ones are
+    retried with jittered backoff (honoring Retry-After) while the per-call
+    deadline allows, and the circuit breaker fails fast while Groq is down.
+    Every attempt is traced as a groq.request span.
+    `hedge` names the tool of an idempotent, non-streamed call: slow attempts
+    may then be raced against a duplicate request (brain/hedging.py).
+    """
+    deadline = RETRY_DEADLINE if deadline is None else deadline
+    max_attempts = max_attempts or RETRY_MAX_ATTEMPTS
+    breaker = get_breaker()
+    limiter = get_rate_limiter()
+    tokens = estimate_request_tokens(params) if limiter is not None else 0
+    hedger = _hedger_for(hedge, params)
+    started = time.monotonic()
+    attempt, waited, hedged = 0, 0.0, None
+    set_last_wait(None)
+    set_last_hedge(None)
+    while True:
+        attempt += 1
+        breaker.before_call()
+        if limiter is not None:
+            # Queueing for quota spends the same per-call budget as retries
+            waited += limiter.acquire(tokens, max_wait=_queue_budget(started, deadline))
+            set_last_wait(round(waited, 4))
+        with span("groq.request", attempt=attempt, model=params.get("model")) as sp:
+            sent = time.monotonic()
+            try:
+                if hedger is not None:
+                    response, outcome = hedger.run(create, params, hedge, tokens)
+                    hedged = _merge_hedge(hedged, outcome)
+                    set_last_hedge(hedged)
+                else:
+                    response = create(**params)
+            except Exception as e:
+                _observe(params, sent, e)
+                delay, error_class = _next_delay(attempt, e, started, deadline, max_attempts)
+                sp.set(error_class=error_class)
+                if delay is None:
+                    raise
+                sp.set(retry_in=round(delay, 3))
+            else:
+                _observe(params, sent)
+                breaker.record_success()
+                if limiter is not None and not params.get("stream"):
+                    limiter.settle(tokens, _total_tokens(response))
+                return response
+        time.sleep(delay)
+
+
+async def acall_groq(create, deadline=None, max_attempts=None, hedge=None, **params):
+    """Asyncio variant of call_groq: `create(**params)` returns an awaitable."""
+    deadline = RETRY_DEADLINE if deadline is None else deadline
+    max_attempts = max_attempts or RETRY_MAX_ATTEMPTS
+    breaker = get_breaker()
+    limiter = get_rate_limiter()
+    tokens = estimate_request_tokens(params) if limiter is not None else 0
+    hedger = _hedger_for(hedge, params)
+    started = time.monotonic()
+    attempt, waited, hedged = 0, 0.0, None
+    set_last_wait(None)
+    set_last_hedge(None)
+    while True:
+        attempt += 1
+        breaker.before_call()
+        if limiter is not None:
+            # Queueing for quota spends the same per-call budget as retries
+            waited += await limiter.acquire_async(tokens, max_wait=_queue_budget(started, deadline))
+            set_last_wait(round(waited, 4))
+        with span("groq.request", attempt=attempt, model=params.get("model")) as sp:
+            sent = time.monotonic()
+            try:
+                if hedger is not None:
+                    response, outcome = await hedger.race(create, params, hedge, tokens)
+                    hedged = _merge_hedge(hedged, outcome)
+                    set_last_hedge(hedged)
+                else:
+                    response = await create(**params)
+            except Exception as e:
+                _observe(params, sent, e)
+                delay, error_class = _next_delay(attempt, e, started, deadline, max_attempts)
+                sp.set(error_class=error_class)
+                if delay is None:
+                    raise
+                sp.set(retry_in=round(delay, 3))
+            else:
+                _observe(params, sent)
+                breaker.record_success()
+                if limiter is not None and not params.get("stream"):
+                    await asyncio.to_thread(limiter.settle, tokens, _total_tokens(response))
+                return response
+        await asyncio.sleep(delay)
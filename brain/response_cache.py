@@ -0,0 +1,199 @@
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+import unicodedata
+from collections import OrderedDict
+from tracing import span
+
+# Cache tuning (override through .env or the deployment environment)
+CACHE_DB_PATH = os.getenv("LINKBRAIN_CACHE_DB", "linkbrain_cache.db")
+CACHE_TTL_SECONDS = int(os.getenv("LINKBRAIN_CACHE_TTL", str(7 * 24 * 3600)))
+CACHE_MEMORY_ITEMS = int(os.getenv("LINKBRAIN_CACHE_MEMORY_ITEMS", "512"))
+CACHE_DISK_ITEMS = int(os.getenv("LINKBRAIN_CACHE_DISK_ITEMS", "50000"))
+CACHE_ENABLED = os.getenv("LINKBRAIN_CACHE_ENABLED", "1") != "0"
+
+
+def normalize_text(text):
+    """Canonical form used for cache keys: NFC, trimmed lines, collapsed blank runs."""
+    text = unicodedata.normalize("NFC", str(text))
+    lines = [" ".join(line.split()) for line in text.strip().splitlines()]
+    return "\n".join(line for line in lines if line)
+
+
+def make_key(tool, model, prompt_version, **inputs):
+    """
+    Content-addressed key: SHA-256 over the tool, model, prompt template
+    version and the normalized inputs (sorted by name so argument order does
+    not matter). The tool scopes the key, so two advisors fed the same text
+    never share a cache entry.
+    """
+    payload = {
+        "tool": tool,
+        "model": model,
+        "prompt_version": prompt_version,
+        "inputs": {k: normalize_text(v) for k, v in sorted(inputs.items())}
+    }
+    raw = json.dumps(payload, ensure_ascii=False, sort_keys=True)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class ResponseCache:
+    """
+    Two-level cache for structured brain responses:
+    an in-process LRU in front of a size-bounded SQLite store, both with a TTL.
+    Values are stored as JSON text so every hit returns a fresh dict.
+    """
+
+    def __init__(self, db_path=CACHE_DB_PATH, ttl=CACHE_TTL_SECONDS,
+                 memory_items=CACHE_MEMORY_ITEMS, disk_items=CACHE_DISK_ITEMS):
+        self.db_path = db_path
+        self.ttl = ttl
+        self.memory_items = memory_items
+        self.disk_items = disk_items
+
+        self._memory = OrderedDict()  # key -> (expires_at, json_text)
+        self._lock = threading.Lock()
+        self._writes_since_prune = 0
+        self._stats = {"memory_hits": 0, "disk_hits": 0, "misses": 0, "writes": 0, "evictions": 0}
+
+        self._conn = None
+        try:
+            self._conn = sqlite3.connect(self.db_path, check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute('''CREATE TABLE IF NOT EXISTS response_cache
+                                  (key TEXT PRIMARY KEY,
+                                   value TEXT,
+                                   created_at REAL,
+                                   expires_at REAL,
+                                   last_access REAL)''')
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_cache_last_access ON response_cache (last_access)")
+            self._conn.commit()
+        except Exception as e:
+            # Disk layer is optional: keep serving from memory only
+            print(f"Response Cache Error: {e}")
+            self._conn = None
+
+    def get(self, key):
+        """Returns the cached value (a new dict) or None on miss/expiry."""
+        with span("cache.lookup") as sp:
+            value = self._lookup(key)
+            sp.set(hit=value is not None)
+            return value
+
+    def _lookup(self, key):
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                expires_at, value = entry
+                if expires_at > now:
+                    self._memory.move_to_end(key)
+                    self._stats["memory_hits"] += 1
+                    return json.loads(value)
+                del self._memory[key]
+
+            row = None
+            if self._conn is not None:
+                try:
+                    row = self._conn.execute(
+                        "SELECT value, expires_at FROM response_cache WHERE key = ?", (key,)
+                    ).fetchone()
+                    if row is not None and row[1] <= now:
+                        self._conn.execute("DELETE FROM response_cache WHERE key = ?", (key,))
+                        self._conn.commit()
+                        row = None
+                    elif row is not None:
+                        self._conn.execute("UPDATE response_cache SET last_access = ? WHERE key = ?", (now, key))
+                        self._conn.commit()
+                except Exception as e:
+                    print(f"Response Cache Error: {e}")
+                    row = None
+
+            if row is None:
+                self._stats["misses"] += 1
+                return None
+
+            # Promote the disk hit into the memory layer
+            self._remember(key, row[1], row[0])
+            self._stats["disk_hits"] += 1
+            return json.loads(row[0])
+
+    def set(self, key, value):
+        """Stores a JSON-serializable value in both layers."""
+        now = time.time()
+        expires_at = now + self.ttl
+        text = json.dumps(value, ensure_ascii=False)
+        with self._lock:
+            self._remember(key, expires_at, text)
+            self._stats["writes"] += 1
+            if self._conn is None:
+                return
+            try:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO response_cache (key, value, created_at, expires_at, last_access) "
+                    "VALUES (?, ?, ?, ?, ?)", (key, text, now, expires_at, now)
+                )
+                self._conn.commit()
+                # Amortize the size check instead of counting rows on every write
+                self._writes_since_prune += 1
+                if self._writes_since_prune >= 100:
+                    self._writes_since_prune = 0
+                    self._prune_disk(now)
+            except Exception as e:
+                print(f"Response Cache Error: {e}")
+
+    def stats(self):
+        """Hit/miss counters plus current layer sizes."""
+        with self._lock:
+            stats = dict(self._stats)
+            stats["memory_items"] = len(self._memory)
+        lookups = stats["memory_hits"] + stats["disk_hits"] + stats["misses"]
+        stats["hit_rate"] = (stats["memory_hits"] + stats["disk_hits"]) / lookups if lookups else 0.0
+        return stats
+
+    def clear(self):
+        """Drops every entry from both layers."""
+        with self._lock:
+            self._memory.clear()
+            if self._conn is not None:
+                self._conn.execute("DELETE FROM response_cache")
+                self._conn.commit()
+
+    def _remember(self, key, expires_at, text):
+        # Caller holds the lock
+        self._memory[key] = (expires_at, text)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_items:
+            self._memory.popitem(last=False)
+            self._stats["evictions"] += 1
+
+    def _prune_disk(self, now):
+        # Caller holds the lock: drop expired rows, then least-recently-used overflow
+        self._conn.execute("DELETE FROM response_cache WHERE expires_at <= ?", (now,))
+        overflow = self._conn.execute("SELECT COUNT(*) FROM response_cache").fetchone()[0] - self.disk_items
+        if overflow > 0:
+            self._conn.execute(
+                "DELETE FROM response_cache WHERE key IN "
+                "(SELECT key FROM response_cache ORDER BY last_access ASC LIMIT ?)", (overflow,)
+            )
+            self._stats["evictions"] += overflow
+        self._conn.commit()
+
+
+_lock = threading.Lock()
+_cache = None
+
+
+def get_cache():
+    """Returns the process-wide response cache (None when disabled)."""
+    global _cache
+    if not CACHE_ENABLED:
+        return None
+    if _cache is None:
+        with _lock:
+            if _cache is None:
+                _cache = ResponseCache()
+    return _cache
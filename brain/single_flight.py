@@ -0,0 +1,230 @@
+import os
+import copy
+import time
+import threading
+from tracing import span
+
+# Single-flight switch (override through .env or the deployment environment)
+SINGLE_FLIGHT_ENABLED = os.getenv("LINKBRAIN_SINGLE_FLIGHT_ENABLED", "1") != "0"
+
+# A shared stream without a new delta for this long is not joined any more
+STREAM_IDLE_SECONDS = 30.0
+
+
+class _Call:
+    """One upstream request and the callers waiting on it."""
+    __slots__ = ("done", "result", "error", "waiters")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+        self.waiters = 0
+
+
+class _SharedStream:
+    """
+    Replays one upstream token stream to every caller that joined it.
+    Whichever consumer reaches the end of the buffer pulls the next delta, so
+    the stream keeps flowing even if the session that opened it goes away.
+    SingleFlight counts the attached consumers; when the last one leaves
+    before the end, the upstream stream is closed and the entry dropped.
+    """
+
+    def __init__(self, source, on_done):
+        self.source = source
+        self.chunks = []
+        self.finished = False
+        self.error = None
+        self.consumers = 0  # guarded by the SingleFlight lock
+        self.last_activity = time.monotonic()
+        self._pull_lock = threading.Lock()
+        self._on_done = on_done
+
+    def chunk(self, i):
+        """Delta number i, pulled from upstream when nobody has yet; StopIteration at the end."""
+        while True:
+            if i < len(self.chunks):
+                return self.chunks[i]
+            if self.finished:
+                if self.error is not None:
+                    raise self.error
+                raise StopIteration
+            with self._pull_lock:
+                # Another consumer may have pulled while we waited for the lock
+                if i < len(self.chunks) or self.finished:
+                    continue
+                try:
+                    self.chunks.append(next(self.source))
+                    self.last_activity = time.monotonic()
+                except StopIteration:
+                    self.finished = True
+                    self._on_done()
+                except Exception as e:
+                    self.error, self.finished = e, True
+                    self._on_done()
+
+    def abandon(self):
+        """Stops an upstream stream nobody reads any more."""
+        with self._pull_lock:
+            if self.finished:
+                return
+            self.finished = True
+            self.error = RuntimeError("Shared stream was abandoned by all of its consumers")
+        try:
+            close = getattr(self.source, "close", None)
+            if close is not None:
+                close()
+        except Exception as e:
+            print(f"Single Flight Error: {e}")
+
+
+class _StreamConsumer:
+    """One caller's position in a _SharedStream; closing it (or dropping it) detaches the caller."""
+
+    def __init__(self, shared, release):
+        self._shared = shared
+        self._release = release
+        self._next = 0
+        self._closed = False
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        if self._closed:
+            raise StopIteration
+        try:
+            chunk = self._shared.chunk(self._next)
+        except BaseException:
+            self.close()
+            raise
+        self._next += 1
+        return chunk
+
+    def close(self):
+        if not self._closed:
+            self._closed = True
+            self._release()
+
+    def __del__(self):
+        # Consumers dropped mid-stream (a rerun, a closed tab) still detach
+        self.close()
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent identical requests: the first caller for a key (the
+    leader) runs the upstream call, callers arriving while it is in flight wait
+    and receive a copy of its result (or its exception). Nothing is kept once
+    the call completes; repeated requests over time are the response cache's job.
+    """
+
+    def __init__(self, enabled=SINGLE_FLIGHT_ENABLED):
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self._calls = {}    # key -> _Call
+        self._streams = {}  # key -> _SharedStream
+        self._stats = {"leaders": 0, "coalesced": 0, "stream_leaders": 0, "stream_coalesced": 0,
+                       "stream_abandoned": 0, "stream_stale": 0, "shared_errors": 0, "max_waiters": 0}
+
+    def do(self, key, fn):
+        """Returns (result, coalesced): coalesced is True when another caller's request was reused."""
+        if not self.enabled:
+            return fn(), False
+
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+                self._stats["leaders"] += 1
+            else:
+                call.waiters += 1
+                self._stats["coalesced"] += 1
+                self._stats["max_waiters"] = max(self._stats["max_waiters"], call.waiters)
+
+        if not leader:
+            with span("singleflight.wait") as sp:
+                call.done.wait()
+                sp.set(failed=call.error is not None)
+            if call.error is not None:
+                with self._lock:
+                    self._stats["shared_errors"] += 1
+                raise call.error
+            # Callers own their result: never hand out the leader's object
+            return copy.deepcopy(call.result), True
+
+        try:
+            call.result = fn()
+            return call.result, False
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+            call.done.set()
+
+    def stream(self, key, make_stream):
+        """
+        Streaming variant of do(): returns (deltas, coalesced). Callers joining
+        an in-flight stream replay the deltas received so far, then follow live.
+        """
+        if not self.enabled:
+            return make_stream(), False
+
+        with self._lock:
+            shared = self._streams.get(key)
+            if shared is not None and time.monotonic() - shared.last_activity > STREAM_IDLE_SECONDS:
+                # Stalled upstream (or consumers that never let go): do not join it
+                del self._streams[key]
+                self._stats["stream_stale"] += 1
+                shared = None
+            coalesced = shared is not None
+            if coalesced:
+                self._stats["stream_coalesced"] += 1
+            else:
+                shared = _SharedStream(make_stream(), lambda: self._forget_stream(key, shared))
+                self._streams[key] = shared
+                self._stats["stream_leaders"] += 1
+            shared.consumers += 1
+        return _StreamConsumer(shared, lambda: self._release_stream(key, shared)), coalesced
+
+    def _forget_stream(self, key, shared):
+        with self._lock:
+            if self._streams.get(key) is shared:
+                del self._streams[key]
+
+    def _release_stream(self, key, shared):
+        """A consumer left: the last one out of an unfinished stream stops it."""
+        with self._lock:
+            shared.consumers -= 1
+            abandoned = shared.consumers == 0 and not shared.finished
+            if abandoned:
+                if self._streams.get(key) is shared:
+                    del self._streams[key]
+                self._stats["stream_abandoned"] += 1
+        if abandoned:
+            shared.abandon()
+
+    def stats(self):
+        with self._lock:
+            upstream = self._stats["leaders"] + self._stats["stream_leaders"]
+            coalesced = self._stats["coalesced"] + self._stats["stream_coalesced"]
+            return {**self._stats, "in_flight": len(self._calls) + len(self._streams),
+                    "coalesced_ratio": round(coalesced / (upstream + coalesced), 4) if upstream + coalesced else 0.0}
+
+
+_lock = threading.Lock()
+_flight = None
+
+
+def get_single_flight():
+    """Returns the process-wide single-flight group shared by the brain modules."""
+    global _flight
+    if _flight is None:
+        with _lock:
+            if _flight is None:
+                _flight = SingleFlight()
+    return _flight
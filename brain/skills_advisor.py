@@ -1,11 +1,11 @@
-import os
-import streamlit as st
-import json
-from openai import OpenAI
-from dotenv import load_dotenv
+from tracing import traced
+from brain.groq_client import get_api_key, get_client
+from brain.response_cache import get_cache, make_key
+from brain.model_router import LARGE_MODEL, get_router, complete_json
+from brain.single_flight import get_single_flight
 
-# Initialize environment variables for local development access
-load_dotenv()
+# Bump whenever the prompt template changes so stale cache entries are ignored
+PROMPT_VERSION = "1"
 
 class SkillAdvisor:
     """
@@ -13,34 +13,28 @@ class SkillAdvisor:
     Supports English, Arabic, and French.
     """
     
+    @traced(tool="Skill Advisor")
     def __init__(self):
         # 1. Initialize attributes to None to prevent "no attribute 'client'" errors
         self.client = None
         self.api_key = None
-        self.model = "llama-3.3-70b-versatile"
+        self.model = LARGE_MODEL
+        # Token usage of the most recent Groq call (None when served from cache)
+        self.last_usage = None
+        # How the most recent result was reused (None when freshly generated)
+        self.last_match = None
 
-        # 2. Securely fetch the API key with fallback logic (Cloud -> Local)
-        try:
-            # Check if running on Streamlit Cloud (using Secrets)
-            if hasattr(st, "secrets") and "GROQ_API_KEY" in st.secrets:
-                self.api_key = st.secrets["GROQ_API_KEY"]
-            else:
-                # Fallback to local .env environment variable
-                self.api_key = os.getenv("GROQ_API_KEY")
-        except Exception:
-            # Final fallback to os.getenv if st.secrets triggers an error locally
-            self.api_key = os.getenv("GROQ_API_KEY")
+        # 2. Resolve the API key once per process (Cloud Secrets -> local .env)
+        self.api_key = get_api_key()
 
-        # 3. Validate key existence before proceeding
+        # 3. Validate API key existence
         if not self.api_key:
             raise ValueError("CRITICAL: GROQ_API_KEY is missing. Add it to .env (local) or Secrets (cloud).")
 
-        # 4. Initialize the OpenAI client pointing to Groq's API
-        self.client = OpenAI(
-            api_key=self.api_key,
-            base_url="https://api.groq.com/openai/v1"
-        )
+        # 4. Reuse the process-wide pooled Groq client (keep-alive connections)
+        self.client = get_client()
 
+    @traced(tool="Skill Advisor")
     def analyze_skills(self, current_skills: str, target_role: str, language: str) -> dict:
         """
         Compares current skills with a target job role and suggests missing skills.
@@ -70,22 +64,48 @@ class SkillAdvisor:
         Return JSON with keys: gap_analysis, tech_skills, soft_skills, roadmap.
         """
 
+        # Serve repeated (normalized) inputs from the response cache
+        self.last_usage = None
+        self.last_match = None
+        cache = get_cache()
+        # Results are keyed by the tier that answers: a fast-model answer never stands in for the large one
+        route_input = f"{target_role}\n{current_skills}"
+        decision = get_router().route("skills", route_input)
+        cache_key = make_key("skills", decision["model"], PROMPT_VERSION, current_skills=current_skills, target_role=target_role, language=language)
+        if cache is not None:
+            cached = cache.get(cache_key)
+            if cached is not None:
+                self.last_match = {"cache_match": "exact"}
+                return cached
+
+        # A workshop sending the same role/skills at once shares one Groq call
+        (result, usage), coalesced = get_single_flight().do(
+            f"skills:{cache_key}", lambda: self._request(system_msg, user_msg, route_input, decision, cache, cache_key))
+        if coalesced:
+            self.last_match = {"cache_match": "coalesced"}
+        else:
+            self.last_usage = usage
+        return result
+
+    def _request(self, system_msg, user_msg, route_input, decision, cache, cache_key):
+        """One Groq call: returns (result, usage), storing successes in the cache."""
         try:
             # Execute API call with JSON mode enabled
-            response = self.client.chat.completions.create(
-                model=self.model,
+            # Short role/skills pairs may go to the fast model (escalated on invalid JSON)
+            result, usage = complete_json(
+                "skills", self.client.chat.completions.create, route_input, decision=decision,
                 messages=[
                     {"role": "system", "content": system_msg},
                     {"role": "user", "content": user_msg}
                 ],
                 response_format={"type": "json_object"}
             )
-            
-            # Parse the text response into a Python dictionary
-            return json.loads(response.choices[0].message.content)
+            if cache is not None:
+                cache.set(cache_key, result)
+            return result, usage
         except Exception as e:
             # Professional fallback error reporting
-            return {"error": f"Skill analysis failed via Groq: {str(e)}"}
+            return {"error": f"Skill analysis failed via Groq: {str(e)}"}, None
 
 if __name__ == "__main__":
     # Module testing entry point
@@ -0,0 +1,12 @@
+"""
+LinkBrain AI | Process configuration
+
+Applies the local .env file to the environment once per process. Modules read
+their settings with os.getenv when they are imported, so entry points import
+this module first; values already set in the environment (deployment secrets,
+CLI overrides) take precedence over .env.
+"""
+from dotenv import load_dotenv
+
+# Load local environment variables (used for local development only)
+load_dotenv()
@@ -1,46 +1,600 @@
+import os
+import json
+import math
+import time
+import queue
+import atexit
 import sqlite3
+import threading
 from datetime import datetime
+from tracing import current_trace_id
 
-def log_performance(tool_name, latency, status, length):
+DB_PATH = 'linkbrain_admin.db'
+
+# Background writer tuning (override through .env or the deployment environment)
+LOG_QUEUE_SIZE = int(os.getenv("LINKBRAIN_LOG_QUEUE_SIZE", "10000"))
+LOG_BATCH_SIZE = int(os.getenv("LINKBRAIN_LOG_BATCH_SIZE", "200"))
+LOG_FLUSH_INTERVAL = float(os.getenv("LINKBRAIN_LOG_FLUSH_INTERVAL", "1.0"))
+LOG_PUT_TIMEOUT = float(os.getenv("LINKBRAIN_LOG_PUT_TIMEOUT", "0.5"))
+# Trace span retention: spans older than this or beyond the newest TRACE_MAX_SPANS are deleted
+TRACE_RETENTION_DAYS = float(os.getenv("LINKBRAIN_TRACE_RETENTION_DAYS", "7"))
+TRACE_MAX_SPANS = int(os.getenv("LINKBRAIN_TRACE_MAX_SPANS", "200000"))
+# Old spans are pruned once every this many written spans (and on the writer's first span batch)
+TRACE_PRUNE_EVERY = 5000
+
+# Status codes stored in perf_logs.status_code (HTTP-style)
+STATUS_OK = 200
+STATUS_ERROR = 500
+
+def split_status(status):
+    """
+    Splits the free-form status used by the UI ("Success", "Error: ...",
+    "PDF Error: ...") into (status_code, error_class, error_detail).
+    """
+    status = str(status or "").strip()
+    if not status or status.lower() == "success":
+        return STATUS_OK, None, None
+    error_class, _, detail = status.partition(":")
+    return STATUS_ERROR, error_class.strip() or "Error", detail.strip() or None
+
+def nearest_rank_index(q, n):
+    """0-based position of the nearest-rank q-quantile among n sorted values."""
+    # The epsilon keeps float noise (0.57 * 100 = 56.99...) from moving the rank
+    return min(n, max(1, math.ceil(q * n - 1e-9))) - 1
+
+def nearest_rank(values, q):
+    """
+    Nearest-rank q-quantile of raw values: the convention LatencySketch uses,
+    so raw-row and rollup percentiles agree (None for no values).
+    """
+    values = sorted(v for v in values if v == v)
+    return values[nearest_rank_index(q, len(values))] if values else None
+
+class LatencySketch:
+    """
+    Mergeable quantile sketch for latencies (DDSketch-style log buckets).
+    Values land in bucket ceil(log_gamma(ms)), so any quantile is reported within
+    ~1% relative error and two sketches merge by adding bucket counts.
+    """
+    GAMMA = 1.02
+
+    def __init__(self, buckets=None):
+        self.buckets = dict(buckets or {})
+
+    @property
+    def count(self):
+        return sum(self.buckets.values())
+
+    def add(self, seconds, n=1):
+        ms = max(float(seconds or 0) * 1000, 0.0)
+        # Everything at or below 1 ms (including 0 for failed calls) shares bucket 0
+        index = 0 if ms <= 1 else math.ceil(math.log(ms, self.GAMMA))
+        self.buckets[index] = self.buckets.get(index, 0) + n
+
+    def merge(self, other):
+        for index, n in other.buckets.items():
+            self.buckets[index] = self.buckets.get(index, 0) + n
+        return self
+
+    def quantile(self, q):
+        """Returns the nearest-rank q-quantile in seconds (None for an empty sketch)."""
+        total = self.count
+        if not total:
+            return None
+        rank = nearest_rank_index(q, total) + 1
+        seen = 0
+        for index in sorted(self.buckets):
+            seen += self.buckets[index]
+            if seen >= rank:
+                if index == 0:
+                    return 0.0
+                # Midpoint (in relative terms) of the bucket (gamma^(i-1), gamma^i]
+                return 2 * self.GAMMA ** index / (self.GAMMA + 1) / 1000
+        return None
+
+    def to_json(self):
+        return json.dumps(self.buckets, separators=(',', ':'))
+
+    @classmethod
+    def from_json(cls, text):
+        return cls({int(k): v for k, v in json.loads(text or '{}').items()})
+
+# Rollup tables and their bucket width in milliseconds
+ROLLUPS = {
+    'perf_rollup_minute': 60 * 1000,
+    'perf_rollup_hour': 3600 * 1000
+}
+
+def _update_rollups(conn, rows):
+    """
+    Folds perf_logs rows (dicts) into the per-tool minute/hour rollups.
+    Runs inside the caller's transaction so logs and rollups never disagree.
+    """
+    for table, width in ROLLUPS.items():
+        deltas = {}
+        for row in rows:
+            key = (row['tool_name'], row['timestamp'] - row['timestamp'] % width)
+            delta = deltas.setdefault(key, [0, 0, 0.0, LatencySketch()])
+            delta[0] += 1
+            delta[1] += 0 if row['status_code'] == STATUS_OK else 1
+            delta[2] += row['latency'] or 0.0
+            delta[3].add(row['latency'])
+
+        for (tool_name, bucket_start), (count, errors, latency_sum, sketch) in deltas.items():
+            existing = conn.execute(f"SELECT sketch FROM {table} WHERE tool_name = ? AND bucket_start = ?",
+                                    (tool_name, bucket_start)).fetchone()
+            if existing:
+                sketch.merge(LatencySketch.from_json(existing[0]))
+            conn.execute(f"""INSERT INTO {table} (tool_name, bucket_start, count, error_count, latency_sum, sketch)
+                             VALUES (?, ?, ?, ?, ?, ?)
+                             ON CONFLICT (tool_name, bucket_start) DO UPDATE SET
+                                 count = count + excluded.count,
+                                 error_count = error_count + excluded.error_count,
+                                 latency_sum = latency_sum + excluded.latency_sum,
+                                 sketch = excluded.sketch""",
+                         (tool_name, bucket_start, count, errors, latency_sum, sketch.to_json()))
+
+def _migration_1(conn):
+    """v1: the original perf_logs table (plus the ttft column added for streaming)."""
+    conn.execute('''CREATE TABLE IF NOT EXISTS perf_logs
+                    (id INTEGER PRIMARY KEY AUTOINCREMENT,
+                     tool_name TEXT,
+                     timestamp DATETIME,
+                     latency REAL,
+                     status TEXT,
+                     content_length INTEGER,
+                     ttft REAL)''')
+    columns = [row[1] for row in conn.execute("PRAGMA table_info(perf_logs)")]
+    if 'ttft' not in columns:
+        conn.execute("ALTER TABLE perf_logs ADD COLUMN ttft REAL")
+
+def _migration_2(conn):
+    """
+    v2: integer epoch-millisecond timestamps, status split into status_code /
+    error_class / error_detail, and indexes for recent and per-tool queries.
+    Existing rows are converted in chunks and keep their ids.
+    """
+    conn.execute('''CREATE TABLE perf_logs_v2
+                    (id INTEGER PRIMARY KEY AUTOINCREMENT,
+                     tool_name TEXT NOT NULL,
+                     timestamp INTEGER NOT NULL,
+                     latency REAL,
+                     status_code INTEGER NOT NULL,
+                     error_class TEXT,
+                     error_detail TEXT,
+                     content_length INTEGER,
+                     ttft REAL)''')
+
+    old_rows = conn.execute("SELECT id, tool_name, timestamp, latency, status, content_length, ttft FROM perf_logs")
+    while True:
+        chunk = old_rows.fetchmany(10000)
+        if not chunk:
+            break
+        converted = []
+        for row_id, tool_name, ts, latency, status, length, ttft in chunk:
+            try:
+                # Legacy rows hold local-time datetime strings
+                epoch_ms = int(datetime.fromisoformat(str(ts)).timestamp() * 1000)
+            except ValueError:
+                epoch_ms = 0
+            converted.append((row_id, tool_name or "Unknown", epoch_ms, latency, *split_status(status), length, ttft))
+        conn.executemany("INSERT INTO perf_logs_v2 VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", converted)
+
+    conn.execute("DROP TABLE perf_logs")
+    conn.execute("ALTER TABLE perf_logs_v2 RENAME TO perf_logs")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_perf_logs_timestamp ON perf_logs (timestamp)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_perf_logs_tool_timestamp ON perf_logs (tool_name, timestamp)")
+
+def _migration_3(conn):
+    """v3: per-tool minute and hour latency rollups, backfilled from perf_logs."""
+    for table in ROLLUPS:
+        conn.execute(f'''CREATE TABLE {table}
+                         (tool_name TEXT NOT NULL,
+                          bucket_start INTEGER NOT NULL,
+                          count INTEGER NOT NULL,
+                          error_count INTEGER NOT NULL,
+                          latency_sum REAL NOT NULL,
+                          sketch TEXT NOT NULL,
+                          PRIMARY KEY (tool_name, bucket_start))''')
+        conn.execute(f"CREATE INDEX idx_{table}_bucket ON {table} (bucket_start)")
+
+    old_rows = conn.execute("SELECT tool_name, timestamp, latency, status_code FROM perf_logs ORDER BY id")
+    while True:
+        chunk = old_rows.fetchmany(10000)
+        if not chunk:
+            break
+        _update_rollups(conn, [dict(zip(('tool_name', 'timestamp', 'latency', 'status_code'), row)) for row in chunk])
+
+# Token usage and Groq server timings captured from each completion
+USAGE_COLUMNS = (('model', 'TEXT'), ('prompt_tokens', 'INTEGER'), ('completion_tokens', 'INTEGER'),
+                 ('total_tokens', 'INTEGER'), ('queue_time', 'REAL'), ('prompt_time', 'REAL'),
+                 ('completion_time', 'REAL'))
+
+def _migration_4(conn):
+    """v4: real token usage and server-side timings (NULL for rows logged before)."""
+    for name, sql_type in USAGE_COLUMNS:
+        conn.execute(f"ALTER TABLE perf_logs ADD COLUMN {name} {sql_type}")
+
+def _migration_5(conn):
+    """v5: locally stored trace spans, linked to perf_logs through trace_id."""
+    conn.execute('''CREATE TABLE trace_spans
+                    (span_id TEXT PRIMARY KEY,
+                     trace_id TEXT NOT NULL,
+                     parent_id TEXT,
+                     name TEXT NOT NULL,
+                     start_ms REAL NOT NULL,
+                     duration_ms REAL NOT NULL,
+                     status TEXT NOT NULL,
+                     attributes TEXT)''')
+    conn.execute("CREATE INDEX idx_trace_spans_trace ON trace_spans (trace_id)")
+    conn.execute("CREATE INDEX idx_trace_spans_start ON trace_spans (start_ms)")
+    conn.execute("ALTER TABLE perf_logs ADD COLUMN trace_id TEXT")
+
+MATCH_COLUMNS = (('cache_match', 'TEXT'), ('match_distance', 'INTEGER'))
+
+def _migration_6(conn):
+    """v6: how a result was served from the response cache ('exact' / 'near' duplicate)."""
+    for name, sql_type in MATCH_COLUMNS:
+        conn.execute(f"ALTER TABLE perf_logs ADD COLUMN {name} {sql_type}")
+
+# Time spent queued for Groq RPM/TPM quota before the request went out
+QUOTA_COLUMNS = (('rate_limit_wait', 'REAL'),)
+
+def _migration_7(conn):
+    """v7: client-side rate limiter queue wait, kept apart from model latency."""
+    for name, sql_type in QUOTA_COLUMNS:
+        conn.execute(f"ALTER TABLE perf_logs ADD COLUMN {name} {sql_type}")
+
+# Model tier routing decision (brain/model_router.py) behind each row
+ROUTE_COLUMNS = (('route_reason', 'TEXT'), ('escalated', 'INTEGER'))
+
+def _migration_8(conn):
+    """v8: why a model tier was chosen, and whether a fast-tier answer was escalated."""
+    for name, sql_type in ROUTE_COLUMNS:
+        conn.execute(f"ALTER TABLE perf_logs ADD COLUMN {name} {sql_type}")
+
+# Tail-latency hedging (brain/hedging.py): a duplicate request was sent / answered first
+HEDGE_COLUMNS = (('hedged', 'INTEGER'), ('hedge_won', 'INTEGER'))
+
+def _migration_9(conn):
+    """v9: request hedging outcome (NULL when the call was not eligible)."""
+    for name, sql_type in HEDGE_COLUMNS:
+        conn.execute(f"ALTER TABLE perf_logs ADD COLUMN {name} {sql_type}")
+
+# Ordered schema history: (version, migration). Append new entries, never edit old ones.
+MIGRATIONS = [
+    (1, _migration_1),
+    (2, _migration_2),
+    (3, _migration_3),
+    (4, _migration_4),
+    (5, _migration_5),
+    (6, _migration_6),
+    (7, _migration_7),
+    (8, _migration_8),
+    (9, _migration_9),
+]
+SCHEMA_VERSION = MIGRATIONS[-1][0]
+
+def migrate(conn):
+    """
+    Upgrades the database in place to SCHEMA_VERSION.
+    The applied version lives in PRAGMA user_version; each step runs in its own transaction.
+    """
+    if conn.execute("PRAGMA user_version").fetchone()[0] >= SCHEMA_VERSION:
+        return conn
+    for version, step in MIGRATIONS:
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            # Re-read under the write lock: another process may have migrated already
+            if conn.execute("PRAGMA user_version").fetchone()[0] >= version:
+                conn.execute("COMMIT")
+                continue
+            step(conn)
+            conn.execute(f"PRAGMA user_version = {version}")
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+    return conn
+
+def connect(db_path=DB_PATH):
+    """Opens a WAL-mode connection on a fully migrated database."""
+    conn = sqlite3.connect(db_path, timeout=30, isolation_level=None)
+    conn.execute("PRAGMA journal_mode=WAL")
+    return migrate(conn)
+
+# Columns written by log_performance (rows travel through the queue as dicts)
+LOG_COLUMNS = ('tool_name', 'timestamp', 'latency', 'status_code', 'error_class',
+               'error_detail', 'content_length', 'ttft', 'trace_id') + tuple(name for name, _ in USAGE_COLUMNS + MATCH_COLUMNS + QUOTA_COLUMNS + ROUTE_COLUMNS + HEDGE_COLUMNS)
+INSERT_LOG_SQL = (f"INSERT INTO perf_logs ({', '.join(LOG_COLUMNS)}) "
+                  f"VALUES ({', '.join(':' + c for c in LOG_COLUMNS)})")
+SPAN_COLUMNS = ('span_id', 'trace_id', 'parent_id', 'name', 'start_ms', 'duration_ms', 'status', 'attributes')
+INSERT_SPAN_SQL = (f"INSERT OR REPLACE INTO trace_spans ({', '.join(SPAN_COLUMNS)}) "
+                   f"VALUES ({', '.join(':' + c for c in SPAN_COLUMNS)})")
+
+class PerfLogWriter:
+    """
+    Background writer for perf_logs and trace_spans.
+    Callers only pay for a queue put; a single daemon thread owns one WAL-mode
+    connection and inserts rows with executemany once LOG_BATCH_SIZE rows are
+    pending or LOG_FLUSH_INTERVAL seconds have passed. The minute/hour rollups
+    are updated in the same transaction; trace_spans, which has no rollup, is
+    pruned to TRACE_RETENTION_DAYS and TRACE_MAX_SPANS as spans come in.
+    """
+    _STOP = object()
+
+    def __init__(self, db_path=DB_PATH, queue_size=LOG_QUEUE_SIZE,
+                 batch_size=LOG_BATCH_SIZE, flush_interval=LOG_FLUSH_INTERVAL,
+                 trace_retention_days=TRACE_RETENTION_DAYS, trace_max_spans=TRACE_MAX_SPANS):
+        self.db_path = db_path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.trace_retention_days = trace_retention_days
+        self.trace_max_spans = trace_max_spans
+        self.dropped = 0
+        # Prune on the first span batch: a database from an older run may hold any number of spans
+        self._spans_since_prune = TRACE_PRUNE_EVERY
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._thread = threading.Thread(target=self._run, name="perf-log-writer", daemon=True)
+        self._thread.start()
+
+    def submit(self, row, timeout=LOG_PUT_TIMEOUT, kind='log'):
+        """
+        Enqueues one row (`kind` is 'log' or 'span'). When the queue is full the
+        caller is held back for up to `timeout` seconds (back-pressure); after
+        that the row is dropped and counted.
+        """
+        try:
+            self._queue.put((kind, row), timeout=timeout)
+            return True
+        except queue.Full:
+            self.dropped += 1
+            return False
+
+    def flush(self, timeout=5.0):
+        """Blocks until every queued row is committed (or the timeout expires)."""
+        deadline = time.time() + timeout
+        while self._queue.unfinished_tasks and time.time() < deadline:
+            time.sleep(0.01)
+        return self._queue.unfinished_tasks == 0
+
+    def close(self, timeout=5.0):
+        """Flushes pending rows and stops the writer thread."""
+        if self._thread.is_alive():
+            self._queue.put(self._STOP)
+            self._thread.join(timeout)
+
+    def _run(self):
+        conn = None
+        batch = []
+        last_flush = time.time()
+        while True:
+            wait = max(0.0, self.flush_interval - (time.time() - last_flush))
+            try:
+                item = self._queue.get(timeout=wait)
+            except queue.Empty:
+                item = None
+
+            stop = item is self._STOP
+            if item is not None and not stop:
+                batch.append(item)
+
+            if batch and (stop or len(batch) >= self.batch_size
+                          or time.time() - last_flush >= self.flush_interval):
+                conn = self._write(conn, batch)
+                # Mark rows done only after the commit so flush() means "on disk"
+                for _ in batch:
+                    self._queue.task_done()
+                batch = []
+                last_flush = time.time()
+            elif not batch:
+                # Idle: the next row starts a fresh flush window
+                last_flush = time.time()
+
+            if stop:
+                self._queue.task_done()
+                if conn is not None:
+                    conn.close()
+                return
+
+    def _write(self, conn, rows):
+        try:
+            if conn is None:
+                conn = connect(self.db_path)
+                conn.execute("PRAGMA synchronous=NORMAL")
+            logs = [row for kind, row in rows if kind == 'log']
+            spans = [row for kind, row in rows if kind == 'span']
+            conn.execute("BEGIN")
+            if logs:
+                conn.executemany(INSERT_LOG_SQL, logs)
+                _update_rollups(conn, logs)
+            if spans:
+                conn.executemany(INSERT_SPAN_SQL, spans)
+                self._spans_since_prune += len(spans)
+                if self._spans_since_prune >= TRACE_PRUNE_EVERY:
+                    self._spans_since_prune = 0
+                    self._prune_spans(conn)
+            conn.execute("COMMIT")
+        except Exception as e:
+            # Fail silently in production, but helpful for debugging during development
+            print(f"Database Logging Error: {e}")
+            if conn is not None:
+                if conn.in_transaction:
+                    conn.execute("ROLLBACK")
+                conn.close()
+            conn = None
+        return conn
+
+    def _prune_spans(self, conn):
+        """Deletes spans past the retention age, then the oldest beyond the row cap (writer thread)."""
+        cutoff_ms = (time.time() - self.trace_retention_days * 86400) * 1000
+        conn.execute("DELETE FROM trace_spans WHERE start_ms < ?", (cutoff_ms,))
+        conn.execute("DELETE FROM trace_spans WHERE start_ms < (SELECT start_ms FROM trace_spans "
+                     "ORDER BY start_ms DESC LIMIT 1 OFFSET ?)", (self.trace_max_spans - 1,))
+
+_writer = None
+_writer_lock = threading.Lock()
+
+def _get_writer():
+    global _writer
+    if _writer is None:
+        with _writer_lock:
+            if _writer is None:
+                _writer = PerfLogWriter()
+                atexit.register(_writer.close)
+    return _writer
+
+def log_performance(tool_name, latency, status, length, ttft=None, usage=None, match=None):
     """
     Performance Logging Engine: Tracks API latency, status codes, and response length
     for the LinkBrain Developer Dashboard.
+    For streamed tools, `ttft` is the time-to-first-token in seconds
+    (`latency` stays the total time until the last token).
+    `usage` is the dict from brain.groq_client.extract_usage (a brain module's
+    last_usage): model, prompt/completion/total tokens, Groq server timings and
+    rate_limit_wait, the seconds spent queued for quota (part of `latency`),
+    plus the routing decision (route_reason, escalated) of brain/model_router.py
+    and the hedging outcome (hedged, hedge_won) of brain/hedging.py.
+    `match` (a brain module's last_match) marks results reused from the cache:
+    {"cache_match": "exact"} or {"cache_match": "near", "distance": bits}.
+    Rows are written asynchronously by PerfLogWriter; `status` is split into
+    status_code / error_class / error_detail and the timestamp is epoch milliseconds.
     """
-    try:
-        # Connect to the local SQLite database
-        conn = sqlite3.connect('linkbrain_admin.db')
-        c = conn.cursor()
-        
-        # Create the logs table if it doesn't exist
-        c.execute('''CREATE TABLE IF NOT EXISTS perf_logs 
-                     (id INTEGER PRIMARY KEY AUTOINCREMENT, 
-                      tool_name TEXT, 
-                      timestamp DATETIME, 
-                      latency REAL, 
-                      status TEXT,
-                      content_length INTEGER)''')
-        
-        # Insert the performance metrics into the database
-        c.execute("INSERT INTO perf_logs (tool_name, timestamp, latency, status, content_length) VALUES (?, ?, ?, ?, ?)",
-                  (tool_name, datetime.now(), latency, status, length))
-        
-        # Commit changes and close connection
-        conn.commit()
-        conn.close()
-    except Exception as e:
-        # Fail silently in production, but helpful for debugging during development
-        print(f"Database Logging Error: {e}")
+    status_code, error_class, error_detail = split_status(status)
+    row = {
+        'tool_name': tool_name,
+        'timestamp': int(time.time() * 1000),
+        'latency': latency,
+        'status_code': status_code,
+        'error_class': error_class,
+        'error_detail': error_detail,
+        'content_length': length,
+        'ttft': ttft,
+        'trace_id': current_trace_id()
+    }
+    for name, _ in USAGE_COLUMNS + QUOTA_COLUMNS + ROUTE_COLUMNS + HEDGE_COLUMNS:
+        row[name] = (usage or {}).get(name)
+    row['cache_match'] = (match or {}).get('cache_match')
+    row['match_distance'] = (match or {}).get('distance')
+    _get_writer().submit(row)
+
+def log_span(span, duration_ms):
+    """Queues a finished tracing.Span for the trace_spans table."""
+    _get_writer().submit({
+        'span_id': span.span_id,
+        'trace_id': span.trace_id,
+        'parent_id': span.parent_id,
+        'name': span.name,
+        'start_ms': span.start * 1000,
+        'duration_ms': duration_ms,
+        'status': span.status,
+        'attributes': json.dumps(span.attributes, default=str)
+    }, kind='span')
+
+def flush_logs(timeout=5.0):
+    """Waits until queued performance rows are committed (no-op if nothing was logged)."""
+    if _writer is None:
+        return True
+    return _writer.flush(timeout)
 
 def get_recent_logs(limit=10):
     """
     Utility function to fetch the most recent performance logs.
     """
     try:
-        conn = sqlite3.connect('linkbrain_admin.db')
+        # Read-your-writes: commit anything still sitting in the queue
+        flush_logs()
+        conn = connect()
         c = conn.cursor()
         c.execute("SELECT * FROM perf_logs ORDER BY timestamp DESC LIMIT ?", (limit,))
         logs = c.fetchall()
         conn.close()
         return logs
     except:
-        return []
\ No newline at end of file
+        return []
+
+def get_tool_logs(tool_name, limit=100, since_ms=0):
+    """
+    Most recent logs for one tool (served by the (tool_name, timestamp) index).
+    """
+    try:
+        flush_logs()
+        conn = connect()
+        c = conn.cursor()
+        c.execute("SELECT * FROM perf_logs WHERE tool_name = ? AND timestamp >= ? ORDER BY timestamp DESC LIMIT ?",
+                  (tool_name, since_ms, limit))
+        logs = c.fetchall()
+        conn.close()
+        return logs
+    except:
+        return []
+
+def get_latency_percentiles(since_ms, until_ms=None, quantiles=(0.5, 0.95, 0.99), db_path=DB_PATH):
+    """
+    Per-tool latency summary over [since_ms, until_ms) read only from the rollups.
+    Windows shorter than a day use minute buckets, longer ones hour buckets.
+    Returns {tool_name: {'count', 'errors', 'mean', 'p50', 'p95', 'p99'}} plus an 'All Tools' entry.
+    """
+    until_ms = until_ms or int(time.time() * 1000)
+    table = 'perf_rollup_minute' if until_ms - since_ms < 24 * 3600 * 1000 else 'perf_rollup_hour'
+    width = ROLLUPS[table]
+    conn = connect(db_path)
+    rows = conn.execute(f"SELECT tool_name, count, error_count, latency_sum, sketch FROM {table} "
+                        f"WHERE bucket_start >= ? AND bucket_start < ?",
+                        (since_ms - since_ms % width, until_ms)).fetchall()
+    conn.close()
+
+    merged = {}
+    for tool_name, count, errors, latency_sum, sketch in rows:
+        for name in (tool_name, 'All Tools'):
+            acc = merged.setdefault(name, [0, 0, 0.0, LatencySketch()])
+            acc[0] += count
+            acc[1] += errors
+            acc[2] += latency_sum
+            acc[3].merge(LatencySketch.from_json(sketch))
+
+    summary = {}
+    for name, (count, errors, latency_sum, sketch) in merged.items():
+        summary[name] = {'count': count, 'errors': errors, 'mean': latency_sum / count if count else None}
+        for q in quantiles:
+            summary[name][f"p{round(q * 100)}"] = sketch.quantile(q)
+    return summary
+
+def get_rollup_series(since_ms, granularity='minute', db_path=DB_PATH):
+    """Per-bucket rollup rows (tool_name, bucket_start, count, error_count, p50, p95, p99) for charts."""
+    table = f'perf_rollup_{granularity}'
+    conn = connect(db_path)
+    rows = conn.execute(f"SELECT tool_name, bucket_start, count, error_count, sketch FROM {table} "
+                        f"WHERE bucket_start >= ? ORDER BY bucket_start", (since_ms,)).fetchall()
+    conn.close()
+    series = []
+    for tool_name, bucket_start, count, errors, sketch in rows:
+        sketch = LatencySketch.from_json(sketch)
+        series.append((tool_name, bucket_start, count, errors,
+                       sketch.quantile(0.5), sketch.quantile(0.95), sketch.quantile(0.99)))
+    return series
+
+def get_recent_traces(limit=50, db_path=DB_PATH):
+    """Most recent root spans: (trace_id, name, start_ms, duration_ms, status, attributes)."""
+    conn = connect(db_path)
+    rows = conn.execute("SELECT trace_id, name, start_ms, duration_ms, status, attributes FROM trace_spans "
+                        "WHERE parent_id IS NULL ORDER BY start_ms DESC LIMIT ?", (limit,)).fetchall()
+    conn.close()
+    return rows
+
+def get_trace(trace_id, db_path=DB_PATH):
+    """All spans of one trace ordered by start time, attributes decoded."""
+    conn = connect(db_path)
+    rows = conn.execute("SELECT span_id, parent_id, name, start_ms, duration_ms, status, attributes FROM trace_spans "
+                        "WHERE trace_id = ? ORDER BY start_ms", (trace_id,)).fetchall()
+    conn.close()
+    return [{'span_id': r[0], 'parent_id': r[1], 'name': r[2], 'start_ms': r[3], 'duration_ms': r[4],
+             'status': r[5], 'attributes': json.loads(r[6] or '{}')} for r in rows]
+
+def get_span_breakdown(since_ms, db_path=DB_PATH):
+    """Count, mean and total duration per span name since `since_ms` (where the seconds go)."""
+    conn = connect(db_path)
+    rows = conn.execute("SELECT name, COUNT(*), AVG(duration_ms), SUM(duration_ms) FROM trace_spans "
+                        "WHERE start_ms >= ? GROUP BY name ORDER BY SUM(duration_ms) DESC", (since_ms,)).fetchall()
+    conn.close()
+    return rows
@@ -1,13 +1,139 @@
+import time
+import threading
 import streamlit as st
-import sqlite3
 import pandas as pd
 import plotly.express as px
 from datetime import datetime
+import config  # noqa: F401  (.env, before the modules below read their settings)
+from database import connect, nearest_rank, get_latency_percentiles, get_recent_traces, get_trace, get_span_breakdown, STATUS_OK
+
+# perf_logs stores epoch milliseconds; charts are shown in server-local time
+LOCAL_TZ = datetime.now().astimezone().tzinfo
+
+# Groq list prices in USD per 1M tokens: (input, output)
+MODEL_PRICING = {
+    "llama-3.3-70b-versatile": (0.59, 0.79),
+    "llama-3.1-8b-instant": (0.05, 0.08)
+}
+
+# Raw rows kept in memory for the log table (percentiles come from the rollups)
+TAIL_MAX_ROWS = 50000
+
+class LogTail:
+    """
+    Incrementally maintained view of perf_logs.
+    Each refresh reads only rows with an id above the last one seen, appends
+    them to a bounded frame of recent rows and folds them into running totals,
+    so KPIs and volume charts cover the full history without re-reading it.
+    """
+    def __init__(self, db_path, max_rows=TAIL_MAX_ROWS):
+        self.db_path = db_path
+        self.max_rows = max_rows
+        self.last_id = 0
+        self.frame = pd.DataFrame()
+        self._lock = threading.Lock()
+
+        # Running aggregates over every row ever seen
+        self.count = 0
+        self.success_count = 0
+        self.latency_sum = 0.0
+        self.ttft_sum = 0.0
+        self.ttft_count = 0
+        self.tokens_total = 0.0
+        self.cost_total = 0.0
+        self.completion_tokens_sum = 0.0
+        self.completion_time_sum = 0.0
+        self.queue_time_sum = 0.0
+        self.queue_time_count = 0
+        self.quota_wait_sum = 0.0
+        self.quota_wait_count = 0
+        self.exact_matches = 0
+        self.near_matches = 0
+        self.coalesced_matches = 0
+        self.hedge_eligible = 0
+        self.hedges_sent = 0
+        self.hedge_wins = 0
+        self.tool_counts = pd.Series(dtype='int64')
+        self.tool_tokens = pd.Series(dtype='float64')
+        self.tool_cost = pd.Series(dtype='float64')
+        self.hourly_counts = pd.Series(dtype='int64')
+        self.daily_tokens = pd.Series(dtype='float64')
+
+    def refresh(self):
+        """Fetches and folds in rows newer than last_id. Returns the number of new rows."""
+        with self._lock:
+            # connect() upgrades older databases to the current schema first
+            conn = connect(self.db_path)
+            new = pd.read_sql_query("SELECT * FROM perf_logs WHERE id > ? ORDER BY id", conn, params=(self.last_id,))
+            conn.close()
+            if new.empty:
+                return 0
+
+            new['timestamp'] = (pd.to_datetime(new['timestamp'], unit='ms', utc=True)
+                                .dt.tz_convert(LOCAL_TZ).dt.tz_localize(None))
+            # Real usage reported by Groq; rows logged before usage capture
+            # (or cache hits) fall back to the old length-based estimate
+            estimate = (new['content_length'].fillna(0) / 4) * 1.3
+            new['tokens_estimated'] = new['total_tokens'].isna()
+            new['tokens'] = new['total_tokens'].fillna(estimate)
+            new['cost_usd'] = self._cost(new)
+            self._fold(new)
+
+            self.frame = pd.concat([self.frame, new], ignore_index=True) if not self.frame.empty else new
+            if len(self.frame) > self.max_rows:
+                self.frame = self.frame.iloc[-self.max_rows:].reset_index(drop=True)
+            self.last_id = int(new['id'].iloc[-1])
+            return len(new)
+
+    def _fold(self, new):
+        self.count += len(new)
+        self.success_count += int((new['status_code'] == STATUS_OK).sum())
+        self.latency_sum += float(new['latency'].fillna(0).sum())
+        ttft = new['ttft'].dropna()
+        self.ttft_sum += float(ttft.sum())
+        self.ttft_count += len(ttft)
+        self.tokens_total += float(new['tokens'].sum())
+        self.cost_total += float(new['cost_usd'].sum())
+
+        # Generation speed only from rows where Groq reported both figures
+        timed = new.dropna(subset=['completion_tokens', 'completion_time'])
+        self.completion_tokens_sum += float(timed['completion_tokens'].sum())
+        self.completion_time_sum += float(timed['completion_time'].sum())
+        queue_time = new['queue_time'].dropna()
+        self.queue_time_sum += float(queue_time.sum())
+        self.queue_time_count += len(queue_time)
+        # Client-side wait for RPM/TPM quota (our limiter), not Groq's own queue
+        quota_wait = new['rate_limit_wait'].dropna()
+        self.quota_wait_sum += float(quota_wait.sum())
+        self.quota_wait_count += len(quota_wait)
+        self.exact_matches += int((new['cache_match'] == 'exact').sum())
+        self.near_matches += int((new['cache_match'] == 'near').sum())
+        self.coalesced_matches += int((new['cache_match'] == 'coalesced').sum())
+        # Hedging outcome is NULL for calls that could not be hedged
+        hedged = new['hedged'].dropna()
+        self.hedge_eligible += len(hedged)
+        self.hedges_sent += int(hedged.sum())
+        self.hedge_wins += int(new['hedge_won'].fillna(0).sum())
+
+        self.tool_counts = self.tool_counts.add(new.groupby('tool_name').size(), fill_value=0)
+        self.tool_tokens = self.tool_tokens.add(new.groupby('tool_name')['tokens'].sum(), fill_value=0)
+        self.tool_cost = self.tool_cost.add(new.groupby('tool_name')['cost_usd'].sum(), fill_value=0)
+        self.hourly_counts = self.hourly_counts.add(new.groupby(new['timestamp'].dt.floor('h')).size(), fill_value=0)
+        self.daily_tokens = self.daily_tokens.add(new.groupby(new['timestamp'].dt.date)['tokens'].sum(), fill_value=0)
+
+    @staticmethod
+    def _cost(new):
+        """USD cost per row from real token counts (0 when the model or usage is unknown)."""
+        prices = new['model'].map(lambda m: MODEL_PRICING.get(m, (0.0, 0.0)))
+        input_price = prices.map(lambda p: p[0])
+        output_price = prices.map(lambda p: p[1])
+        return (new['prompt_tokens'].fillna(0) * input_price
+                + new['completion_tokens'].fillna(0) * output_price) / 1e6
 
 class LinkBrainMonitor:
     """
     LinkBrain AI | Engine Room (Developer Dashboard)
-    Optimized for Groq Cloud performance tracking and Llama 3 token estimation.
+    Optimized for Groq Cloud performance tracking and Llama 3 token usage.
     """
     def __init__(self, db_path='linkbrain_admin.db'):
         self.db_path = db_path
@@ -31,60 +157,157 @@ class LinkBrainMonitor:
         """, unsafe_allow_html=True)
 
     def fetch_logs(self):
-        """Connects to SQLite and processes performance data for analysis."""
+        """Returns the shared LogTail after pulling only the rows added since the last rerun."""
+        tail = get_log_tail(self.db_path)
         try:
-            conn = sqlite3.connect(self.db_path)
-            query = "SELECT * FROM perf_logs ORDER BY timestamp DESC"
-            df = pd.read_sql_query(query, conn)
-            conn.close()
-            
-            if not df.empty:
-                df['timestamp'] = pd.to_datetime(df['timestamp'])
-                # Llama 3 estimation: ~0.75 tokens per word (more efficient than GPT-4)
-                # Using 1.3 as a balanced multiplier for diverse languages
-                df['est_tokens'] = (df['content_length'] / 4) * 1.3 
-            return df
+            tail.refresh()
         except Exception as e:
             st.error(f"Database Connection Error: {e}")
-            return pd.DataFrame()
+        return tail
 
     def render_header(self):
         st.markdown("<h1 style='color: #f0f6fc;'>⚡ LinkBrain AI <span style='color: #58a6ff; font-weight: 200;'>Engine Room</span></h1>", unsafe_allow_html=True)
         st.markdown("<p style='color: #8b949e;'>Real-time Performance Monitoring for Groq LPU™ Infrastructure</p>", unsafe_allow_html=True)
 
-    def render_kpi_layer(self, df):
+    def render_kpi_layer(self, tail):
         """Displays key system performance indicators."""
-        m1, m2, m3, m4, m5 = st.columns(5)
-        
-        # Core Analytics Logic
-        avg_lat = df['latency'].mean()
-        # Ensure we count any non-error status as success
-        success_rate = (len(df[~df['status'].str.contains('Error', na=False)]) / len(df)) * 100
-        total_tokens = df['est_tokens'].sum()
-        today_data = df[df['timestamp'].dt.date == datetime.now().date()]
+        m1, m2, m3, m4, m5, m6 = st.columns(6)
+
+        # Core Analytics Logic (running totals, no full-table scan)
+        avg_lat = tail.latency_sum / tail.count
+        success_rate = tail.success_count / tail.count * 100
+        tokens_today = tail.daily_tokens.get(datetime.now().date(), 0)
 
         m1.metric("Avg Latency", f"{avg_lat:.2f}s")
         m2.metric("Success Rate", f"{success_rate:.1f}%")
-        m3.metric("Total Executions", f"{len(df):,}")
-        m4.metric("Total Tokens (Est)", f"{int(total_tokens):,}")
-        m5.metric("Tokens Today (Est)", f"{int(today_data['est_tokens'].sum()):,}")
+        m3.metric("Total Executions", f"{tail.count:,}")
+        m4.metric("Total Tokens", f"{int(tail.tokens_total):,}")
+        m5.metric("Tokens Today", f"{int(tokens_today):,}")
+        # Time-to-first-token is only recorded by the streamed tools (posts & chat)
+        m6.metric("Avg TTFT (Streamed)", f"{tail.ttft_sum / tail.ttft_count:.2f}s" if tail.ttft_count else "n/a")
+
+        # Figures computed from the usage block Groq returns with each completion
+        g1, g2, g3, g4, g5, g6 = st.columns(6)
+        g1.metric("Generation Speed", f"{tail.completion_tokens_sum / tail.completion_time_sum:,.0f} tok/s"
+                  if tail.completion_time_sum else "n/a")
+        g2.metric("Avg Groq Queue Time", f"{tail.queue_time_sum / tail.queue_time_count * 1000:.0f} ms"
+                  if tail.queue_time_count else "n/a")
+        g3.metric("Avg Quota Wait (Limiter)", f"{tail.quota_wait_sum / tail.quota_wait_count * 1000:.0f} ms"
+                  if tail.quota_wait_count else "n/a")
+        g4.metric("Total Cost", f"${tail.cost_total:,.4f}")
+        g5.metric("Reuse (Exact / Near-Dup / Coalesced)",
+                  f"{tail.exact_matches:,} / {tail.near_matches:,} / {tail.coalesced_matches:,}")
+        # Duplicate requests raced against slow Profile/Skill calls, and how often they answered first
+        g6.metric("Hedges (Sent / Won)", f"{tail.hedges_sent:,} / {tail.hedge_wins:,}",
+                  f"{tail.hedges_sent / tail.hedge_eligible:.1%} of eligible" if tail.hedge_eligible else None,
+                  delta_color="off")
 
-    def render_charts(self, df):
+    def render_latency_percentiles(self, window_seconds):
+        """Tail latency (p50/p95/p99) for the selected window, read only from the rollup tables."""
+        since_ms = int((time.time() - window_seconds) * 1000) if window_seconds else 0
+        summary = get_latency_percentiles(since_ms, db_path=self.db_path)
+        overall = summary.pop('All Tools', None)
+        if not overall:
+            st.info("No executions in the selected window.")
+            return None
+
+        p1, p2, p3, p4 = st.columns(4)
+        p1.metric("p50 Latency", f"{overall['p50']:.2f}s")
+        p2.metric("p95 Latency", f"{overall['p95']:.2f}s")
+        p3.metric("p99 Latency", f"{overall['p99']:.2f}s")
+        p4.metric("Error Rate (Window)", f"{overall['errors'] / overall['count'] * 100:.1f}%")
+
+        rows = [{'tool_name': tool, 'percentile': p, 'latency': stats[p]}
+                for tool, stats in summary.items() for p in ('p50', 'p95', 'p99')]
+        return pd.DataFrame(rows)
+
+    def render_traces(self, window_seconds):
+        """Waterfall of one request's spans plus where the time goes across all traces."""
+        traces = get_recent_traces(db_path=self.db_path)
+        if not traces:
+            st.info("No traces recorded yet (check LINKBRAIN_TRACE_ENABLED / LINKBRAIN_TRACE_SAMPLE_RATE).")
+            return
+
+        labels = {
+            f"{datetime.fromtimestamp(t[2] / 1000, LOCAL_TZ).strftime('%H:%M:%S')} | {t[1]} | "
+            f"{t[3]:.0f} ms{' | ERROR' if t[4] != 'ok' else ''}": t[0]
+            for t in traces
+        }
+        spans = get_trace(labels[st.selectbox("Trace", list(labels))], db_path=self.db_path)
+
+        # Depth-indented rows, offsets relative to the root span
+        depth = {}
+        origin = min(s['start_ms'] for s in spans)
+        rows = []
+        for s in spans:
+            depth[s['span_id']] = depth.get(s['parent_id'], -1) + 1
+            rows.append({'span': "\u00a0\u00a0" * depth[s['span_id']] + s['name'],
+                         'offset_ms': s['start_ms'] - origin, 'duration_ms': s['duration_ms'],
+                         'status': s['status'], 'details': ", ".join(f"{k}={v}" for k, v in s['attributes'].items())})
+        wf = pd.DataFrame(rows)
+        fig_wf = px.bar(wf, x='duration_ms', y='span', base='offset_ms', orientation='h', color='status',
+                        hover_data=['details'], title="Request Waterfall (ms)", template="plotly_dark",
+                        color_discrete_map={'ok': '#58a6ff', 'error': '#f85149'})
+        fig_wf.update_yaxes(autorange="reversed", categoryorder="array", categoryarray=wf['span'].tolist())
+        st.plotly_chart(fig_wf, use_container_width=True)
+
+        since_ms = int((time.time() - window_seconds) * 1000) if window_seconds else 0
+        breakdown = pd.DataFrame(get_span_breakdown(since_ms, db_path=self.db_path),
+                                 columns=['span', 'count', 'avg_ms', 'total_ms'])
+        st.subheader("Time by Span")
+        st.dataframe(breakdown.round(1), use_container_width=True, hide_index=True)
+
+    def render_routing(self, df):
+        """Per tool and model tier: volume, p50/p95 latency, error and escalation rates."""
+        routed = df[df['route_reason'].notna()]
+        if routed.empty:
+            st.info("No routed Groq calls logged yet.")
+            return
+        summary = routed.groupby(['tool_name', 'model']).agg(
+            calls=('latency', 'size'),
+            p50_latency=('latency', lambda s: nearest_rank(s, 0.5)),
+            p95_latency=('latency', lambda s: nearest_rank(s, 0.95)),
+            error_rate=('status_code', lambda s: (s != STATUS_OK).mean()),
+            escalation_rate=('escalated', 'mean')
+        ).reset_index()
+        st.subheader("Latency by Model Tier")
+        st.dataframe(summary.round(3), use_container_width=True, hide_index=True)
+
+        hedgeable = df[df['hedged'].notna()]
+        if not hedgeable.empty:
+            hedging = hedgeable.groupby('tool_name').agg(
+                calls=('latency', 'size'),
+                hedge_rate=('hedged', 'mean'),
+                hedge_wins=('hedge_won', 'sum'),
+                p99_latency=('latency', lambda s: nearest_rank(s, 0.99))
+            ).reset_index()
+            st.subheader("Request Hedging")
+            st.dataframe(hedging.round(3), use_container_width=True, hide_index=True)
+
+        reasons = routed.groupby(['tool_name', 'route_reason']).size().reset_index(name='calls')
+        fig = px.bar(reasons, x='tool_name', y='calls', color='route_reason', barmode='stack',
+                     title="Routing Decisions", template="plotly_dark")
+        st.plotly_chart(fig, use_container_width=True)
+
+    def render_charts(self, tail, percentiles=None, window_seconds=None):
         """Visualizes performance distribution and consumption patterns."""
-        tab_perf, tab_usage, tab_raw = st.tabs(["📈 Performance Analysis", "📊 Distribution", "📂 System Logs"])
+        df = tail.frame
+        tab_perf, tab_usage, tab_routing, tab_traces, tab_raw = st.tabs(
+            ["📈 Performance Analysis", "📊 Distribution", "🔀 Model Routing", "🧵 Traces", "📂 System Logs"])
 
         with tab_perf:
             col1, col2 = st.columns(2)
             with col1:
-                # Analyzing latency spread - crucial for monitoring Groq speed
-                fig_box = px.box(df, x='tool_name', y='latency', color='tool_name',
-                                title="Latency Spread by Feature", template="plotly_dark",
-                                color_discrete_sequence=px.colors.qualitative.Safe)
-                st.plotly_chart(fig_box, use_container_width=True)
-            
+                # Tail latency per feature - crucial for monitoring Groq speed
+                if percentiles is not None and not percentiles.empty:
+                    fig_pct = px.bar(percentiles, x='tool_name', y='latency', color='percentile', barmode='group',
+                                     title="Latency Percentiles by Feature", template="plotly_dark",
+                                     color_discrete_sequence=px.colors.qualitative.Safe)
+                    st.plotly_chart(fig_pct, use_container_width=True)
+
             with col2:
                 # Request volume timeline (Hourly)
-                df_time = df.set_index('timestamp').resample('H').size().reset_index(name='counts')
+                df_time = tail.hourly_counts.sort_index().rename_axis('timestamp').reset_index(name='counts')
                 fig_line = px.line(df_time, x='timestamp', y='counts', title="Request Volume Timeline",
                                   template="plotly_dark", line_shape="spline")
                 fig_line.update_traces(line_color='#58a6ff', fill='tozeroy')
@@ -94,33 +317,57 @@ class LinkBrainMonitor:
             col3, col4 = st.columns(2)
             with col3:
                 # Share of requests across different tools
-                fig_pie = px.pie(df, names='tool_name', hole=0.6, title="Feature Usage Share",
+                usage_df = tail.tool_counts.rename_axis('tool_name').reset_index(name='runs')
+                fig_pie = px.pie(usage_df, names='tool_name', values='runs', hole=0.6, title="Feature Usage Share",
                                 template="plotly_dark", color_discrete_sequence=px.colors.sequential.Blues_r)
                 st.plotly_chart(fig_pie, use_container_width=True)
-            
+
             with col4:
                 # Token burn rate visualization
-                token_df = df.groupby('tool_name')['est_tokens'].sum().reset_index()
-                fig_bar = px.bar(token_df, x='tool_name', y='est_tokens', color='tool_name',
+                token_df = tail.tool_tokens.rename_axis('tool_name').reset_index(name='tokens')
+                token_df['cost_usd'] = token_df['tool_name'].map(tail.tool_cost).fillna(0)
+                fig_bar = px.bar(token_df, x='tool_name', y='tokens', color='tool_name', hover_data=['cost_usd'],
                                 title="Token Consumption per Feature", template="plotly_dark")
                 st.plotly_chart(fig_bar, use_container_width=True)
 
+        with tab_routing:
+            self.render_routing(df)
+
+        with tab_traces:
+            self.render_traces(window_seconds)
+
         with tab_raw:
             st.subheader("Raw System Execution Logs")
-            # Filtering for scannability
-            st.dataframe(df[['timestamp', 'tool_name', 'latency', 'status', 'est_tokens']], 
+            # Newest first, capped so the table stays responsive
+            st.dataframe(df[['timestamp', 'tool_name', 'model', 'latency', 'ttft', 'rate_limit_wait', 'route_reason', 'escalated', 'hedged', 'hedge_won', 'status_code', 'error_class', 'error_detail',
+                             'prompt_tokens', 'completion_tokens', 'tokens', 'tokens_estimated', 'cost_usd', 'cache_match', 'match_distance', 'trace_id']].iloc[::-1].head(1000),
                          use_container_width=True, hide_index=True)
 
+@st.cache_resource
+def get_log_tail(db_path):
+    """One LogTail per database, shared by every dashboard session."""
+    return LogTail(db_path)
+
 # Main Execution Flow
 if __name__ == "__main__":
     monitor = LinkBrainMonitor()
     monitor.render_header()
-    
-    data = monitor.fetch_logs()
-    
-    if not data.empty:
-        monitor.render_kpi_layer(data)
-        st.divider()
-        monitor.render_charts(data)
-    else:
-        st.warning("System database initialized but no operational logs found yet. Execute AI tools to see analytics.")
\ No newline at end of file
+
+    refresh_options = {"Off": None, "5 seconds": 5, "15 seconds": 15, "1 minute": 60}
+    refresh_every = refresh_options[st.sidebar.selectbox("Auto-refresh", list(refresh_options))]
+    window_options = {"Last hour": 3600, "Last 24 hours": 86400, "Last 7 days": 7 * 86400, "All time": None}
+    window = window_options[st.sidebar.selectbox("Latency window", list(window_options), index=1)]
+
+    @st.fragment(run_every=refresh_every)
+    def live_view():
+        tail = monitor.fetch_logs()
+
+        if tail.count:
+            monitor.render_kpi_layer(tail)
+            percentiles = monitor.render_latency_percentiles(window)
+            st.divider()
+            monitor.render_charts(tail, percentiles, window)
+        else:
+            st.warning("System database initialized but no operational logs found yet. Execute AI tools to see analytics.")
+
+    live_view()
@@ -0,0 +1,314 @@
+"""
+LinkBrain AI | End-to-end Load Test
+
+Drives the real brain modules (Profile, Post, Skills, Networking, Coach) and
+the PDF export with N concurrent virtual users against an OpenAI-compatible
+endpoint - normally mock_groq_server.py - and writes a JSON report with
+throughput, latency percentiles and error rates per scenario.
+
+Usage:
+    python load_test.py --start-mock --users 50 --duration 60 -o load_report.json
+    python load_test.py --base-url http://127.0.0.1:8765/openai/v1 --mix profile=1,chat=1
+"""
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import threading
+import urllib.request
+from urllib.parse import urlparse
+from datetime import datetime, timezone
+
+# .env first: main() then overrides the endpoint and switches explicitly
+import config  # noqa: F401
+
+DEFAULT_BASE_URL = "http://127.0.0.1:8765/openai/v1"
+DEFAULT_MIX = "profile=3,post=2,skills=2,networking=2,chat=2,pdf=1"
+PERCENTILES = (50, 90, 95, 99)
+
+SAMPLE_PROFILE = (
+    "Senior Data Engineer with 6 years of experience building batch and streaming pipelines "
+    "on AWS. Led the migration of a 40 TB warehouse to Snowflake, cut nightly ETL runtime by 60% "
+    "and mentored four junior engineers. Skills: Python, SQL, Spark, Airflow, Kafka, dbt, Terraform."
+)
+SAMPLE_BUNDLE = {
+    "profile": {"score": 72, "summary": "Experienced data engineer.", "strengths": ["Spark", "AWS", "Mentoring"],
+                "weaknesses": ["Headline", "Metrics", "Recommendations"]},
+    "roadmap": {"roadmap": {"Month 1": {"Goal": "MLOps basics", "Actions": ["Course", "Side project"]},
+                            "Month 2": {"Goal": "System design", "Actions": ["Mock interviews"]}}},
+    "networking": {"recommendations": [{"name": "Chip Huyen", "profile_link": "https://www.linkedin.com/in/chiphuyen",
+                                        "reason": "ML systems"}]},
+    "role": "ML Engineer"
+}
+
+
+def classify_error(error):
+    """Maps an exception or a brain {"error": ...} message to a coarse error class."""
+    text = f"{type(error).__name__}: {error}" if isinstance(error, BaseException) else str(error)
+    lowered = text.lower()
+    if "circuit open" in lowered:
+        return "circuit_open"
+    if "429" in text or "ratelimit" in lowered or "rate limit" in lowered:
+        return "rate_limited"
+    if any(marker in text for marker in ("Expecting", "Unterminated", "JSONDecodeError", "delimiter")):
+        return "malformed_json"
+    if "timeout" in lowered or "timed out" in lowered:
+        return "timeout"
+    if "connection" in lowered:
+        return "connection"
+    if any(code in text for code in ("500", "502", "503", "504")) or "internalservererror" in lowered:
+        return "server_error"
+    return "other"
+
+
+def percentile(sorted_values, p):
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return None
+    # Imported here: database pulls in tracing, which reads LINKBRAIN_TRACE_ENABLED
+    # once, and main() sets it only after this module is loaded
+    from database import nearest_rank_index
+    return sorted_values[nearest_rank_index(p / 100, len(sorted_values))]
+
+
+def summarize_latencies(values_ms):
+    values = sorted(values_ms)
+    if not values:
+        return None
+    summary = {f"p{p}": round(percentile(values, p), 1) for p in PERCENTILES}
+    summary["mean"] = round(sum(values) / len(values), 1)
+    summary["max"] = round(values[-1], 1)
+    return summary
+
+
+class Scenarios:
+    """One method per user-facing code path; each returns (ok, error, ttft_seconds)."""
+
+    def __init__(self):
+        # Imported only after main() has pointed the environment at the target endpoint
+        from brain.profile_analyzer import ProfileAnalyzer
+        from brain.post_generator import PostGenerator
+        from brain.skills_advisor import SkillAdvisor
+        from brain.network_advisor import NetworkAdvisor
+        from brain.career_coach import CareerCoach
+        from utils.pdf_exporter import PDFReport
+        self.ProfileAnalyzer, self.PostGenerator = ProfileAnalyzer, PostGenerator
+        self.SkillAdvisor, self.NetworkAdvisor = SkillAdvisor, NetworkAdvisor
+        self.CareerCoach, self.PDFReport = CareerCoach, PDFReport
+
+    @staticmethod
+    def _unique(text, seq):
+        # Distinct inputs so the response cache cannot short-circuit the run
+        return f"{text}\nReference {seq}"
+
+    @staticmethod
+    def _structured(result):
+        if "error" in result:
+            return False, result["error"], None
+        return True, None, None
+
+    @staticmethod
+    def _streamed(stream, started):
+        ttft = None
+        for _ in stream:
+            if ttft is None:
+                ttft = time.time() - started
+        return True, None, ttft
+
+    def profile(self, seq, started):
+        return self._structured(self.ProfileAnalyzer().analyze_profile(self._unique(SAMPLE_PROFILE, seq)))
+
+    def skills(self, seq, started):
+        return self._structured(self.SkillAdvisor().analyze_skills(
+            self._unique("Python, SQL, Spark, Airflow", seq), "ML Engineer", "English"))
+
+    def networking(self, seq, started):
+        return self._structured(self.NetworkAdvisor().get_recommendations(self._unique(SAMPLE_PROFILE, seq)))
+
+    def post(self, seq, started):
+        return self._streamed(self.PostGenerator().stream_post(
+            self._unique("Lessons from migrating a data warehouse", seq), "Professional", "English"), started)
+
+    def chat(self, seq, started):
+        messages = [{"role": "user", "content": self._unique("How do I move from data engineering to ML?", seq)}]
+        return self._streamed(self.CareerCoach().stream_response(messages, context_data=SAMPLE_BUNDLE["profile"]), started)
+
+    def pdf(self, seq, started):
+        self.PDFReport().generate_master_report(SAMPLE_BUNDLE)
+        return True, None, None
+
+
+class LoadTest:
+    """Closed-loop load: every virtual user runs one scenario after another until the deadline."""
+
+    def __init__(self, scenarios, mix, users, duration, ramp_up=0.0, think_time=0.0, seed=None):
+        self.scenarios = scenarios
+        self.names = list(mix)
+        self.weights = [mix[name] for name in self.names]
+        self.users = users
+        self.duration = duration
+        self.ramp_up = ramp_up
+        self.think_time = think_time
+        self.rng = random.Random(seed)
+        self.samples = []  # (scenario, ok, latency_ms, ttft_ms, error_class)
+        self._lock = threading.Lock()
+        self._seq = 0
+
+    def _next_seq(self):
+        with self._lock:
+            self._seq += 1
+            return self._seq
+
+    def _user(self, index, deadline):
+        rng = random.Random(self.rng.random())
+        if self.ramp_up:
+            time.sleep(self.ramp_up * index / self.users)
+        while time.time() < deadline:
+            name = rng.choices(self.names, self.weights)[0]
+            started = time.time()
+            try:
+                ok, error, ttft = getattr(self.scenarios, name)(self._next_seq(), started)
+            except Exception as e:
+                ok, error, ttft = False, e, None
+            latency_ms = (time.time() - started) * 1000
+            with self._lock:
+                self.samples.append((name, ok, latency_ms, ttft * 1000 if ttft is not None else None,
+                                     None if ok else classify_error(error)))
+            if self.think_time:
+                time.sleep(rng.expovariate(1 / self.think_time))
+
+    def run(self):
+        started = time.time()
+        deadline = started + self.duration
+        threads = [threading.Thread(target=self._user, args=(i, deadline), name=f"vu-{i}", daemon=True)
+                   for i in range(self.users)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return self.report(time.time() - started)
+
+    def report(self, elapsed):
+        def block(samples):
+            errors = [s for s in samples if not s[1]]
+            by_class = {}
+            for s in errors:
+                by_class[s[4]] = by_class.get(s[4], 0) + 1
+            ttfts = [s[3] for s in samples if s[3] is not None]
+            return {
+                "requests": len(samples),
+                "ok": len(samples) - len(errors),
+                "errors": len(errors),
+                "error_rate": round(len(errors) / len(samples), 4) if samples else 0.0,
+                "errors_by_class": by_class,
+                "throughput_per_s": round(len(samples) / elapsed, 2) if elapsed else 0.0,
+                "latency_ms": summarize_latencies([s[2] for s in samples]),
+                # Successful requests only: failures would skew the percentiles toward fast errors
+                "latency_ok_ms": summarize_latencies([s[2] for s in samples if s[1]]),
+                "ttft_ms": summarize_latencies(ttfts)
+            }
+
+        with self._lock:
+            samples = list(self.samples)
+        return {
+            "elapsed_s": round(elapsed, 2),
+            "overall": block(samples),
+            "scenarios": {name: block([s for s in samples if s[0] == name]) for name in self.names}
+        }
+
+
+def parse_mix(value):
+    mix = {}
+    for part in value.split(","):
+        name, _, weight = part.partition("=")
+        name = name.strip()
+        if name not in ("profile", "post", "skills", "networking", "chat", "pdf"):
+            raise argparse.ArgumentTypeError(f"Unknown scenario: {name}")
+        mix[name] = float(weight or 1)
+    return mix
+
+
+def fetch_mock_stats(base_url):
+    """Server-side counters from mock_groq_server.py (None for other endpoints)."""
+    root = base_url.split("/openai/")[0].rstrip("/")
+    try:
+        with urllib.request.urlopen(f"{root}/stats", timeout=2) as response:
+            return json.loads(response.read())
+    except Exception:
+        return None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Concurrent virtual-user load test for the LinkBrain brain modules.")
+    parser.add_argument("--base-url", default=DEFAULT_BASE_URL, help="OpenAI-compatible endpoint under test")
+    parser.add_argument("--users", type=int, default=10, help="Concurrent virtual users")
+    parser.add_argument("--duration", type=float, default=30.0, help="Test length in seconds")
+    parser.add_argument("--ramp-up", type=float, default=0.0, help="Seconds over which users are started")
+    parser.add_argument("--think-time", type=float, default=0.0, help="Mean pause between a user's requests (s)")
+    parser.add_argument("--mix", type=parse_mix, default=parse_mix(DEFAULT_MIX), help=f"Scenario weights ({DEFAULT_MIX})")
+    parser.add_argument("--seed", type=int, help="Random seed for reproducible scenario sequences")
+    parser.add_argument("--use-cache", action="store_true", help="Keep the response cache on (off by default)")
+    parser.add_argument("--trace", action="store_true", help="Record spans into linkbrain_admin.db")
+    parser.add_argument("--rate-limit", action="store_true", help="Keep the client-side RPM/TPM limiter on (off by default)")
+    parser.add_argument("--start-mock", action="store_true", help="Run mock_groq_server.py in-process on --base-url's port")
+    parser.add_argument("--max-error-rate", type=float, help="Exit non-zero when the overall error rate is higher")
+    parser.add_argument("-o", "--output", help="Write the JSON report here (default: stdout)")
+    args, mock_argv = parser.parse_known_args(argv)
+
+    mock_server = None
+    if args.start_mock:
+        import mock_groq_server
+        port = urlparse(args.base_url).port or 8765
+        mock_args = mock_groq_server.build_parser().parse_args(mock_argv + ["--port", str(port)])
+        mock_server = mock_groq_server.make_server(mock_args)
+        threading.Thread(target=mock_server.serve_forever, daemon=True).start()
+    elif mock_argv:
+        parser.error(f"unrecognized arguments: {' '.join(mock_argv)}")
+
+    # Configure the brain modules before they are imported (settings are read at import time)
+    os.environ["GROQ_BASE_URL"] = args.base_url
+    os.environ.setdefault("GROQ_API_KEY", "mock-key")
+    os.environ["GROQ_MAX_CONNECTIONS"] = str(max(args.users, int(os.getenv("GROQ_MAX_CONNECTIONS", "100"))))
+    os.environ["GROQ_MAX_KEEPALIVE_CONNECTIONS"] = str(max(args.users, int(os.getenv("GROQ_MAX_KEEPALIVE_CONNECTIONS", "20"))))
+    if not args.use_cache:
+        os.environ["LINKBRAIN_CACHE_ENABLED"] = "0"
+        os.environ["LINKBRAIN_DEDUP_ENABLED"] = "0"
+    if not args.trace:
+        os.environ["LINKBRAIN_TRACE_ENABLED"] = "0"
+    if not args.rate_limit:
+        os.environ["LINKBRAIN_RATE_LIMIT_ENABLED"] = "0"
+
+    test = LoadTest(Scenarios(), args.mix, max(1, args.users), args.duration, args.ramp_up, args.think_time, args.seed)
+    print(f"[load] {args.users} users for {args.duration}s against {args.base_url}", file=sys.stderr)
+    result = test.run()
+
+    report = {
+        "started_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "config": {"base_url": args.base_url, "users": args.users, "duration_s": args.duration,
+                   "ramp_up_s": args.ramp_up, "think_time_s": args.think_time, "mix": args.mix,
+                   "use_cache": args.use_cache, "mock_options": mock_argv},
+        **result,
+        "server": fetch_mock_stats(args.base_url)
+    }
+    if mock_server is not None:
+        mock_server.shutdown()
+
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+
+    overall = report["overall"]
+    print(f"[load] {overall['requests']} requests, {overall['throughput_per_s']}/s, "
+          f"error rate {overall['error_rate']:.2%}, p95 {(overall['latency_ms'] or {}).get('p95')} ms", file=sys.stderr)
+    if args.max_error_rate is not None and overall["error_rate"] > args.max_error_rate:
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
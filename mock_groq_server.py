@@ -0,0 +1,277 @@
+"""
+LinkBrain AI | Mock Groq Server (local load testing)
+
+OpenAI-compatible stand-in for the Groq chat completions API. It simulates
+configurable latency, token streaming, 429 rate limits, server errors and
+malformed JSON, so load tests never burn real Groq quota.
+
+Usage:
+    python mock_groq_server.py --port 8765 --ttft-ms 300 --rate-limit-rate 0.02
+    GROQ_BASE_URL=http://127.0.0.1:8765/openai/v1 GROQ_API_KEY=mock streamlit run app.py
+"""
+import sys
+import json
+import time
+import uuid
+import random
+import argparse
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+FILLER_WORDS = ("strategic career growth leadership data product cloud impact network "
+                "portfolio mentor roadmap skills value market alignment visibility").split()
+
+# One JSON object that satisfies every brain module's schema (and the PDF report)
+JSON_RESULT = {
+    "score": 72,
+    "summary": "Experienced engineer with a solid delivery record and room to sharpen positioning.",
+    "strengths": ["Hands-on delivery", "Cross-team collaboration", "Cloud fundamentals"],
+    "weaknesses": ["Generic headline", "Few quantified results", "Thin recommendations"],
+    "actionable_tips": ["Rewrite the headline", "Quantify three achievements", "Ask for two recommendations"],
+    "gap_analysis": "Missing production ML and system design depth for the target role.",
+    "tech_skills": ["System design", "MLOps", "Distributed data processing"],
+    "soft_skills": ["Stakeholder communication", "Technical writing"],
+    "roadmap": {
+        "Month 1": {"Goal": "Foundations", "Actions": ["Complete a system design course", "Ship one side project"]},
+        "Month 2": {"Goal": "Depth", "Actions": ["Deploy a model with monitoring", "Write two technical posts"]},
+        "Month 3": {"Goal": "Visibility", "Actions": ["Present at a meetup", "Apply to ten target roles"]}
+    },
+    "target_niche": "Machine Learning Engineering",
+    "recommendations": [
+        "Andrew Ng | https://www.linkedin.com/in/andrewyng | Practical AI education",
+        "Chip Huyen | https://www.linkedin.com/in/chiphuyen | ML systems in production",
+        "Eugene Yan | https://www.linkedin.com/in/eugeneyan | Applied ML writing"
+    ]
+}
+
+
+class MockConfig:
+    """Latency and fault-injection knobs shared by every request handler."""
+
+    def __init__(self, args):
+        self.distribution = args.distribution
+        self.ttft_ms = args.ttft_ms
+        self.sigma = args.sigma
+        self.tokens_per_second = args.tokens_per_second
+        self.completion_tokens = args.completion_tokens
+        self.rate_limit_rate = args.rate_limit_rate
+        self.retry_after = args.retry_after
+        self.server_error_rate = args.server_error_rate
+        self.malformed_rate = args.malformed_rate
+        self.rpm_limit = args.rpm_limit
+
+        self.lock = threading.Lock()
+        self.window = []  # request timestamps of the last minute (for --rpm-limit)
+        self.stats = {"requests": 0, "streamed": 0, "rate_limited": 0, "server_errors": 0,
+                      "malformed": 0, "completion_tokens": 0}
+
+    def count(self, key, amount=1):
+        with self.lock:
+            self.stats[key] += amount
+
+    def sample_ttft(self):
+        """Time to first token in seconds, drawn from the configured distribution."""
+        if self.distribution == "fixed":
+            ms = self.ttft_ms
+        elif self.distribution == "uniform":
+            ms = random.uniform(self.ttft_ms * (1 - self.sigma), self.ttft_ms * (1 + self.sigma))
+        else:
+            # lognormal: ttft_ms is the median, sigma shapes the tail
+            ms = random.lognormvariate(0, self.sigma) * self.ttft_ms
+        return max(0.0, ms) / 1000
+
+    def over_rpm(self):
+        if not self.rpm_limit:
+            return False
+        now = time.time()
+        with self.lock:
+            self.window = [t for t in self.window if t > now - 60]
+            if len(self.window) >= self.rpm_limit:
+                return True
+            self.window.append(now)
+            return False
+
+
+class MockGroqHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive, so client connection pooling is exercised
+    config = None
+
+    def log_message(self, format, *args):
+        # Keep the console quiet under load
+        pass
+
+    def do_GET(self):
+        if self.path.rstrip("/").endswith("/models"):
+            self._send_json(200, {"object": "list", "data": [
+                {"id": "llama-3.3-70b-versatile", "object": "model", "owned_by": "mock"},
+                {"id": "llama-3.1-8b-instant", "object": "model", "owned_by": "mock"}
+            ]})
+        elif self.path.rstrip("/") == "/stats":
+            with self.config.lock:
+                self._send_json(200, dict(self.config.stats))
+        else:
+            self._send_json(404, {"error": {"message": "Not found", "type": "invalid_request_error"}})
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        try:
+            body = json.loads(self.rfile.read(length) or b"{}")
+        except ValueError:
+            self._send_json(400, {"error": {"message": "Invalid JSON body", "type": "invalid_request_error"}})
+            return
+        if not self.path.rstrip("/").endswith("/chat/completions"):
+            self._send_json(404, {"error": {"message": "Not found", "type": "invalid_request_error"}})
+            return
+
+        cfg = self.config
+        cfg.count("requests")
+
+        # Fault injection first: 429s and 5xx are returned before any "work"
+        if cfg.over_rpm() or random.random() < cfg.rate_limit_rate:
+            cfg.count("rate_limited")
+            self._send_json(429, {"error": {"message": "Rate limit reached for model (mock)",
+                                            "type": "tokens", "code": "rate_limit_exceeded"}},
+                            headers={"Retry-After": str(cfg.retry_after)})
+            return
+        if random.random() < cfg.server_error_rate:
+            cfg.count("server_errors")
+            self._send_json(503, {"error": {"message": "Service unavailable (mock)", "type": "internal_server_error"}})
+            return
+
+        model = body.get("model", "llama-3.3-70b-versatile")
+        json_mode = (body.get("response_format") or {}).get("type") == "json_object"
+        max_tokens = body.get("max_tokens") or cfg.completion_tokens
+        content = self._completion_text(json_mode, max_tokens)
+        if json_mode and random.random() < cfg.malformed_rate:
+            cfg.count("malformed")
+            content = content[:len(content) // 2]
+
+        prompt_tokens = max(1, len(json.dumps(body.get("messages", []))) // 4)
+        completion_tokens = max(1, len(content) // 4)
+        ttft = cfg.sample_ttft()
+        completion_time = completion_tokens / cfg.tokens_per_second
+        cfg.count("completion_tokens", completion_tokens)
+        usage = {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "total_tokens": prompt_tokens + completion_tokens,
+            "queue_time": round(ttft * 0.1, 4),
+            "prompt_time": round(ttft * 0.9, 4),
+            "completion_time": round(completion_time, 4),
+            "total_time": round(ttft + completion_time, 4)
+        }
+
+        if body.get("stream"):
+            cfg.count("streamed")
+            include_usage = (body.get("stream_options") or {}).get("include_usage")
+            self._stream(model, content, ttft, completion_time, usage if include_usage else None)
+        else:
+            time.sleep(ttft + completion_time)
+            self._send_json(200, {
+                "id": f"chatcmpl-{uuid.uuid4().hex}",
+                "object": "chat.completion",
+                "created": int(time.time()),
+                "model": model,
+                "choices": [{"index": 0, "finish_reason": "stop",
+                             "message": {"role": "assistant", "content": content}}],
+                "usage": usage,
+                "x_groq": {"id": f"req_{uuid.uuid4().hex}"}
+            })
+
+    def _completion_text(self, json_mode, max_tokens):
+        if json_mode:
+            return json.dumps(JSON_RESULT)
+        # ~1 token per word
+        return " ".join(random.choice(FILLER_WORDS) for _ in range(max(1, int(max_tokens))))
+
+    def _stream(self, model, content, ttft, completion_time, usage):
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+
+        chunk_id = f"chatcmpl-{uuid.uuid4().hex}"
+        base = {"id": chunk_id, "object": "chat.completion.chunk", "created": int(time.time()), "model": model}
+        words = content.split(" ")
+        delay = completion_time / max(1, len(words))
+
+        time.sleep(ttft)
+        try:
+            for i, word in enumerate(words):
+                delta = {"content": word if i == 0 else " " + word}
+                if i == 0:
+                    delta["role"] = "assistant"
+                self._write_event({**base, "choices": [{"index": 0, "delta": delta, "finish_reason": None}]})
+                time.sleep(delay)
+            self._write_event({**base, "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}]})
+            if usage is not None:
+                # Groq sends usage on a final, choice-less chunk (and under x_groq)
+                self._write_event({**base, "choices": [], "usage": usage,
+                                   "x_groq": {"id": f"req_{uuid.uuid4().hex}", "usage": usage}})
+            self._write_chunk(b"data: [DONE]\n\n")
+            self._write_chunk(b"")
+        except (BrokenPipeError, ConnectionResetError):
+            # The client cancelled the stream
+            pass
+
+    def _write_event(self, payload):
+        self._write_chunk(f"data: {json.dumps(payload)}\n\n".encode("utf-8"))
+
+    def _write_chunk(self, data):
+        self.wfile.write(f"{len(data):x}\r\n".encode("ascii") + data + b"\r\n")
+        self.wfile.flush()
+
+    def _send_json(self, status, payload, headers=None):
+        data = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="OpenAI-compatible mock of the Groq API for load testing.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--distribution", choices=["lognormal", "uniform", "fixed"], default="lognormal",
+                        help="Time-to-first-token distribution")
+    parser.add_argument("--ttft-ms", type=float, default=300.0, help="Median time to first token")
+    parser.add_argument("--sigma", type=float, default=0.5, help="Spread (lognormal sigma / uniform +- fraction)")
+    parser.add_argument("--tokens-per-second", type=float, default=250.0, help="Simulated generation speed")
+    parser.add_argument("--completion-tokens", type=int, default=150, help="Length of free-text completions")
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0, help="Share of requests answered with 429")
+    parser.add_argument("--retry-after", type=float, default=1.0, help="Retry-After seconds sent with 429s")
+    parser.add_argument("--rpm-limit", type=int, default=0, help="Hard requests-per-minute limit (0 = off)")
+    parser.add_argument("--server-error-rate", type=float, default=0.0, help="Share of requests answered with 503")
+    parser.add_argument("--malformed-rate", type=float, default=0.0, help="Share of JSON-mode replies truncated")
+    return parser
+
+
+def make_server(args):
+    """Builds (but does not start) a threaded mock server for the parsed arguments."""
+    handler = type("ConfiguredMockGroqHandler", (MockGroqHandler,), {"config": MockConfig(args)})
+    server = ThreadingHTTPServer((args.host, args.port), handler)
+    server.daemon_threads = True
+    return server
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    server = make_server(args)
+    print(f"Mock Groq API on http://{args.host}:{server.server_port}/openai/v1", file=sys.stderr)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        print(json.dumps(server.RequestHandlerClass.config.stats), file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
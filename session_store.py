@@ -0,0 +1,322 @@
+"""
+LinkBrain AI | Session Store
+
+Per-user app state (master bundle, chat history, chat summary) kept outside
+st.session_state: a byte-bounded in-memory LRU working set in front of a
+SQLite file. Every save is written through to disk, so evicting a cold
+session only drops it from memory; it is read back transparently on the next
+request, also after a page reload or a server restart.
+
+Session ids are generated on the server. The URL only ever carries a token
+for one (session_token): the id plus an HMAC bound to the visitor's browser,
+so an id the server did not issue, or a link opened in another browser, is
+refused (session_from_token) and starts a fresh session instead.
+
+Usage (stored sessions and their footprint):
+    python session_store.py
+"""
+import os
+import re
+import sys
+import json
+import time
+import zlib
+import hmac
+import hashlib
+import secrets
+import sqlite3
+import threading
+from collections import OrderedDict
+import config  # noqa: F401  (.env, also when run as a script)
+from tracing import span
+
+# Session store tuning (override through .env or the deployment environment)
+SESSION_DB_PATH = os.getenv("LINKBRAIN_SESSION_DB", "linkbrain_sessions.db")
+SESSION_MEMORY_BYTES = int(float(os.getenv("LINKBRAIN_SESSION_MEMORY_MB", "64")) * 1024 * 1024)
+SESSION_MEMORY_ITEMS = int(os.getenv("LINKBRAIN_SESSION_MEMORY_ITEMS", "256"))
+SESSION_TTL_SECONDS = int(os.getenv("LINKBRAIN_SESSION_TTL", str(30 * 24 * 3600)))
+# Key of the session tokens; generated once and kept in the session database when unset
+SESSION_SECRET = os.getenv("LINKBRAIN_SESSION_SECRET", "")
+# Expired rows are deleted once every this many saves
+PRUNE_EVERY = 500
+
+
+def new_session():
+    """State of a session that has not produced anything yet."""
+    return {
+        "master_data": {"profile": None, "roadmap": None, "networking": None, "role": ""},
+        "messages": [],
+        "chat_memory": None,  # ConversationMemory.to_dict()
+    }
+
+
+def new_session_id():
+    """A fresh, unguessable session id (only ever generated here, never taken from a client)."""
+    return secrets.token_hex(16)
+
+
+def browser_key(xsrf_cookie):
+    """
+    Stable per-browser value behind Streamlit's XSRF cookie ("2|mask|masked token|timestamp").
+    The cookie is re-masked on every response, so the token is unmasked before use.
+    Returns None when the cookie is missing or in an unknown format (XSRF protection off).
+    """
+    parts = (xsrf_cookie or "").split("|")
+    if len(parts) != 4 or parts[0] != "2":
+        return None
+    try:
+        mask, masked = bytes.fromhex(parts[1]), bytes.fromhex(parts[2])
+    except ValueError:
+        return None
+    if not mask or not masked:
+        return None
+    return bytes(b ^ mask[i % len(mask)] for i, b in enumerate(masked)).hex()
+
+
+def deep_sizeof(obj, _seen=None):
+    """Bytes held by `obj` and everything it references (dicts, lists, strings, numbers)."""
+    seen = set() if _seen is None else _seen
+    if id(obj) in seen:
+        return 0
+    seen.add(id(obj))
+    size = sys.getsizeof(obj)
+    if isinstance(obj, dict):
+        size += sum(deep_sizeof(k, seen) + deep_sizeof(v, seen) for k, v in obj.items())
+    elif isinstance(obj, (list, tuple, set, frozenset)):
+        size += sum(deep_sizeof(item, seen) for item in obj)
+    return size
+
+
+class SessionStore:
+    """
+    LRU working set of session dicts bounded by total bytes (deep_sizeof) and
+    count, backed by a SQLite table of zlib-compressed JSON. get() returns the
+    live dict: mutate it, then call save() to persist it and refresh its size.
+    """
+
+    def __init__(self, db_path=SESSION_DB_PATH, memory_bytes=SESSION_MEMORY_BYTES,
+                 memory_items=SESSION_MEMORY_ITEMS, ttl=SESSION_TTL_SECONDS, secret=SESSION_SECRET):
+        self.db_path = db_path
+        self.memory_bytes = memory_bytes
+        self.memory_items = memory_items
+        self.ttl = ttl
+
+        self._memory = OrderedDict()  # session_id -> (data, bytes)
+        self._memory_total = 0
+        self._lock = threading.Lock()
+        self._saves_since_prune = 0
+        self._stats = {"memory_hits": 0, "disk_loads": 0, "created": 0, "saves": 0, "evictions": 0}
+
+        self._conn = None
+        try:
+            self._conn = sqlite3.connect(self.db_path, check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.execute('''CREATE TABLE IF NOT EXISTS sessions
+                                  (session_id TEXT PRIMARY KEY,
+                                   data BLOB NOT NULL,
+                                   memory_bytes INTEGER NOT NULL,
+                                   updated_at REAL NOT NULL)''')
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_sessions_updated ON sessions (updated_at)")
+            self._conn.execute("CREATE TABLE IF NOT EXISTS settings (name TEXT PRIMARY KEY, value TEXT NOT NULL)")
+            self._conn.commit()
+        except Exception as e:
+            # Disk layer is optional: sessions then live (and die) in memory only
+            print(f"Session Store Error: {e}")
+            self._conn = None
+        self._secret = self._load_secret(secret)
+
+    def _load_secret(self, secret):
+        """Token key: the configured one, else the one stored with the sessions (created on first use)."""
+        if secret:
+            return secret.encode("utf-8")
+        generated = secrets.token_hex(32)
+        if self._conn is None:
+            # Sessions end with the process anyway, so may their tokens
+            return generated.encode("utf-8")
+        try:
+            self._conn.execute("INSERT OR IGNORE INTO settings (name, value) VALUES ('session_secret', ?)",
+                               (generated,))
+            self._conn.commit()
+            row = self._conn.execute("SELECT value FROM settings WHERE name = 'session_secret'").fetchone()
+            return row[0].encode("utf-8")
+        except Exception as e:
+            print(f"Session Store Error: {e}")
+            return generated.encode("utf-8")
+
+    def _signature(self, session_id, browser):
+        message = f"{session_id}|{browser or ''}".encode("utf-8")
+        return hmac.new(self._secret, message, hashlib.sha256).hexdigest()[:32]
+
+    def session_token(self, session_id, browser=None):
+        """URL-safe token for a server-issued session id, valid only with the same browser key."""
+        return f"{session_id}.{self._signature(session_id, browser)}"
+
+    def session_from_token(self, token, browser=None):
+        """Session id of a token issued by session_token for this browser, else None."""
+        session_id, _, signature = (token or "").partition(".")
+        if not re.fullmatch(r"[0-9a-f]{32}", session_id):
+            return None
+        if not hmac.compare_digest(signature, self._signature(session_id, browser)):
+            return None
+        return session_id
+
+    def get(self, session_id):
+        """Returns the session's live state dict, loading it from disk or creating it."""
+        with self._lock:
+            entry = self._memory.get(session_id)
+            if entry is not None:
+                self._memory.move_to_end(session_id)
+                self._stats["memory_hits"] += 1
+                return entry[0]
+
+        with span("session.load") as sp:
+            data = self._read(session_id)
+            sp.set(found=data is not None)
+        with self._lock:
+            # Another request may have loaded it meanwhile: keep a single live dict
+            entry = self._memory.get(session_id)
+            if entry is not None:
+                return entry[0]
+            if data is None:
+                data = new_session()
+                self._stats["created"] += 1
+            else:
+                self._stats["disk_loads"] += 1
+            self._admit(session_id, data, deep_sizeof(data))
+        return data
+
+    def save(self, session_id, data=None):
+        """Persists the session (write-through) and re-measures its memory footprint."""
+        with self._lock:
+            entry = self._memory.get(session_id)
+        data = data if data is not None else (entry[0] if entry else None)
+        if data is None:
+            return
+        size = deep_sizeof(data)
+        with self._lock:
+            self._admit(session_id, data, size)
+            self._stats["saves"] += 1
+            self._saves_since_prune += 1
+            prune = self._saves_since_prune >= PRUNE_EVERY
+            if prune:
+                self._saves_since_prune = 0
+        with span("session.save", bytes=size):
+            self._write(session_id, data, size)
+        if prune:
+            self.prune()
+
+    def delete(self, session_id):
+        with self._lock:
+            entry = self._memory.pop(session_id, None)
+            if entry is not None:
+                self._memory_total -= entry[1]
+            if self._conn is not None:
+                try:
+                    self._conn.execute("DELETE FROM sessions WHERE session_id = ?", (session_id,))
+                    self._conn.commit()
+                except Exception as e:
+                    print(f"Session Store Error: {e}")
+
+    def footprint(self, session_id):
+        """Memory and on-disk size of one session (None when it is not loaded / not stored)."""
+        with self._lock:
+            entry = self._memory.get(session_id)
+            stored = None
+            if self._conn is not None:
+                try:
+                    stored = self._conn.execute("SELECT length(data) FROM sessions WHERE session_id = ?",
+                                                (session_id,)).fetchone()
+                except Exception as e:
+                    print(f"Session Store Error: {e}")
+        return {"memory_bytes": entry[1] if entry else None, "stored_bytes": stored[0] if stored else None}
+
+    def _admit(self, session_id, data, size):
+        """Inserts/refreshes an entry as most recent, then evicts down to the budget (lock held)."""
+        old = self._memory.pop(session_id, None)
+        if old is not None:
+            self._memory_total -= old[1]
+        self._memory[session_id] = (data, size)
+        self._memory_total += size
+        # Without the disk layer an evicted session would be lost: keep everything.
+        # The newest session always stays, even if it alone exceeds the budget.
+        while self._conn is not None and len(self._memory) > 1 and (len(self._memory) > self.memory_items
+                                         or self._memory_total > self.memory_bytes):
+            _, (_, evicted_size) = self._memory.popitem(last=False)
+            self._memory_total -= evicted_size
+            self._stats["evictions"] += 1
+
+    def _read(self, session_id):
+        if self._conn is None:
+            return None
+        try:
+            with self._lock:
+                row = self._conn.execute("SELECT data, updated_at FROM sessions WHERE session_id = ?",
+                                         (session_id,)).fetchone()
+            if row is None or row[1] < time.time() - self.ttl:
+                return None
+            return json.loads(zlib.decompress(row[0]).decode("utf-8"))
+        except Exception as e:
+            print(f"Session Store Error: {e}")
+            return None
+
+    def _write(self, session_id, data, size):
+        if self._conn is None:
+            return
+        try:
+            blob = zlib.compress(json.dumps(data, ensure_ascii=False, default=str).encode("utf-8"))
+            with self._lock:
+                self._conn.execute("INSERT OR REPLACE INTO sessions (session_id, data, memory_bytes, updated_at) "
+                                   "VALUES (?, ?, ?, ?)", (session_id, blob, size, time.time()))
+                self._conn.commit()
+        except Exception as e:
+            print(f"Session Store Error: {e}")
+
+    def prune(self):
+        """Deletes sessions not saved within the TTL."""
+        if self._conn is None:
+            return
+        try:
+            with self._lock:
+                self._conn.execute("DELETE FROM sessions WHERE updated_at < ?", (time.time() - self.ttl,))
+                self._conn.commit()
+        except Exception as e:
+            print(f"Session Store Error: {e}")
+
+    def stats(self):
+        """Working-set figures of this process plus totals of the disk store."""
+        with self._lock:
+            sizes = [size for _, size in self._memory.values()]
+            stats = dict(self._stats)
+            stats.update(memory_sessions=len(sizes), memory_bytes=self._memory_total,
+                         memory_budget_bytes=self.memory_bytes,
+                         avg_session_bytes=round(sum(sizes) / len(sizes)) if sizes else 0,
+                         max_session_bytes=max(sizes, default=0))
+            if self._conn is not None:
+                try:
+                    row = self._conn.execute("SELECT COUNT(*), COALESCE(SUM(length(data)), 0), "
+                                             "COALESCE(AVG(memory_bytes), 0), COALESCE(MAX(memory_bytes), 0) "
+                                             "FROM sessions").fetchone()
+                    stats.update(stored_sessions=row[0], stored_bytes=row[1],
+                                 stored_avg_memory_bytes=round(row[2]), stored_max_memory_bytes=row[3])
+                except Exception as e:
+                    print(f"Session Store Error: {e}")
+        return stats
+
+
+_lock = threading.Lock()
+_store = None
+
+
+def get_session_store():
+    """Returns the process-wide session store shared by every browser session."""
+    global _store
+    if _store is None:
+        with _lock:
+            if _store is None:
+                _store = SessionStore()
+    return _store
+
+
+if __name__ == "__main__":
+    print(json.dumps(get_session_store().stats(), indent=2))
@@ -0,0 +1,127 @@
+"""
+LinkBrain AI | Startup & Rerun Benchmark
+
+Measures what a Streamlit server pays for app.py: the cold start (first run of
+the script in a fresh process, imports included) and the per-rerun script time
+(every widget interaction re-executes the script). Each sample runs in its own
+interpreter through streamlit.testing, so module caches never leak between
+samples. Point --baseline at another checkout (e.g. `git worktree add
+/tmp/linkbrain-base <ref>`) to compare both trees in one report.
+
+Usage:
+    python startup_benchmark.py --cold-runs 5 --reruns 30 -o startup_report.json
+    python startup_benchmark.py --baseline /tmp/linkbrain-base
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import types
+import subprocess
+import statistics
+
+from load_test import summarize_latencies
+
+# Modules whose import dominates a cold start; reported when the first run loaded them
+HEAVY_MODULES = ("openai", "httpx", "fpdf", "numpy", "pandas", "uharfbuzz")
+
+
+# Runs app.py's compiled code (compiled once, as Streamlit does) and times the script body alone,
+# without the test harness' polling around each run
+WRAPPER = """
+import time
+import streamlit as st
+import _linkbrain_bench
+_started = time.perf_counter()
+try:
+    exec(_linkbrain_bench.code, {"__name__": "__main__"})
+finally:
+    _linkbrain_bench.script_ms.append((time.perf_counter() - _started) * 1000)
+"""
+
+
+def measure(app_dir, reruns):
+    """One sample, run inside a fresh interpreter: returns the timings as a dict."""
+    started = time.perf_counter()
+    from streamlit.testing.v1 import AppTest
+    streamlit_import = time.perf_counter() - started
+
+    os.chdir(app_dir)
+    sys.path.insert(0, app_dir)
+    script_path = os.path.join(app_dir, "app.py")
+    bench = types.ModuleType("_linkbrain_bench")
+    with open(script_path, encoding="utf-8") as f:
+        bench.code = compile(f.read(), script_path, "exec")
+    bench.script_ms = []
+    sys.modules[bench.__name__] = bench
+
+    before = set(sys.modules)
+    app = AppTest.from_string(WRAPPER, default_timeout=120)
+    app.run()
+    if app.exception:
+        raise RuntimeError(f"app.py failed: {app.exception[0].message}")
+    loaded = set(sys.modules) - before
+    for _ in range(reruns):
+        app.run()
+    return {
+        "streamlit_import_s": round(streamlit_import, 4),
+        "first_run_ms": bench.script_ms[0],
+        "modules_loaded": len(loaded),
+        "heavy_modules": sorted(name for name in HEAVY_MODULES if name in loaded),
+        "rerun_ms": bench.script_ms[1:],
+    }
+
+
+def sample(app_dir, reruns):
+    """Runs measure() in a child interpreter (cold caches) and returns its result."""
+    output = subprocess.run([sys.executable, os.path.abspath(__file__), "--child", app_dir, "--reruns", str(reruns)],
+                            capture_output=True, text=True, check=True, cwd=app_dir)
+    return json.loads(output.stdout.strip().splitlines()[-1])
+
+
+def benchmark(app_dir, cold_runs, reruns):
+    samples = [sample(app_dir, reruns) for _ in range(cold_runs)]
+    first_runs = [s["first_run_ms"] for s in samples]
+    return {
+        "app_dir": app_dir,
+        "cold_runs": cold_runs,
+        "streamlit_import_ms": round(statistics.median(s["streamlit_import_s"] for s in samples) * 1000, 1),
+        "cold_start_ms": summarize_latencies(first_runs),
+        "rerun_ms": summarize_latencies([ms for s in samples for ms in s["rerun_ms"]]),
+        "modules_loaded_by_first_run": samples[-1]["modules_loaded"],
+        "heavy_modules_loaded": samples[-1]["heavy_modules"],
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Cold start and per-rerun time of app.py under Streamlit.")
+    parser.add_argument("--app-dir", default=os.path.dirname(os.path.abspath(__file__)), help="Checkout to measure")
+    parser.add_argument("--baseline", help="Second checkout to compare against (e.g. a git worktree of an older ref)")
+    parser.add_argument("--cold-runs", type=int, default=5, help="Fresh processes per checkout")
+    parser.add_argument("--reruns", type=int, default=20, help="Reruns timed per process after the first run")
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    parser.add_argument("-o", "--output", help="Write the JSON report here (default: stdout)")
+    args = parser.parse_args(argv)
+
+    if args.child:
+        print(json.dumps(measure(os.path.abspath(args.child), args.reruns)))
+        return 0
+
+    report = {"current": benchmark(os.path.abspath(args.app_dir), args.cold_runs, args.reruns)}
+    if args.baseline:
+        report["baseline"] = benchmark(os.path.abspath(args.baseline), args.cold_runs, args.reruns)
+        for metric in ("cold_start_ms", "rerun_ms"):
+            base, current = report["baseline"][metric]["p50"], report["current"][metric]["p50"]
+            report.setdefault("p50_speedup", {})[metric] = round(base / current, 2) if current else None
+
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    print(text)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,16 @@
+"""
+Shared test setup: every SQLite file the app creates (admin logs, caches,
+rate limiter, sessions) lands in a throwaway directory, and no test talks to
+Groq or needs a real API key.
+"""
+import os
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+os.environ.setdefault("GROQ_API_KEY", "test-key")
+os.environ["LINKBRAIN_TRACE_ENABLED"] = "0"
+os.environ["LINKBRAIN_RATE_LIMIT_ENABLED"] = "0"
+os.chdir(tempfile.mkdtemp(prefix="linkbrain-tests-"))
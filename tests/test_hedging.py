@@ -0,0 +1,163 @@
+import asyncio
+import threading
+import time
+
+from brain import resilience
+from brain.hedging import Hedger
+
+PARAMS = {"model": "llama-3.3-70b-versatile", "messages": [{"role": "user", "content": "hi"}]}
+
+
+def warmed(seconds=0.05):
+    hedger = Hedger(enabled=True, tools=("profile",), max_rate=1.0, min_samples=5)
+    for _ in range(5):
+        hedger.observe("profile", PARAMS["model"], seconds)
+    return hedger
+
+
+class Response:
+    def __init__(self, text):
+        self.text = text
+        self.closed = False
+
+    def __eq__(self, other):
+        return self.text == other
+
+    def close(self):
+        self.closed = True
+
+
+class SlowFirst:
+    """A client whose first request hangs for `stall` seconds (then fails if `fail`); later ones answer at once."""
+
+    def __init__(self, stall, fail=False):
+        self.stall = stall
+        self.fail = fail
+        self.calls = []
+        self.responses = []
+        self._lock = threading.Lock()
+
+    def __call__(self, **params):
+        with self._lock:
+            n = len(self.calls)
+            self.calls.append(threading.get_ident())
+        if n == 0:
+            time.sleep(self.stall)
+            if self.fail:
+                raise TimeoutError("first request timed out")
+        response = Response(f"response {n}")
+        self.responses.append(response)
+        return response
+
+
+def test_unhedgeable_call_runs_the_callers_create_on_the_callers_thread():
+    create = SlowFirst(stall=0)
+    response, outcome = Hedger(enabled=True, tools=("profile",)).run(create, PARAMS, "profile")
+
+    assert response == "response 0"
+    assert outcome == {"hedged": 0, "hedge_won": 0}
+    assert create.calls == [threading.get_ident()]
+
+
+def test_fast_call_sends_no_duplicate():
+    create = SlowFirst(stall=0)
+    response, outcome = warmed().run(create, PARAMS, "profile")
+
+    assert response == "response 0"
+    assert outcome == {"hedged": 0, "hedge_won": 0}
+    assert len(create.calls) == 1
+
+
+def test_slow_call_keeps_its_request_and_abandons_the_duplicate():
+    create = SlowFirst(stall=1.0)
+    hedger = warmed()
+    response, outcome = hedger.run(create, PARAMS, "profile")
+
+    # The threshold is HEDGE_MIN_DELAY (0.5 s); the first request ran on the caller's thread
+    assert response == "response 0"
+    assert outcome == {"hedged": 1, "hedge_won": 0}
+    assert create.calls[0] == threading.get_ident() != create.calls[1]
+    closed = {r.text: r.closed for r in create.responses}
+    assert closed == {"response 0": False, "response 1": True}
+    assert hedger.stats()["abandoned"] == 1
+
+
+def test_failed_call_falls_back_to_the_duplicate():
+    create = SlowFirst(stall=1.0, fail=True)
+    response, outcome = warmed().run(create, PARAMS, "profile")
+
+    assert response == "response 1"
+    assert outcome == {"hedged": 1, "hedge_won": 1}
+    assert len(create.calls) == 2
+
+
+def test_failure_before_the_threshold_is_raised_without_a_hedge():
+    create = SlowFirst(stall=0.1, fail=True)
+    try:
+        warmed().run(create, PARAMS, "profile")
+    except TimeoutError:
+        pass
+    else:
+        raise AssertionError("the error of the first request must be raised")
+    time.sleep(0.6)
+    assert len(create.calls) == 1
+
+
+def test_hedge_is_skipped_while_all_workers_are_busy():
+    hedger = warmed()
+    assert hedger._free_workers.acquire(blocking=False)
+    for _ in range(hedger.workers - 1):
+        hedger._free_workers.acquire(blocking=False)
+    create = SlowFirst(stall=1.0)
+    response, outcome = hedger.run(create, PARAMS, "profile")
+
+    assert outcome == {"hedged": 0, "hedge_won": 0}
+    assert len(create.calls) == 1
+    assert hedger.stats()["skipped_busy"] == 1
+    assert hedger._has_credit()  # the spent credit was given back
+
+
+def test_concurrent_calls_do_not_queue():
+    hedger = warmed()
+
+    def create(**params):
+        time.sleep(0.2)
+        return "answer"
+
+    threads = [threading.Thread(target=hedger.run, args=(create, PARAMS, "profile")) for _ in range(64)]
+    started = time.monotonic()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert time.monotonic() - started < 0.45
+    assert hedger.stats()["hedged"] == 0
+
+
+def test_call_groq_hedges_with_the_injected_client():
+    create = SlowFirst(stall=0)
+    assert resilience.call_groq(create, hedge="profile", **PARAMS) == "response 0"
+    assert create.calls == [threading.get_ident()]
+
+
+def test_async_quota_check_runs_off_the_event_loop():
+    hedger = warmed()
+    quota_threads = []
+
+    def reserve(tokens):
+        quota_threads.append(threading.get_ident())
+        return True
+    hedger._reserve_quota = reserve
+
+    async def create(**params):
+        await asyncio.sleep(2.0 if not quota_threads else 0)
+        return "answer"
+
+    async def main():
+        response, outcome = await hedger.race(create, PARAMS, "profile")
+        return response, outcome, threading.get_ident()
+
+    response, outcome, loop_thread = asyncio.run(main())
+    assert (response, outcome) == ("answer", {"hedged": 1, "hedge_won": 1})
+    assert quota_threads and quota_threads[0] != loop_thread
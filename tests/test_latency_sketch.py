@@ -0,0 +1,48 @@
+import os
+import subprocess
+import sys
+
+import numpy as np
+import pytest
+
+from database import LatencySketch, nearest_rank
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+QUANTILES = (0.5, 0.9, 0.95, 0.99)
+
+
+def sketch_of(seconds):
+    sketch = LatencySketch()
+    for value in seconds:
+        sketch.add(value)
+    return sketch
+
+
+@pytest.mark.parametrize("n", [1, 7, 20, 100, 1000])
+def test_sketch_matches_numpy_nearest_rank(n):
+    sample = np.random.default_rng(n).lognormal(mean=0.0, sigma=0.8, size=n)  # seconds, median ~1 s
+    sketch = sketch_of(sample)
+    for q in QUANTILES:
+        expected = np.percentile(sample, q * 100, method="inverted_cdf")
+        # Bucket midpoints are within (GAMMA - 1) / (GAMMA + 1) of any value they hold
+        assert sketch.quantile(q) == pytest.approx(expected, rel=0.01)
+
+
+def test_small_window_p99_is_the_slowest_call():
+    # q * (n - 1) ranks put p99 of ten calls on the 9th; nearest rank takes the 10th
+    sample = [0.1 * i for i in range(1, 11)]
+    assert sketch_of(sample).quantile(0.99) == pytest.approx(1.0, rel=0.01)
+
+
+@pytest.mark.parametrize("n", [1, 10, 57, 100])
+def test_raw_percentiles_use_the_same_rank_as_numpy(n):
+    sample = np.random.default_rng(n).exponential(size=n)
+    for q in QUANTILES + (0.57,):
+        assert nearest_rank(sample, q) == np.percentile(sample, q * 100, method="inverted_cdf")
+
+
+def test_load_test_leaves_the_trace_switch_to_main():
+    # database imports tracing, which reads LINKBRAIN_TRACE_ENABLED at import time
+    code = "import sys, load_test; assert 'tracing' not in sys.modules and 'database' not in sys.modules"
+    subprocess.run([sys.executable, "-c", code], check=True, cwd=ROOT)
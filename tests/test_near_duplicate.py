@@ -0,0 +1,35 @@
+import sqlite3
+
+from brain.near_duplicate import SimHashIndex
+
+# Fingerprints at least 32 bits apart from each other
+FINGERPRINTS = {"a": 0, "b": (1 << 64) - 1, "c": (1 << 32) - 1}
+
+
+def stored_keys(db_path):
+    with sqlite3.connect(db_path) as conn:
+        return {row[0] for row in conn.execute("SELECT cache_key FROM simhash_index")}
+
+
+def test_evicted_and_forgotten_entries_leave_the_table(tmp_path):
+    db_path = str(tmp_path / "cache.db")
+    index = SimHashIndex(db_path=db_path, max_items=2)
+    for key, fingerprint in FINGERPRINTS.items():
+        index.add("profile:1", fingerprint, key)
+    assert stored_keys(db_path) == {"b", "c"}
+
+    index.forget("b")
+    assert stored_keys(db_path) == {"c"}
+    assert index.find("profile:1", FINGERPRINTS["b"]) is None
+
+
+def test_reload_prunes_rows_beyond_the_bound(tmp_path):
+    db_path = str(tmp_path / "cache.db")
+    index = SimHashIndex(db_path=db_path, max_items=10)
+    for key, fingerprint in FINGERPRINTS.items():
+        index.add("profile:1", fingerprint, key)
+
+    reloaded = SimHashIndex(db_path=db_path, max_items=1)
+    assert reloaded.stats()["items"] == 1
+    assert stored_keys(db_path) == {"c"}
+    assert reloaded.find("profile:1", FINGERPRINTS["c"]) == ("c", 0)
@@ -0,0 +1,50 @@
+import copy
+import gc
+import tracemalloc
+
+import pytest
+
+from utils.pdf_cache import PDFArtifactCache, _snapshot_size
+from utils.pdf_exporter import PDFReport
+from test_pdf_exporter import BUNDLE
+
+
+def drawn(sections):
+    report = PDFReport()
+    report.start_master_report()
+    for section in sections:
+        report.render_section(section, BUNDLE)
+    return report
+
+
+def retained_bytes(report):
+    """Memory a deep-copied snapshot keeps once the document it came from is gone."""
+    PDFReport().generate_master_report(BUNDLE)  # warm the process font cache
+    gc.collect()
+    tracemalloc.start()
+    try:
+        before = tracemalloc.get_traced_memory()[0]
+        snapshot = copy.deepcopy(report)
+        del report
+        gc.collect()
+        return snapshot, tracemalloc.get_traced_memory()[0] - before
+    finally:
+        tracemalloc.stop()
+
+
+@pytest.mark.parametrize("sections", [["profile"], ["profile", "roadmap"]])
+def test_snapshot_size_tracks_retained_memory(sections):
+    snapshot, retained = retained_bytes(drawn(sections))
+    # Unicode fonts put most of the cost in per-document glyph tables, not page streams
+    assert retained > 100_000
+    assert _snapshot_size(snapshot) == pytest.approx(retained, rel=0.3)
+
+
+def test_byte_budget_holds_with_unicode_snapshots():
+    cache = PDFArtifactCache(max_bytes=2 * 1024 * 1024)
+    for n in range(6):
+        snapshot = copy.deepcopy(drawn(["profile"]))
+        cache.put(f"snap:{n}", snapshot, _snapshot_size(snapshot))
+    stats = cache.stats()
+    assert stats["evictions"] > 0
+    assert stats["bytes"] <= 2 * 1024 * 1024
@@ -0,0 +1,50 @@
+import re
+
+from utils import pdf_exporter
+from utils.pdf_exporter import PDFReport
+
+ARABIC_SUMMARY = "مهندس بيانات أول بخبرة ثماني سنوات في Spark و Airflow."
+BUNDLE = {
+    "profile": {"summary": ARABIC_SUMMARY, "strengths": ["Café-grade naïve résumé"], "weaknesses": ["التواصل"]},
+    "roadmap": {"roadmap": {"Month 1": {"Goal": "تعلم Kubernetes", "Actions": ["Deploy one service"]}}},
+    "networking": {"recommendations": ["Jane Doe | https://linkedin.com/in/jane | Data platform talks"]},
+    "role": "Data Engineer",
+}
+
+
+def render(bundle):
+    report = PDFReport()
+    report.set_compression(False)
+    return report, report.generate_master_report(bundle)
+
+
+def unicode_map(pdf_bytes):
+    """Code points listed in the ToUnicode CMaps of the embedded fonts."""
+    return {int(cp, 16) for cp in re.findall(rb"<[0-9A-F]{4}> <([0-9A-F]{4,})>", pdf_bytes) if len(cp) == 4}
+
+
+def test_bundled_fonts_are_used_by_default():
+    report = PDFReport()
+    assert report.unicode_fonts
+    assert report.font_family_name == "LinkBrain"
+
+
+def test_arabic_glyphs_are_embedded(capsys):
+    report, pdf_bytes = render(BUNDLE)
+
+    assert b"NotoSansArabic" in pdf_bytes
+    assert pdf_bytes.count(b"/FontFile2") == len(report.fonts)
+    mapped = unicode_map(pdf_bytes)
+    for char in "مهندسبيانات" + "éï":
+        assert ord(char) in mapped, char
+    # Built through the parse cache, without falling back to per-document parsing
+    assert pdf_exporter._font_cache_supported is True
+    assert "PDF Font Cache" not in capsys.readouterr().out
+
+
+def test_documents_sharing_cached_fonts_embed_their_own_subsets():
+    _, arabic = render(BUNDLE)
+    _, latin = render({**BUNDLE, "profile": {"summary": "Plain latin summary"}, "roadmap": None})
+
+    assert ord("م") in unicode_map(arabic)
+    assert ord("م") not in unicode_map(latin)
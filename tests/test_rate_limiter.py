@@ -0,0 +1,61 @@
+import asyncio
+import sqlite3
+import threading
+import time
+
+import pytest
+
+from brain import resilience
+from brain.rate_limiter import RateLimiter, RateLimitTimeout
+
+
+def test_acquire_async_keeps_the_event_loop_running_while_sqlite_is_locked(tmp_path):
+    db_path = str(tmp_path / "ratelimit.db")
+    limiter = RateLimiter(db_path=db_path, rpm=30, tpm=0)
+    # Another worker process holds the write lock for half a second
+    other = sqlite3.connect(db_path, isolation_level=None, check_same_thread=False)
+    other.execute("BEGIN IMMEDIATE")
+    threading.Timer(0.5, lambda: other.execute("COMMIT")).start()
+
+    async def main():
+        ticks = 0
+
+        async def ticker():
+            nonlocal ticks
+            while True:
+                await asyncio.sleep(0.01)
+                ticks += 1
+
+        task = asyncio.create_task(ticker())
+        started = time.monotonic()
+        await limiter.acquire_async(100)
+        task.cancel()
+        return time.monotonic() - started, ticks
+
+    elapsed, ticks = asyncio.run(main())
+    assert elapsed >= 0.45
+    # A blocked loop would not tick at all until the lock was released
+    assert ticks >= 20
+
+
+@pytest.mark.parametrize("asynchronous", [False, True])
+def test_quota_wait_is_capped_by_the_call_deadline(tmp_path, monkeypatch, asynchronous):
+    limiter = RateLimiter(db_path=str(tmp_path / "ratelimit.db"), rpm=1, tpm=0)
+    limiter.acquire(0)  # the only request of this minute is taken
+    monkeypatch.setattr(resilience, "get_rate_limiter", lambda: limiter)
+    calls = []
+
+    def create(**params):
+        calls.append(params)
+
+    async def acreate(**params):
+        calls.append(params)
+
+    started = time.monotonic()
+    with pytest.raises(RateLimitTimeout):
+        if asynchronous:
+            asyncio.run(resilience.acall_groq(acreate, deadline=0.3, messages=[]))
+        else:
+            resilience.call_groq(create, deadline=0.3, messages=[])
+    assert time.monotonic() - started < 1.0
+    assert calls == []
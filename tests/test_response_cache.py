@@ -0,0 +1,60 @@
+from brain import model_router, network_advisor, profile_analyzer
+from brain.model_router import FAST_MODEL, LARGE_MODEL, ModelRouter
+from brain.response_cache import make_key
+
+
+class RecordingCache:
+    """Answers every lookup with a hit and remembers the keys asked for."""
+
+    def __init__(self):
+        self.keys = []
+
+    def get(self, key):
+        self.keys.append(key)
+        return {"cached": True}
+
+
+def test_make_key_is_scoped_by_tool():
+    text = "Senior data engineer, 8 years of Spark and Airflow."
+    assert make_key("profile", "m", "1", profile_text=text) != make_key("networking", "m", "1", profile_text=text)
+    assert make_key("profile", "m", "1", profile_text=text) == make_key("profile", "m", "1", profile_text=f"  {text}\n")
+
+
+def test_profile_and_networking_never_share_a_cache_entry(monkeypatch):
+    cache = RecordingCache()
+    monkeypatch.setattr(profile_analyzer, "get_cache", lambda: cache)
+    monkeypatch.setattr(network_advisor, "get_cache", lambda: cache)
+    text = "Senior data engineer, 8 years of Spark and Airflow."
+
+    profile_analyzer.ProfileAnalyzer().analyze_profile(text)
+    network_advisor.NetworkAdvisor().get_recommendations(text)
+
+    assert len(cache.keys) == 2
+    assert cache.keys[0] != cache.keys[1]
+
+
+def test_profile_key_follows_the_routed_tier(monkeypatch):
+    cache = RecordingCache()
+    monkeypatch.setattr(profile_analyzer, "get_cache", lambda: cache)
+    text = "Senior data engineer, 8 years of Spark and Airflow."
+
+    monkeypatch.setattr(model_router, "_router", ModelRouter())
+    profile_analyzer.ProfileAnalyzer().analyze_profile(text)
+    monkeypatch.setattr(model_router, "_router", ModelRouter(enabled=False))
+    profile_analyzer.ProfileAnalyzer().analyze_profile(text)
+
+    # A short profile goes to the fast model; with routing off the same text asks for the large model's entry
+    assert cache.keys == [make_key("profile", FAST_MODEL, profile_analyzer.PROMPT_VERSION, profile_text=text),
+                          make_key("profile", LARGE_MODEL, profile_analyzer.PROMPT_VERSION, profile_text=text)]
+
+
+def test_networking_routes_on_the_career_context(monkeypatch):
+    routed = []
+    route = ModelRouter.route
+    monkeypatch.setattr(ModelRouter, "route", lambda self, tool, text, **kw: routed.append(text) or route(self, tool, text, **kw))
+    monkeypatch.setattr(network_advisor, "get_cache", RecordingCache)
+    text = "Senior data engineer, 8 years of Spark and Airflow."
+
+    network_advisor.NetworkAdvisor().get_recommendations(text)
+
+    assert routed == [text]
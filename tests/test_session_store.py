@@ -0,0 +1,57 @@
+from session_store import SessionStore, browser_key, new_session_id
+
+
+def store(tmp_path, secret=""):
+    return SessionStore(db_path=str(tmp_path / "sessions.db"), secret=secret)
+
+
+def test_token_round_trips_for_the_same_browser(tmp_path):
+    sessions = store(tmp_path)
+    session_id = new_session_id()
+    token = sessions.session_token(session_id, "browser-a")
+
+    assert sessions.session_from_token(token, "browser-a") == session_id
+
+
+def test_token_is_refused_in_another_browser(tmp_path):
+    sessions = store(tmp_path)
+    token = sessions.session_token(new_session_id(), "browser-a")
+
+    assert sessions.session_from_token(token, "browser-b") is None
+    assert sessions.session_from_token(token, None) is None
+
+
+def test_client_made_ids_are_refused(tmp_path):
+    sessions = store(tmp_path)
+    session_id = new_session_id()
+
+    assert sessions.session_from_token(session_id, "browser-a") is None  # the old bare ?sid=
+    assert sessions.session_from_token(session_id + "." + "0" * 32, "browser-a") is None
+    assert sessions.session_from_token("../../etc." + "0" * 32, "browser-a") is None
+    assert sessions.session_from_token("", "browser-a") is None
+
+
+def test_generated_secret_survives_a_restart(tmp_path):
+    token = store(tmp_path).session_token("a" * 32, "browser-a")
+
+    assert store(tmp_path).session_from_token(token, "browser-a") == "a" * 32
+    other = SessionStore(db_path=str(tmp_path / "other.db"))
+    assert other.session_from_token(token, "browser-a") is None
+
+
+def test_configured_secret_is_used(tmp_path):
+    token = store(tmp_path, secret="s3cret").session_token("a" * 32)
+
+    assert SessionStore(db_path=str(tmp_path / "other.db"), secret="s3cret").session_from_token(token) == "a" * 32
+
+
+def test_browser_key_ignores_the_cookie_mask():
+    token = bytes(range(16))
+    cookies = []
+    for mask in (b"\x01\x02\x03\x04", b"\xf0\x0f\xaa\x55"):
+        masked = bytes(b ^ mask[i % 4] for i, b in enumerate(token))
+        cookies.append(f"2|{mask.hex()}|{masked.hex()}|1792289697")
+
+    assert browser_key(cookies[0]) == browser_key(cookies[1]) == token.hex()
+    assert browser_key(None) is None
+    assert browser_key("not-a-cookie") is None
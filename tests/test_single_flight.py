@@ -0,0 +1,64 @@
+from brain.single_flight import SingleFlight
+
+
+class Upstream:
+    """A token stream that records how far it was read and whether it was closed."""
+
+    def __init__(self, deltas=("Hello", " wor", "ld")):
+        self.deltas = deltas
+        self.opened = 0
+        self.closed = 0
+
+    def __call__(self):
+        self.opened += 1
+
+        def stream():
+            try:
+                yield from self.deltas
+            finally:
+                self.closed += 1
+        return stream()
+
+
+def post(flight, upstream):
+    """Mirrors PostGenerator.stream_post: a generator re-yielding the shared deltas."""
+    deltas, _ = flight.stream("post:key", upstream)
+    yield from deltas
+
+
+def test_abandoned_leader_does_not_strand_later_callers():
+    flight, upstream = SingleFlight(), Upstream()
+    leader = post(flight, upstream)
+    assert next(leader) == "Hello"
+    leader.close()  # the user navigated away mid-stream
+
+    assert upstream.closed == 1
+    assert flight.stats()["in_flight"] == 0
+    deltas, coalesced = flight.stream("post:key", upstream)
+    assert not coalesced
+    assert "".join(deltas) == "Hello world"
+    assert upstream.opened == 2
+
+
+def test_dropped_consumer_detaches_without_close():
+    flight, upstream = SingleFlight(), Upstream()
+    deltas, _ = flight.stream("post:key", upstream)
+    next(deltas)
+    del deltas  # a rerun drops the script frame holding the iterator
+
+    assert upstream.closed == 1
+    assert flight.stats()["stream_abandoned"] == 1
+
+
+def test_followers_keep_the_stream_alive_when_the_leader_leaves():
+    flight, upstream = SingleFlight(), Upstream()
+    leader, _ = flight.stream("post:key", upstream)
+    next(leader)
+    follower, coalesced = flight.stream("post:key", upstream)
+    leader.close()
+
+    assert coalesced
+    assert upstream.closed == 0
+    assert "".join(follower) == "Hello world"
+    assert upstream.opened == 1
+    assert flight.stats()["in_flight"] == 0
@@ -0,0 +1,41 @@
+import sqlite3
+import time
+
+import database
+from database import PerfLogWriter
+
+
+def span_row(n, start_ms):
+    return {"span_id": f"span-{n}", "trace_id": f"trace-{n}", "parent_id": None, "name": "ui.Profile Optimizer",
+            "start_ms": start_ms, "duration_ms": 12.0, "status": "ok", "attributes": "{}"}
+
+
+def stored_spans(db_path):
+    conn = sqlite3.connect(db_path)
+    rows = [r[0] for r in conn.execute("SELECT span_id FROM trace_spans ORDER BY start_ms")]
+    conn.close()
+    return rows
+
+
+def write(db_path, rows, **limits):
+    writer = PerfLogWriter(db_path=db_path, **limits)
+    for row in rows:
+        writer.submit(row, kind="span")
+    writer.close()
+
+
+def test_spans_past_the_retention_age_are_deleted(tmp_path):
+    db_path = str(tmp_path / "admin.db")
+    now_ms = time.time() * 1000
+    write(db_path, [span_row(0, now_ms - 3 * 86400 * 1000), span_row(1, now_ms)], trace_retention_days=1)
+
+    assert stored_spans(db_path) == ["span-1"]
+
+
+def test_only_the_newest_spans_are_kept(tmp_path, monkeypatch):
+    monkeypatch.setattr(database, "TRACE_PRUNE_EVERY", 1)
+    db_path = str(tmp_path / "admin.db")
+    now_ms = time.time() * 1000
+    write(db_path, [span_row(n, now_ms + n) for n in range(30)], trace_max_spans=5, batch_size=10)
+
+    assert stored_spans(db_path) == [f"span-{n}" for n in range(25, 30)]
@@ -0,0 +1,146 @@
+import os
+import json
+import time
+import uuid
+import random
+import inspect
+import functools
+import contextvars
+
+# Tracing switches (override through .env or the deployment environment)
+TRACE_ENABLED = os.getenv("LINKBRAIN_TRACE_ENABLED", "1") != "0"
+TRACE_SAMPLE_RATE = float(os.getenv("LINKBRAIN_TRACE_SAMPLE_RATE", "1.0"))
+
+# The span currently open in this thread / asyncio task
+_current_span = contextvars.ContextVar("linkbrain_current_span", default=None)
+
+class Span:
+    """
+    One timed unit of work inside a trace.
+    Use through span(): nesting follows the `with` blocks, and every finished
+    span is queued to the trace_spans table by the background log writer.
+    """
+    __slots__ = ("trace_id", "span_id", "parent_id", "name", "attributes",
+                 "sampled", "start", "status", "_token")
+
+    def __init__(self, name, parent=None, attributes=None):
+        self.name = name
+        self.attributes = dict(attributes or {})
+        self.span_id = uuid.uuid4().hex[:16]
+        if parent is not None:
+            self.trace_id = parent.trace_id
+            self.parent_id = parent.span_id
+            self.sampled = parent.sampled
+        else:
+            # Sampling is decided once per trace, at the root span
+            self.trace_id = uuid.uuid4().hex
+            self.parent_id = None
+            self.sampled = TRACE_ENABLED and random.random() < TRACE_SAMPLE_RATE
+        self.start = None
+        self.status = "ok"
+        self._token = None
+
+    def set(self, **attributes):
+        """Adds or overwrites span attributes (tool, model, attempt, bytes_in, ...)."""
+        self.attributes.update(attributes)
+        return self
+
+    def __enter__(self):
+        self.start = time.time()
+        self._token = _current_span.set(self)
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        duration_ms = (time.time() - self.start) * 1000
+        if exc_type is not None:
+            self.status = "error"
+            self.attributes.setdefault("error", f"{exc_type.__name__}: {str(exc)[:200]}")
+        try:
+            _current_span.reset(self._token)
+        except ValueError:
+            # Generator spans closed from another context (e.g. garbage collection)
+            pass
+        if self.sampled:
+            # Imported here: database reads the current trace id from this module
+            from database import log_span
+            log_span(self, duration_ms)
+        return False
+
+def span(name, **attributes):
+    """Opens a child of the current span (or a new trace when none is open)."""
+    return Span(name, _current_span.get(), attributes)
+
+def current_span():
+    return _current_span.get()
+
+def current_trace_id():
+    """Trace id of the open span, used to link perf_logs rows to their waterfall."""
+    active = _current_span.get()
+    return active.trace_id if active is not None and active.sampled else None
+
+def payload_size(value):
+    """Approximate payload size in bytes (UTF-8 for text, JSON for structures)."""
+    if value is None:
+        return 0
+    if isinstance(value, (bytes, bytearray)):
+        return len(value)
+    if isinstance(value, str):
+        return len(value.encode("utf-8"))
+    return len(json.dumps(value, default=str, ensure_ascii=False).encode("utf-8"))
+
+def traced(name=None, **attributes):
+    """
+    Decorator that wraps a brain/PDF entry point in a span.
+    Records tool/model attributes, bytes in (all arguments) and bytes out
+    (return value, or every yielded delta for generators), and marks the span
+    as an error when the method returns the repo's {"error": ...} dict.
+    """
+    def decorator(fn):
+        span_name = name or fn.__qualname__
+
+        def _open(args, kwargs):
+            sp = span(span_name, **attributes)
+            owner = args[0] if args else None
+            if getattr(owner, "model", None):
+                sp.set(model=owner.model)
+            return sp.set(bytes_in=sum(payload_size(a) for a in args[1:]) + sum(payload_size(v) for v in kwargs.values()))
+
+        def _close(sp, result):
+            sp.set(bytes_out=payload_size(result))
+            if isinstance(result, dict) and "error" in result:
+                sp.status = "error"
+                sp.set(error=str(result["error"])[:200])
+
+        if inspect.isgeneratorfunction(fn):
+            @functools.wraps(fn)
+            def wrapper(*args, **kwargs):
+                with _open(args, kwargs) as sp:
+                    size = 0
+                    # Split wall time into waiting on upstream vs. the consumer (UI rendering)
+                    upstream = 0.0
+                    mark = time.time()
+                    for delta in fn(*args, **kwargs):
+                        resumed = time.time()
+                        upstream += resumed - mark
+                        size += payload_size(delta)
+                        yield delta
+                        mark = time.time()
+                    upstream += time.time() - mark
+                    sp.set(bytes_out=size, upstream_ms=round(upstream * 1000, 1),
+                           consumer_ms=round((time.time() - sp.start - upstream) * 1000, 1))
+        elif inspect.iscoroutinefunction(fn):
+            @functools.wraps(fn)
+            async def wrapper(*args, **kwargs):
+                with _open(args, kwargs) as sp:
+                    result = await fn(*args, **kwargs)
+                    _close(sp, result)
+                    return result
+        else:
+            @functools.wraps(fn)
+            def wrapper(*args, **kwargs):
+                with _open(args, kwargs) as sp:
+                    result = fn(*args, **kwargs)
+                    _close(sp, result)
+                    return result
+        return wrapper
+    return decorator
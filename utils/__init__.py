@@ -1,2 +1,22 @@
-# This makes the PDFReport class easily accessible
-from .pdf_exporter import PDFReport
\ No newline at end of file
+import importlib
+
+# Package-level names, resolved on first access: importing utils.pdf_cache
+# (or any submodule) must not pull in fpdf and the process pool up front
+_EXPORTS = {
+    # This makes the PDFReport class easily accessible
+    "PDFReport": ".pdf_exporter",
+    # Cached master-report builds (see pdf_cache.py)
+    "build_master_report": ".pdf_cache",
+    # Parallel cohort export (see batch_export.py)
+    "export_master_reports": ".batch_export",
+}
+
+__all__ = list(_EXPORTS)
+
+
+def __getattr__(name):
+    if name not in _EXPORTS:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(_EXPORTS[name], __name__), name)
+    globals()[name] = value
+    return value
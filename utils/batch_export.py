@@ -0,0 +1,109 @@
+import os
+import re
+import time
+import zipfile
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+from database import LatencySketch
+
+# Batch export tuning (override through .env or the deployment environment)
+EXPORT_WORKERS = int(os.getenv("LINKBRAIN_EXPORT_WORKERS", "0"))  # 0 = one per available core
+
+
+def available_cores():
+    """Cores this process may run on (respects CPU affinity / container limits)."""
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+def _init_worker():
+    # Spans from short-lived pool processes would each start a log writer; keep tracing in the parent
+    import tracing
+    tracing.TRACE_ENABLED = False
+
+
+def _render(item_id, bundle):
+    """Runs in a pool process: renders one master report and times it."""
+    from utils.pdf_exporter import PDFReport
+    started = time.perf_counter()
+    try:
+        pdf_bytes = PDFReport().generate_master_report(bundle)
+        return item_id, pdf_bytes, time.perf_counter() - started, None
+    except Exception as e:
+        return item_id, None, time.perf_counter() - started, f"{type(e).__name__}: {e}"
+
+
+def _archive_name(item_id, used):
+    # Filesystem-safe, unique member names inside the ZIP
+    base = re.sub(r"[^\w.-]+", "_", str(item_id)).strip("._") or "report"
+    name, n = f"{base}.pdf", 1
+    while name in used:
+        n += 1
+        name = f"{base}_{n}.pdf"
+    used.add(name)
+    return name
+
+
+def export_master_reports(items, zip_target, workers=None, max_in_flight=None, on_document=None):
+    """
+    Renders many master reports in a process pool and streams them into a ZIP.
+
+    `items` is an iterable of (item_id, data_bundle) and is consumed lazily; at
+    most `max_in_flight` documents (default 2 per worker) are queued or held
+    in memory at once, and each PDF is written to the archive as soon as it
+    lands, so peak memory does not depend on the batch size.
+    `zip_target` is a path or a writable binary file object.
+    `on_document(record)` receives per-document timings:
+    {"id", "file", "ok", "render_s", "wall_s", "bytes", "error"}.
+    Returns a summary with totals, throughput and render-time percentiles.
+    """
+    workers = workers or EXPORT_WORKERS or available_cores()
+    max_in_flight = max_in_flight or workers * 2
+    # Constant-size render-time summary, whatever the batch size
+    render_times, used_names = LatencySketch(), set()
+    summary = {"documents": 0, "failed": 0, "bytes": 0, "workers": workers, "slowest": None}
+    started = time.time()
+
+    def _collect(done, pending, zf):
+        for future in done:
+            submitted = pending.pop(future)
+            item_id, pdf_bytes, render_s, error = future.result()
+            record = {"id": item_id, "file": None, "ok": error is None, "render_s": round(render_s, 4),
+                      "wall_s": round(time.time() - submitted, 4), "bytes": 0, "error": error}
+            if error is None:
+                record["file"] = _archive_name(item_id, used_names)
+                record["bytes"] = len(pdf_bytes)
+                # fpdf2 already compresses page streams: store, don't deflate again
+                zf.writestr(record["file"], pdf_bytes, compress_type=zipfile.ZIP_STORED)
+                summary["documents"] += 1
+                summary["bytes"] += len(pdf_bytes)
+                render_times.add(render_s)
+                if summary["slowest"] is None or render_s > summary["slowest"]["render_s"]:
+                    summary["slowest"] = {"id": item_id, "render_s": record["render_s"]}
+            else:
+                summary["failed"] += 1
+            if on_document:
+                on_document(record)
+
+    with zipfile.ZipFile(zip_target, "w") as zf, \
+            ProcessPoolExecutor(max_workers=workers, initializer=_init_worker) as pool:
+        pending = {}  # future -> submit time
+        for item_id, bundle in items:
+            if len(pending) >= max_in_flight:
+                # Back-pressure: wait for a slot before reading further input
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                _collect(done, pending, zf)
+            pending[pool.submit(_render, item_id, bundle)] = time.time()
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            _collect(done, pending, zf)
+
+    elapsed = time.time() - started
+    summary.update({
+        "elapsed_s": round(elapsed, 2),
+        "docs_per_s": round(summary["documents"] / elapsed, 2) if elapsed > 0 else 0.0,
+        "render_s": {f"p{int(q * 100)}": (round(render_times.quantile(q), 4) if render_times.count else None)
+                     for q in (0.5, 0.95, 0.99)}
+    })
+    return summary
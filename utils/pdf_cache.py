@@ -0,0 +1,189 @@
+import gc
+import os
+import sys
+import copy
+import json
+import types
+import hashlib
+import threading
+from collections import OrderedDict
+from tracing import span
+from utils.pdf_exporter import PDFReport, TEMPLATE_VERSION, font_cache_objects
+
+# PDF artifact cache (override through .env or the deployment environment)
+PDF_CACHE_ENABLED = os.getenv("LINKBRAIN_PDF_CACHE_ENABLED", "1") != "0"
+PDF_CACHE_MAX_BYTES = int(float(os.getenv("LINKBRAIN_PDF_CACHE_MB", "32")) * 1024 * 1024)
+
+# Never counted in a snapshot's size: shared by the whole process, not owned by it
+SHARED_TYPES = (type, types.ModuleType, types.FunctionType, types.BuiltinFunctionType,
+                types.MethodType, types.CodeType)
+
+
+def section_keys(data_bundle):
+    """
+    Chained content hashes, one per master-bundle section: key i covers the
+    template version and sections 0..i, so it identifies the document state
+    right after section i was drawn. The last key identifies the whole PDF.
+    """
+    keys = []
+    digest = hashlib.sha256(f"template:{TEMPLATE_VERSION}".encode("utf-8"))
+    for section, _ in PDFReport.SECTIONS:
+        payload = json.dumps({section: data_bundle.get(section)}, sort_keys=True, ensure_ascii=False, default=str)
+        digest.update(payload.encode("utf-8"))
+        keys.append(digest.copy().hexdigest())
+    return keys
+
+
+class PDFArtifactCache:
+    """
+    Process-wide LRU of rendered master reports, bounded by total bytes.
+    Holds finished PDFs plus snapshots of partly drawn documents so a bundle
+    whose leading sections are unchanged only renders the sections after them.
+    """
+
+    def __init__(self, max_bytes=PDF_CACHE_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self._items = OrderedDict()  # key -> (size, value)
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._stats = {"document_hits": 0, "partial_hits": 0, "misses": 0, "evictions": 0}
+
+    def get(self, key):
+        with self._lock:
+            item = self._items.get(key)
+            if item is None:
+                return None
+            self._items.move_to_end(key)
+            return item[1]
+
+    def put(self, key, value, size):
+        with self._lock:
+            if size > self.max_bytes:
+                return
+            if key in self._items:
+                self._bytes -= self._items.pop(key)[0]
+            self._items[key] = (size, value)
+            self._bytes += size
+            while self._bytes > self.max_bytes:
+                _, (evicted_size, _) = self._items.popitem(last=False)
+                self._bytes -= evicted_size
+                self._stats["evictions"] += 1
+
+    def count(self, outcome):
+        with self._lock:
+            self._stats[outcome] += 1
+
+    def stats(self):
+        with self._lock:
+            return {**self._stats, "items": len(self._items), "bytes": self._bytes}
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+            self._bytes = 0
+
+
+def _walk(roots, skip_ids, skip_types):
+    """(bytes, ids) of every object reachable from roots, stopping at skip_ids/skip_types."""
+    seen, total, stack = set(), 0, list(roots)
+    while stack:
+        obj = stack.pop()
+        if id(obj) in seen or id(obj) in skip_ids or isinstance(obj, skip_types):
+            continue
+        seen.add(id(obj))
+        total += sys.getsizeof(obj)
+        stack.extend(gc.get_referents(obj))
+    return total, seen
+
+
+def _font_object_types():
+    try:
+        from fontTools.ttLib import TTFont
+        return (TTFont,)
+    except ImportError:
+        return ()
+
+
+_shared_lock = threading.Lock()
+_shared_ids = (0, frozenset())  # (font cache entries covered, object ids)
+
+
+def _font_cache_ids():
+    """Ids of the objects held by the process font cache, recomputed when it grows."""
+    global _shared_ids
+    roots = font_cache_objects()
+    with _shared_lock:
+        if _shared_ids[0] != len(roots):
+            _, ids = _walk(roots, frozenset(), SHARED_TYPES + _font_object_types())
+            _shared_ids = (len(roots), frozenset(ids))
+        return _shared_ids[1]
+
+
+def _snapshot_size(report):
+    """
+    Bytes a cached snapshot keeps alive: every object reachable from the
+    deep-copied document (pages, glyph subsets and width tables copied per
+    document, images, resource catalog) minus what it shares with the process
+    font cache (fontTools objects, template glyph tables, font files).
+    """
+    size, _ = _walk([report], _font_cache_ids(), SHARED_TYPES + _font_object_types())
+    return size
+
+
+_lock = threading.Lock()
+_cache = None
+
+
+def get_pdf_cache():
+    """Returns the process-wide PDF artifact cache (None when disabled)."""
+    global _cache
+    if not PDF_CACHE_ENABLED:
+        return None
+    if _cache is None:
+        with _lock:
+            if _cache is None:
+                _cache = PDFArtifactCache()
+    return _cache
+
+
+def build_master_report(data_bundle):
+    """
+    Cached replacement for PDFReport().generate_master_report(data_bundle).
+    Returns (pdf_bytes, match): match is None for a full render,
+    {"cache_match": "exact"} for a cached PDF and
+    {"cache_match": "partial", "sections_reused": n} when leading sections came from a snapshot.
+    """
+    cache = get_pdf_cache()
+    if cache is None:
+        return PDFReport().generate_master_report(data_bundle), None
+
+    with span("pdf.build", tool="Master PDF Report") as sp:
+        keys = section_keys(data_bundle)
+        pdf_bytes = cache.get("pdf:" + keys[-1])
+        if pdf_bytes is not None:
+            cache.count("document_hits")
+            sp.set(cache="document", bytes_out=len(pdf_bytes))
+            return pdf_bytes, {"cache_match": "exact"}
+
+        # Resume from the latest snapshot whose sections all match this bundle
+        report, reused = None, 0
+        for i in range(len(keys) - 2, -1, -1):
+            snapshot = cache.get("snap:" + keys[i])
+            if snapshot is not None:
+                report, reused = copy.deepcopy(snapshot), i + 1
+                break
+        if report is None:
+            report = PDFReport()
+            report.start_master_report()
+        cache.count("partial_hits" if reused else "misses")
+
+        for i in range(reused, len(keys)):
+            report.render_section(PDFReport.SECTIONS[i][0], data_bundle)
+            if i < len(keys) - 1:
+                # Snapshots are never drawn on again: later builds resume from a copy
+                cache.put("snap:" + keys[i], copy.deepcopy(report), _snapshot_size(report))
+
+        pdf_bytes = report.finish()
+        cache.put("pdf:" + keys[-1], pdf_bytes, len(pdf_bytes))
+        sp.set(cache="partial" if reused else "miss", sections_reused=reused, bytes_out=len(pdf_bytes))
+        return pdf_bytes, ({"cache_match": "partial", "sections_reused": reused} if reused else None)
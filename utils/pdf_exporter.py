@@ -1,5 +1,112 @@
-from fpdf import FPDF
 import os
+import re
+import copy
+import threading
+from io import BytesIO
+from fpdf import FPDF
+from tracing import span, traced
+
+# Bump whenever the report layout changes so cached PDFs are rebuilt
+TEMPLATE_VERSION = "3"
+EFFECTIVE_WIDTH = 170
+
+# Unicode fonts (Noto Sans + Noto Sans Arabic, SIL OFL, bundled in assets/fonts).
+# A font directory without them falls back to the latin-1 core fonts.
+FONT_DIR = os.getenv("LINKBRAIN_PDF_FONT_DIR", os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "assets", "fonts"))
+UNICODE_FONT_FILES = {'': "NotoSans-Regular.ttf", 'B': "NotoSans-Bold.ttf", 'I': "NotoSans-Italic.ttf"}
+ARABIC_FONT_FILES = {'': "NotoSansArabic-Regular.ttf"}
+
+# Per-document TTFFont state reset by the parse cache (fpdf2 2.8, pinned in requirements.txt)
+FONT_DOCUMENT_FIELDS = ("i", "subset", "missing_glyphs", "biggest_size_pt", "ttfont", "ttffile")
+# TTFFont state that document copies share with the cached template (the fontTools
+# object itself is shared as well: see _detach_fonts)
+FONT_SHARED_FIELDS = ("cw", "glyph_ids", "cmap", "desc")
+
+# Paragraphs in right-to-left scripts (Arabic, Hebrew) are right-aligned
+RTL_PATTERN = re.compile(r"[\u0590-\u08FF\uFB1D-\uFDFF\uFE70-\uFEFF]")
+
+# Parsed fonts shared by every PDFReport in the process: fontkey/path -> (TTFFont, file bytes)
+_font_lock = threading.Lock()
+_font_templates = {}
+_font_cache_supported = None
+_shaping_available = None
+
+
+def _font_path(filename):
+    path = os.path.join(FONT_DIR, filename or "")
+    return path if filename and os.path.isfile(path) else None
+
+
+def _add_cached_font(pdf, family, style, path):
+    """
+    add_font() without re-parsing: the cmap, glyph widths and descriptor are
+    computed once per process; each document gets its own lightweight copy with
+    a fresh glyph subset (fpdf2 embeds only the glyphs a document uses).
+    """
+    global _font_cache_supported
+    if _font_cache_supported is False:
+        pdf.add_font(family, style, path)
+        return
+    fontkey = f"{family.lower()}{style}"
+    with _font_lock:
+        cached = _font_templates.get((fontkey, path))
+        if cached is None:
+            parser = FPDF()
+            parser.add_font(family, style, path)
+            with open(path, "rb") as f:
+                cached = (parser.fonts[fontkey], f.read())
+            _font_templates[(fontkey, path)] = cached
+    template, _ = cached
+    try:
+        from fpdf.fonts import SubsetMap
+        missing = [field for field in FONT_DOCUMENT_FIELDS if not hasattr(template, field)]
+        if missing:
+            raise AttributeError(f"TTFFont has no {', '.join(missing)}")
+        font = copy.copy(template)
+        font.i = len(pdf.fonts) + 1
+        font.biggest_size_pt = 0
+        font.missing_glyphs = []
+        font.subset = SubsetMap(font)
+        pdf.fonts[fontkey] = font
+        _font_cache_supported = True
+    except Exception as e:
+        # fpdf2 internals changed: parse every font per document from now on
+        print(f"PDF Font Cache Disabled (fpdf2 internals changed): {e}")
+        _font_cache_supported = False
+        pdf.fonts.pop(fontkey, None)
+        pdf.add_font(family, style, path)
+
+
+def font_cache_objects():
+    """
+    Objects owned by the process font cache that every document (and every
+    cache snapshot) shares: per-font glyph tables plus the raw font files.
+    """
+    objects = []
+    with _font_lock:
+        for template, data in _font_templates.values():
+            objects.append(data)
+            objects.extend(getattr(template, field, None) for field in FONT_SHARED_FIELDS)
+    return [obj for obj in objects if obj is not None]
+
+
+def _detach_fonts(pdf):
+    """
+    Output subsetting rewrites each font's fontTools object in place, and
+    copies of a document (cache snapshots) share it, so every document is
+    given a private copy, loaded from the cached file bytes, right before output.
+    """
+    try:
+        from fontTools import ttLib
+    except ImportError:
+        return
+    with _font_lock:
+        data_by_path = {path: data for (_, path), (_, data) in _font_templates.items()}
+    for font in pdf.fonts.values():
+        data = data_by_path.get(str(getattr(font, "ttffile", "")))
+        if data is not None:
+            font.ttfont = ttLib.TTFont(BytesIO(data), recalcTimestamp=False, lazy=True)
+
 
 class PDFReport(FPDF):
     """
@@ -7,16 +114,76 @@ class PDFReport(FPDF):
     Handles single reports and the Master Career Bundle.
     """
 
+    # Master bundle sections in page order: (bundle key, renderer)
+    SECTIONS = (('profile', '_render_profile'), ('roadmap', '_render_roadmap'), ('networking', '_render_networking'))
+
     def __init__(self):
         super().__init__()
         # Ensure your logo is placed in an 'assets' folder
         self.logo_path = "logo.png"
+        self.unicode_fonts = self._register_fonts()
+        self.font_family_name = "LinkBrain" if self.unicode_fonts else "Helvetica"
+
+    def _register_fonts(self):
+        """Enables the cached Unicode fonts; returns False when they are not installed."""
+        global _shaping_available
+        if not _font_path(UNICODE_FONT_FILES['']):
+            return False
+        # Joined Arabic letters and right-to-left ordering need HarfBuzz (uharfbuzz)
+        if _shaping_available is not False:
+            try:
+                self.set_text_shaping(True)
+                _shaping_available = True
+            except Exception as e:
+                _shaping_available = False
+                print(f"PDF Text Shaping Unavailable: {e}")
+        return True
+
+    def set_font(self, family=None, style="", size=0):
+        # Faces are registered on first use: fpdf2 embeds every registered font,
+        # so an unused face would still cost a subsetting pass and bytes
+        if self.unicode_fonts and family == "LinkBrain":
+            style = self._ensure_face(style)
+        super().set_font(family, style, size)
+
+    def _ensure_face(self, style):
+        """Registers (from the process cache) the closest available LinkBrain face."""
+        style = "".join(sorted(style.upper().replace('U', '')))
+        for candidate in (style, style.replace('I', ''), ''):
+            path = _font_path(UNICODE_FONT_FILES.get(candidate))
+            if path:
+                if f"linkbrain{candidate}" not in self.fonts:
+                    _add_cached_font(self, "LinkBrain", candidate, path)
+                return candidate
+        return ''
+
+    def _ensure_arabic(self):
+        """Adds the Arabic fallback font the first time Arabic text is drawn."""
+        if "linkbrainarabic" in self.fonts:
+            return
+        path = _font_path(ARABIC_FONT_FILES[''])
+        if path:
+            _add_cached_font(self, "LinkBrainArabic", '', path)
+            self.set_fallback_fonts(["LinkBrainArabic"], exact_match=False)
+
+    def _clean(self, text):
+        if self.unicode_fonts:
+            text = str(text)
+            if RTL_PATTERN.search(text):
+                self._ensure_arabic()
+            return text
+        # Core PDF fonts only cover latin-1
+        return str(text).encode('latin-1', 'ignore').decode('latin-1')
+
+    def _paragraph(self, w, h, text):
+        """multi_cell that right-aligns right-to-left paragraphs."""
+        self.multi_cell(w, h, text=text, align='R' if RTL_PATTERN.search(text) else 'J')
         
     def header(self):
         """Sets the professional header for every page."""
         if os.path.exists(self.logo_path):
             self.image(self.logo_path, 7, 6, 25) # Position: x=10, y=8, width=33
-        self.set_font('Helvetica', 'B', 12)
+        self.set_font(self.font_family_name, 'B', 12)
         self.set_text_color(100, 100, 100)
         self.cell(0, 10, 'LinkBrain AI - Professional Intelligence Report', ln=True, align='R')
         self.line(10, 18, 200, 18)
@@ -25,114 +192,134 @@ class PDFReport(FPDF):
     def footer(self):
         """Sets the footer with page numbers."""
         self.set_y(-15)
-        self.set_font('Helvetica', 'I', 8)
+        self.set_font(self.font_family_name, 'I', 8)
         self.set_text_color(128, 128, 128)
         self.cell(0, 10, f'Page {self.page_no()}', align='C')
 
     def _draw_section_title(self, title):
         """Helper function to create consistent blue section headers with underlines."""
         self.ln(5)
-        self.set_font('Helvetica', 'B', 14)
+        self.set_font(self.font_family_name, 'B', 14)
         self.set_text_color(10, 102, 194) # LinkedIn Blue
         self.cell(0, 10, title, ln=True)
         # Draw a horizontal line under the title
         self.line(self.get_x() + 10, self.get_y(), self.get_x() + 180, self.get_y())
         self.ln(5)
 
-    def generate_master_report(self, data_bundle):
+    def start_master_report(self):
+        """Page setup shared by full and incremental (cached) builds."""
         self.set_margins(20, 20, 20)
         self.set_auto_page_break(auto=True, margin=20)
         self.add_page()
-        effective_width = 170 
-        
-        def clean(text):
-            return str(text).encode('latin-1', 'ignore').decode('latin-1')
-
-        # --- Section 1: Profile Audit ---
-        if data_bundle.get('profile'):
-            self._draw_section_title("I. Profile Audit & Analysis")
-            profile = data_bundle['profile']
-            self.set_font('Helvetica', '', 11)
-            self.multi_cell(effective_width, 7, txt=clean(profile.get('summary', '')))
+
+    def render_section(self, section, data_bundle):
+        """Draws one master-bundle section at the current position."""
+        getattr(self, dict(self.SECTIONS)[section])(data_bundle)
+
+    def finish(self):
+        """Closes the document and returns the PDF bytes."""
+        with span("pdf.output") as sp:
+            _detach_fonts(self)
+            pdf_bytes = bytes(self.output())
+            sp.set(bytes_out=len(pdf_bytes))
+        return pdf_bytes
+
+    @traced(tool="Master PDF Report")
+    def generate_master_report(self, data_bundle):
+        self.start_master_report()
+        for section, _ in self.SECTIONS:
+            self.render_section(section, data_bundle)
+        return self.finish()
+
+    def _render_profile(self, data_bundle):
+        """Section I: profile summary, strengths and improvement areas."""
+        with span("pdf.section.profile"):
+            if data_bundle.get('profile'):
+                self._draw_section_title("I. Profile Audit & Analysis")
+                profile = data_bundle['profile']
+                self.set_font(self.font_family_name, '', 11)
+                self._paragraph(EFFECTIVE_WIDTH, 7, self._clean(profile.get('summary', '')))
             
-            # Strengths & Weaknesses
-            for title, key_options in [("Key Strengths", ["strengths", "Key Strengths"]), 
-                                       ("Areas for Improvement", ["weaknesses", "areas_for_improvement", "Areas for Improvement"])]:
-                # Try multiple possible keys
-                items = []
-                for k in key_options:
-                    if profile.get(k):
-                        items = profile.get(k)
-                        break
+                # Strengths & Weaknesses
+                for title, key_options in [("Key Strengths", ["strengths", "Key Strengths"]), 
+                                           ("Areas for Improvement", ["weaknesses", "areas_for_improvement", "Areas for Improvement"])]:
+                    # Try multiple possible keys
+                    items = []
+                    for k in key_options:
+                        if profile.get(k):
+                            items = profile.get(k)
+                            break
                 
-                if items:
-                    self.ln(3); self.set_font('Helvetica', 'B', 11); self.cell(0, 8, f"{title}:", ln=True)
-                    self.set_font('Helvetica', '', 11)
-                    for item in items:
-                        self.set_x(20); self.multi_cell(effective_width, 6, txt=f"- {clean(item)}"); self.ln(1)
-
-        # --- Section 2: Career Roadmap (FORCE NEW PAGE) ---
-        roadmap_data = data_bundle.get('roadmap')
-        if roadmap_data:
-            self.add_page() # Force roadmap to start on a new page
-            self._draw_section_title("II. Strategic Career Roadmap")
+                    if items:
+                        self.ln(3); self.set_font(self.font_family_name, 'B', 11); self.cell(0, 8, f"{title}:", ln=True)
+                        self.set_font(self.font_family_name, '', 11)
+                        for item in items:
+                            self.set_x(20); self._paragraph(EFFECTIVE_WIDTH, 6, f"- {self._clean(item)}"); self.ln(1)
+
+    def _render_roadmap(self, data_bundle):
+        """Section II: the career roadmap, always starting on a new page."""
+        with span("pdf.section.roadmap"):
+            roadmap_data = data_bundle.get('roadmap')
+            if roadmap_data:
+                self.add_page() # Force roadmap to start on a new page
+                self._draw_section_title("II. Strategic Career Roadmap")
             
-            # Handle cases where roadmap is nested or a direct dict
-            content = roadmap_data.get('roadmap', roadmap_data)
+                # Handle cases where roadmap is nested or a direct dict
+                content = roadmap_data.get('roadmap', roadmap_data)
             
-            if isinstance(content, dict):
-                for period, details in content.items():
-                    self.set_font('Helvetica', 'B', 11); self.cell(0, 8, clean(period), ln=True)
-                    self.set_font('Helvetica', '', 11)
-                    if isinstance(details, dict):
-                        # Flexibility in finding Goal/Action keys
-                        goal = details.get('Objective') or details.get('Goal') or details.get('goal', '')
-                        steps = details.get('Actions') or details.get('Steps') or details.get('actions', [])
-                        if goal: self.multi_cell(effective_width, 6, txt=clean(f"Target: {goal}"))
-                        if isinstance(steps, list):
-                            for step in steps:
-                                self.set_x(25); self.multi_cell(effective_width-5, 6, txt=f"* {clean(step)}")
-                    else:
-                        self.multi_cell(effective_width, 6, txt=clean(str(details)))
-                    self.ln(4)
-            else:
-                self.set_font('Helvetica', '', 11)
-                self.multi_cell(effective_width, 7, txt=clean(str(content)))
-
-        # --- Section 3: Strategic Networking (FIXED SEARCH) ---
-        networking_data = data_bundle.get('networking')
-        if networking_data:
-            # Check if we should add a page if near bottom
-            if self.get_y() > 200: self.add_page()
-            else: self.ln(10)
+                if isinstance(content, dict):
+                    for period, details in content.items():
+                        self.set_font(self.font_family_name, 'B', 11); self.cell(0, 8, self._clean(period), ln=True)
+                        self.set_font(self.font_family_name, '', 11)
+                        if isinstance(details, dict):
+                            # Flexibility in finding Goal/Action keys
+                            goal = details.get('Objective') or details.get('Goal') or details.get('goal', '')
+                            steps = details.get('Actions') or details.get('Steps') or details.get('actions', [])
+                            if goal: self._paragraph(EFFECTIVE_WIDTH, 6, self._clean(f"Target: {goal}"))
+                            if isinstance(steps, list):
+                                for step in steps:
+                                    self.set_x(25); self._paragraph(EFFECTIVE_WIDTH-5, 6, f"* {self._clean(step)}")
+                        else:
+                            self._paragraph(EFFECTIVE_WIDTH, 6, self._clean(str(details)))
+                        self.ln(4)
+                else:
+                    self.set_font(self.font_family_name, '', 11)
+                    self._paragraph(EFFECTIVE_WIDTH, 7, self._clean(str(content)))
+
+    def _render_networking(self, data_bundle):
+        """Section III: recommended people to follow."""
+        with span("pdf.section.networking"):
+            networking_data = data_bundle.get('networking')
+            if networking_data:
+                # Check if we should add a page if near bottom
+                if self.get_y() > 200: self.add_page()
+                else: self.ln(10)
             
-            self._draw_section_title("III. Strategic Networking")
+                self._draw_section_title("III. Strategic Networking")
             
-            # Smart search for the list of people
-            people_list = []
-            keys_to_check = ['recommendations', 'people', 'mentors', 'network', 'top_profiles']
-            for k in keys_to_check:
-                if networking_data.get(k):
-                    people_list = networking_data.get(k)
-                    break
+                # Smart search for the list of people
+                people_list = []
+                keys_to_check = ['recommendations', 'people', 'mentors', 'network', 'top_profiles']
+                for k in keys_to_check:
+                    if networking_data.get(k):
+                        people_list = networking_data.get(k)
+                        break
             
-            if people_list:
-                self.set_font('Helvetica', '', 11)
-                for person in people_list:
-                    self.set_x(20)
-                    if isinstance(person, dict):
-                        name = person.get('name') or person.get('Name', 'Expert')
-                        link = person.get('profile_link') or person.get('link', '#')
-                        reason = person.get('reason') or person.get('Reason', '')
-                        self.set_font('Helvetica', 'B', 11); self.write(7, f"- {clean(name)}: ")
-                        self.set_font('Helvetica', '', 11); self.set_text_color(0, 0, 255)
-                        self.write(7, "LinkedIn Profile", link=link)
-                        self.set_text_color(0, 0, 0); self.write(7, f" | {clean(reason)}")
-                    else:
-                        self.multi_cell(effective_width, 6, txt=f"- {clean(str(person))}")
-                    self.ln(4)
-            else:
-                self.set_font('Helvetica', 'I', 11)
-                self.cell(0, 8, "No networking data available in this session.", ln=True)
-
-        return bytes(self.output())
\ No newline at end of file
+                if people_list:
+                    self.set_font(self.font_family_name, '', 11)
+                    for person in people_list:
+                        self.set_x(20)
+                        if isinstance(person, dict):
+                            name = person.get('name') or person.get('Name', 'Expert')
+                            link = person.get('profile_link') or person.get('link', '#')
+                            reason = person.get('reason') or person.get('Reason', '')
+                            self.set_font(self.font_family_name, 'B', 11); self.write(7, f"- {self._clean(name)}: ")
+                            self.set_font(self.font_family_name, '', 11); self.set_text_color(0, 0, 255)
+                            self.write(7, "LinkedIn Profile", link=link)
+                            self.set_text_color(0, 0, 0); self.write(7, f" | {self._clean(reason)}")
+                        else:
+                            self._paragraph(EFFECTIVE_WIDTH, 6, f"- {self._clean(str(person))}")
+                        self.ln(4)
+                else:
+                    self.set_font(self.font_family_name, 'I', 11)
+                    self.cell(0, 8, "No networking data available in this session.", ln=True)